@@ -12,6 +12,20 @@ const fundController = {
     }
   },
 
+  async getFundChanges(req, res) {
+    try {
+      const since = new Date(req.query.since);
+      if (!req.query.since || isNaN(since.getTime())) {
+        return res.status(400).json({ message: 'Query parameter since must be an ISO date' });
+      }
+      const limit = Math.min(parseInt(req.query.limit, 10) || 1000, 10000);
+      const funds = await fundService.getFundsUpdatedSince(since, limit);
+      res.json(funds);
+    } catch (error) {
+      res.status(500).json({ message: error.message });
+    }
+  },
+
   async getFundById(req, res) {
     try {
       const fund = await fundService.getFundById(req.params.id);
@@ -6,16 +6,17 @@ const transactionController = {
       const { fundId, amount, frequency, startDate, endDate, deductionDay } = req.body;
       const userId = req.user.userId;
 
-      const transaction = await transactionService.createSIP(
+      const { transaction, created } = await transactionService.createSIP(
         userId,
         fundId,
         amount,
         frequency,
         startDate,
         endDate,
-        deductionDay
+        deductionDay,
+        req.get('Idempotency-Key')
       );
-      res.status(201).json(transaction);
+      res.status(created ? 201 : 200).json(transaction);
     } catch (error) {
       res.status(400).json({ message: error.message });
     }
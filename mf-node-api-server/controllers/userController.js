@@ -27,6 +27,15 @@ const userController = {
     }
   },
 
+  async refreshToken(req, res) {
+    try {
+      const result = await userService.refreshToken(req.user.userId, req.user.auth_time);
+      res.json(result);
+    } catch (error) {
+      res.status(401).json({ message: error.message });
+    }
+  },
+
   async getProfile(req, res) {
     try {
       const user = await userService.getUserProfile(req.user.userId);
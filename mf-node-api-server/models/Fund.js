@@ -49,4 +49,7 @@ const fundSchema = new mongoose.Schema({
   timestamps: true
 });
 
+// Delta sync reads funds changed since a watermark, oldest change first
+fundSchema.index({ updatedAt: 1 });
+
 module.exports = mongoose.model('Fund', fundSchema); 
\ No newline at end of file
@@ -66,9 +66,18 @@ const transactionSchema = new mongoose.Schema({
   },
   next_deduction_date: {
     type: Date
+  },
+  // Client supplied key: a retried request returns the SIP created by the first one
+  idempotency_key: {
+    type: String
   }
 }, {
   timestamps: true
 });
 
+transactionSchema.index(
+  { user: 1, idempotency_key: 1 },
+  { unique: true, partialFilterExpression: { idempotency_key: { $type: 'string' } } }
+);
+
 module.exports = mongoose.model('Transaction', transactionSchema); 
\ No newline at end of file
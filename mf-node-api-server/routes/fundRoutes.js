@@ -7,6 +7,9 @@ const upload = multer({ dest: 'uploads/' });
 // Get all funds
 router.get('/', fundController.getAllFunds);
 
+// Get funds changed since a watermark (?since=<ISO date>&limit=<n>), deactivated ones included
+router.get('/changes', fundController.getFundChanges);
+
 // Get fund by ID
 router.get('/:id', fundController.getFundById);
 
@@ -8,6 +8,7 @@ router.post('/register', userController.register);
 router.post('/login', userController.login);
 
 // Protected routes
+router.post('/refresh-token', auth, userController.refreshToken);
 router.get('/profile', auth, userController.getProfile);
 router.put('/profile', auth, userController.updateProfile);
 router.put('/change-password', auth, userController.changePassword);
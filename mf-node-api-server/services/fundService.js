@@ -14,6 +14,13 @@ const fundService = {
     return await Fund.find({ is_active: true });
   },
 
+  // Active and deactivated funds changed at or after `since`, oldest change first
+  async getFundsUpdatedSince(since, limit) {
+    return await Fund.find({ updatedAt: { $gte: since } })
+      .sort({ updatedAt: 1, _id: 1 })
+      .limit(limit);
+  },
+
   async getFundById(fundId) {
     return await Fund.findById(fundId);
   },
@@ -3,7 +3,12 @@ const Fund = require('../models/Fund');
 const User = require('../models/User');
 
 const transactionService = {
-  async createSIP(userId, fundId, amount, frequency, startDate, endDate, deductionDay) {
+  async createSIP(userId, fundId, amount, frequency, startDate, endDate, deductionDay, idempotencyKey) {
+    if (idempotencyKey) {
+      const existing = await Transaction.findOne({ user: userId, idempotency_key: idempotencyKey });
+      if (existing) return { transaction: existing, created: false };
+    }
+
     const fund = await Fund.findById(fundId);
     if (!fund) throw new Error('Fund not found');
     if (amount < fund.min_investment) throw new Error('Amount below minimum investment');
@@ -52,10 +57,21 @@ const transactionService = {
       deduction_day: deductionDay,
       start_date: startDate,
       end_date: endDate,
-      next_deduction_date: nextDeductionDate
+      next_deduction_date: nextDeductionDate,
+      idempotency_key: idempotencyKey
     });
 
-    const savedTransaction = await transaction.save();
+    let savedTransaction;
+    try {
+      savedTransaction = await transaction.save();
+    } catch (error) {
+      // A concurrent request with the same key won the insert
+      if (error.code === 11000 && idempotencyKey) {
+        const existing = await Transaction.findOne({ user: userId, idempotency_key: idempotencyKey });
+        return { transaction: existing, created: false };
+      }
+      throw error;
+    }
     
     // Update user's portfolio
     await User.findByIdAndUpdate(
@@ -63,7 +79,7 @@ const transactionService = {
       { $push: { portfolio: savedTransaction._id } }
     );
 
-    return savedTransaction;
+    return { transaction: savedTransaction, created: true };
   },
 
   async createLumpsum(userId, fundId, amount) {
@@ -2,6 +2,10 @@ const User = require('../models/User');
 const bcrypt = require('bcryptjs');
 const jwt = require('jsonwebtoken');
 
+const TOKEN_TTL_SECONDS = 24 * 60 * 60;
+// Refreshed tokens stop being issued this long after the password login
+const MAX_SESSION_AGE_SECONDS = Number(process.env.JWT_MAX_SESSION_AGE_SECONDS) || 7 * 24 * 60 * 60;
+
 const userService = {
   async register(userData) {
     // Check if user already exists
@@ -40,11 +44,7 @@ const userService = {
     }
 
     // Generate JWT token
-    const token = jwt.sign(
-      { userId: user._id },
-      process.env.JWT_SECRET,
-      { expiresIn: '24h' }
-    );
+    const token = this.signToken(user._id);
 
     return {
       token,
@@ -57,6 +57,28 @@ const userService = {
     };
   },
 
+  // auth_time is the time of the password login, carried over by refreshes
+  signToken(userId, authTime = Math.floor(Date.now() / 1000)) {
+    const sessionLeft = authTime + MAX_SESSION_AGE_SECONDS - Math.floor(Date.now() / 1000);
+    return jwt.sign(
+      { userId, auth_time: authTime },
+      process.env.JWT_SECRET,
+      { expiresIn: Math.min(TOKEN_TTL_SECONDS, sessionLeft) }
+    );
+  },
+
+  // New token for a holder of a still valid one, without the password, until the session reaches its maximum age
+  async refreshToken(userId, authTime) {
+    if (!Number.isFinite(authTime) || Date.now() / 1000 - authTime >= MAX_SESSION_AGE_SECONDS) {
+      throw new Error('Session expired, please log in again');
+    }
+    const user = await User.findById(userId);
+    if (!user) {
+      throw new Error('User not found');
+    }
+    return { token: this.signToken(user._id, authTime) };
+  },
+
   async getUserProfile(userId) {
     const user = await User.findById(userId).select('-password');
     if (!user) {
@@ -1,10 +1,28 @@
-from fastapi import FastAPI, HTTPException
-from typing import Dict
-from google.adk.sessions import DatabaseSessionService
-from mutual_fund_advisor_agent.agent import root_agent
-from mutual_fund_advisor_agent.schemas import SessionState
+import asyncio
+import json
+import os
+import secrets
+import time
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Dict, Optional
+from mutual_fund_advisor_agent.agent import get_root_agent
+from mutual_fund_advisor_agent.catalog import fund_catalog
+from mutual_fund_advisor_agent.hedged_model import model_latency_stats
+from mutual_fund_advisor_agent.model_tiering import tier_stats
+from mutual_fund_advisor_agent.prefetch import prefetcher
+from mutual_fund_advisor_agent.sip_outbox import get_sip_outbox
+from mutual_fund_advisor_agent.token_cache import get_portal_tokens
+from mutual_fund_advisor_agent import schemas
+from mutual_fund_advisor_agent.schemas import BatchConversationItem, BatchConversationRequest, SessionState
 from google.adk.runners import Runner
 from utils import call_agent_async
+from idempotency import IdempotentTurns
+from warmup import Warmup, build_declarations, compile_validators, open_pooled_connections, ping_models
+from session_services import create_session_service
+from session_services.reaper import SessionReaper, engines_of
+from session_services.turn_queue import SessionTurnQueue, TurnQueueFull, TurnQueueTimeout
 
 # FastAPI app
 app = FastAPI()
@@ -12,13 +30,100 @@ app = FastAPI()
 # Constants
 APP_NAME = "mutual_fund_advisor"
 DB_URL = "sqlite:///./mutual_fund_advisor.db"
-session_service = DatabaseSessionService(db_url=DB_URL)
+session_service = create_session_service(DB_URL)
 initial_state = SessionState().model_dump(mode="json")
+BATCH_MAX_PARALLELISM = int(os.getenv("BATCH_MAX_PARALLELISM", "8"))
+
+# Retries with the same Idempotency-Key share one agent turn
+idempotent_turns = IdempotentTurns(
+    result_ttl_seconds=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600")),
+    max_results=int(os.getenv("IDEMPOTENCY_MAX_RESULTS", "10000")),
+)
+
+# Runner (reused across requests), created with the agent graph on the first turn
+runner: Optional[Runner] = None
+
+def get_runner() -> Runner:
+    global runner
+    if runner is None:
+        runner = Runner(agent=get_root_agent(), app_name=APP_NAME, session_service=session_service)
+    return runner
 
-# Runner (reused across requests)
-runner = Runner(agent=root_agent, app_name=APP_NAME, session_service=session_service)
 user_sessions: Dict[str, str] = {}  # simple cache (use Redis or DB for prod)
 
+# Turns of one session run one at a time, across all workers
+turn_queue = SessionTurnQueue.from_env(session_service)
+
+# Background cleanup of completed and abandoned sessions
+session_reaper = SessionReaper.from_env(session_service)
+
+@app.on_event("startup")
+def start_session_reaper():
+    if os.getenv("SESSION_REAPER_ENABLED", "true").lower() == "true":
+        session_reaper.start()
+    # Submit SIP intents left over from before a restart
+    get_sip_outbox().ensure_started()
+
+# Warmup: what the first turns of a fresh worker would otherwise set up (see warmup.py)
+def warm_agent_graph():
+    get_runner()
+    return get_root_agent().name
+
+def warm_databases():
+    return open_pooled_connections(engines_of(session_service) + [get_sip_outbox().engine, get_portal_tokens().engine])
+
+def warm_catalog():
+    catalog = fund_catalog.get()
+    return {"version": catalog.version, "funds": len(catalog)}
+
+def warm_schemas():
+    models = [value for value in vars(schemas).values() if isinstance(value, type) and issubclass(value, BaseModel) and value is not BaseModel]
+    return {
+        **build_declarations(get_root_agent()),
+        **compile_validators(models, [(SessionState, initial_state)]),
+    }
+
+async def warm_models():
+    return await ping_models(get_root_agent(), float(os.getenv("WARMUP_MODEL_TIMEOUT_SECONDS", "10")))
+
+warmup_steps = [
+    ("agent_graph", warm_agent_graph),
+    ("databases", warm_databases),
+    ("catalog", warm_catalog),
+    ("schemas", warm_schemas),
+]
+if os.getenv("WARMUP_MODEL_CALL", "false").lower() == "true":
+    warmup_steps.append(("models", warm_models))
+warmup = Warmup(warmup_steps if os.getenv("WARMUP_ENABLED", "true").lower() == "true" else [], required=["agent_graph"])
+warmup_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_warmup():
+    global warmup_task
+    # In the background: /healthz answers at once, /readyz once the worker is warm
+    warmup_task = asyncio.create_task(warmup.run())
+
+# Load of this worker, reported to the multi-process router (router.py)
+WORKER_ID = os.getenv("WORKER_ID", "0")
+worker_load = {"in_flight_turns": 0, "turns_completed": 0, "draining": False, "started_at": time.time()}
+
+class WorkerDraining(Exception):
+    """Raised for new turns once the worker has been asked to drain."""
+
+async def run_turn(user_id: str, session_id: str, message: str, http_response: Optional[Response] = None):
+    """Run one agent turn once the session's earlier turns have finished."""
+    if worker_load["draining"]:
+        raise WorkerDraining(f"Worker {WORKER_ID} is draining")
+    worker_load["in_flight_turns"] += 1
+    try:
+        async with turn_queue.turn(APP_NAME, user_id, session_id) as wait_ms:
+            if http_response is not None:
+                http_response.headers["Turn-Queue-Wait-Ms"] = f"{wait_ms:.1f}"
+            return await call_agent_async(get_runner(), user_id, session_id, message)
+    finally:
+        worker_load["in_flight_turns"] -= 1
+        worker_load["turns_completed"] += 1
+
 # -------------------------------
 # 1. Start or Get Existing Session
 # -------------------------------
@@ -38,10 +143,26 @@ async def start_session(user_id: str):
 # 2. Send a message to the agent
 # -------------------------------
 @app.post("/message/{user_id}/{session_id}/{message}")
-async def send_message(user_id: str, session_id: str, message: str):
+async def send_message(
+    user_id: str,
+    session_id: str,
+    message: str,
+    http_response: Response,
+    idempotency_key: Optional[str] = Header(None),
+):
     try:
-        response = await call_agent_async(runner, user_id, session_id, message)
+        if not idempotency_key:
+            response = await run_turn(user_id, session_id, message, http_response)
+            return {"response": response}
+
+        response, served = await idempotent_turns.run(
+            (user_id, session_id, idempotency_key),
+            lambda: run_turn(user_id, session_id, message, http_response),
+        )
+        http_response.headers["Idempotency-Status"] = served
         return {"response": response}
+    except (TurnQueueFull, TurnQueueTimeout, WorkerDraining) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -64,3 +185,188 @@ async def get_history(user_id: str, session_id: str):
         return {"messages": messages}
     except Exception as e:
         raise HTTPException(status_code=404, detail="Session not found")
+
+# -------------------------------
+# 4. Batch Conversations
+# -------------------------------
+async def resolve_batch_session(item: BatchConversationItem) -> str:
+    """Return the item's session id, creating the session when it does not exist yet."""
+    if item.session_id:
+        session = await asyncio.to_thread(
+            session_service.get_session, app_name=APP_NAME, user_id=item.user_id, session_id=item.session_id
+        )
+        if session is not None:
+            return session.id
+    session = await asyncio.to_thread(
+        session_service.create_session,
+        app_name=APP_NAME,
+        user_id=item.user_id,
+        state=initial_state,
+        session_id=item.session_id,
+    )
+    return session.id
+
+
+async def run_batch_item(index: int, item: BatchConversationItem, semaphore: asyncio.Semaphore, results: asyncio.Queue):
+    """Run one item turn by turn, putting a result line per turn; a failure ends only this item."""
+    async with semaphore:
+        session_id = item.session_id
+        turn, message = 0, None
+        try:
+            session_id = await resolve_batch_session(item)
+            for turn, message in enumerate(item.turns()):
+                start = time.perf_counter()
+                response = await run_turn(item.user_id, session_id, message)
+                if response is None:
+                    raise RuntimeError("Agent returned no response")
+                await results.put({
+                    "index": index, "user_id": item.user_id, "session_id": session_id, "turn": turn,
+                    "message": message, "status": "ok", "response": response,
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+                })
+        except Exception as e:
+            await results.put({
+                "index": index, "user_id": item.user_id, "session_id": session_id, "turn": turn,
+                "message": message, "status": "error", "error": str(e),
+            })
+        finally:
+            await results.put(None)
+
+
+@app.post("/batch")
+async def run_batch(request: BatchConversationRequest):
+    """Run many conversations concurrently and stream one NDJSON line per turn as they complete."""
+    parallelism = min(request.parallelism or BATCH_MAX_PARALLELISM, BATCH_MAX_PARALLELISM)
+    semaphore = asyncio.Semaphore(parallelism)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def stream_results():
+        start = time.perf_counter()
+        tasks = [
+            asyncio.create_task(run_batch_item(index, item, semaphore, results))
+            for index, item in enumerate(request.items)
+        ]
+        running, turns, failed_items = len(tasks), 0, 0
+        try:
+            while running:
+                line = await results.get()
+                if line is None:
+                    running -= 1
+                    continue
+                if line["status"] == "ok":
+                    turns += 1
+                else:
+                    failed_items += 1
+                yield json.dumps(line) + "\n"
+            yield json.dumps({"summary": {
+                "items": len(tasks), "turns": turns, "failed_items": failed_items, "parallelism": parallelism,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+            }}) + "\n"
+        finally:
+            # Client went away: stop the conversations that are still running
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+# -------------------------------
+# 5. Metrics
+# -------------------------------
+@app.get("/metrics/session-reaper")
+async def get_session_reaper_metrics():
+    return session_reaper.metrics_snapshot()
+
+@app.get("/metrics/turn-queue")
+async def get_turn_queue_metrics():
+    return turn_queue.stats()
+
+@app.get("/metrics/turn-queue/{user_id}/{session_id}")
+async def get_session_turn_queue(user_id: str, session_id: str):
+    return await turn_queue.session_stats(APP_NAME, user_id, session_id)
+
+@app.get("/metrics/idempotency")
+async def get_idempotency_metrics():
+    return idempotent_turns.stats()
+
+@app.get("/metrics/models")
+async def get_model_metrics():
+    return model_latency_stats()
+
+@app.get("/metrics/model-tiers")
+async def get_model_tier_metrics():
+    return tier_stats()
+
+@app.get("/metrics/prefetch")
+async def get_prefetch_metrics():
+    return prefetcher.stats()
+
+@app.get("/metrics/sip-outbox")
+async def get_sip_outbox_metrics():
+    return get_sip_outbox().stats()
+
+@app.get("/metrics/portal-tokens")
+async def get_portal_token_metrics():
+    return get_portal_tokens().stats()
+
+@app.get("/metrics/catalog")
+async def get_catalog_metrics():
+    return fund_catalog.stats()
+
+@app.get("/metrics/load")
+async def get_worker_load():
+    return {
+        "worker_id": WORKER_ID,
+        "pid": os.getpid(),
+        **worker_load,
+        "uptime_seconds": round(time.time() - worker_load["started_at"], 1),
+        "cpu_seconds": round(time.process_time(), 2),
+        "turn_queue": turn_queue.stats(),
+    }
+
+# -------------------------------
+# 6. Health, Readiness, Drain and Shutdown
+# -------------------------------
+@app.get("/healthz")
+async def health():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok", "worker_id": WORKER_ID, "pid": os.getpid()}
+
+@app.get("/readyz")
+async def readiness(response: Response):
+    """Readiness: 200 once warmup has finished, 503 while warming up or draining."""
+    ready = warmup.ready and not worker_load["draining"]
+    if not ready:
+        response.status_code = 503
+    return {
+        "ready": ready,
+        "worker_id": WORKER_ID,
+        "pid": os.getpid(),
+        "draining": worker_load["draining"],
+        "warmup": warmup.stats(),
+    }
+
+# Admin endpoints need the token router.py shares with its workers; without one they are disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def require_admin(token: Optional[str]) -> None:
+    if not ADMIN_TOKEN or token is None or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.post("/admin/drain")
+async def drain_worker(x_admin_token: Optional[str] = Header(None)):
+    """Refuse new turns (503) so running ones can finish before a restart."""
+    require_admin(x_admin_token)
+    worker_load["draining"] = True
+    return {"worker_id": WORKER_ID, "in_flight_turns": worker_load["in_flight_turns"]}
+
+@app.on_event("shutdown")
+def flush_session_events():
+    if warmup_task is not None:
+        warmup_task.cancel()
+    session_reaper.stop(timeout=5)
+    prefetcher.shutdown()
+    get_sip_outbox().stop(timeout=5)
+    # Persist events still buffered by batching session services
+    flush_all = getattr(session_service, "flush_all", None)
+    if flush_all is not None:
+        flush_all()
@@ -0,0 +1,58 @@
+"""
+SIP allocation benchmark.
+
+Splits a monthly amount across random sets of active funds drawn from the
+synthetic catalog (see bench_fund_decoding.py) for each investor type, and
+reports the median and worst time of allocate(), min SIP re-solves included,
+and how often the risk limits could not be met.
+
+Usage:
+    python benchmarks/bench_allocation.py --funds 5 10 25 50 --trials 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_fund_decoding import make_catalog
+from mutual_fund_advisor_agent.catalog import AllocationError, FundCatalog, allocate
+from mutual_fund_advisor_agent.catalog.allocation import RISK_AVERSION
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--funds", type=int, nargs="+", default=[5, 10, 25, 50])
+    parser.add_argument("--trials", type=int, default=200)
+    parser.add_argument("--amount", type=float, default=25000)
+    args = parser.parse_args()
+
+    catalog = FundCatalog.from_json(make_catalog(2000))
+    active = [record for record in catalog if record.is_active]
+    rng = random.Random(0)
+
+    print(f"Allocating ₹{args.amount:g} a month, {args.trials} random fund sets per row")
+    print(f"{'funds':>5} {'investor':<13} {'median':>9} {'worst':>9} {'infeasible':>11}")
+    for count in args.funds:
+        for investor_type in RISK_AVERSION:
+            timings, infeasible = [], 0
+            for _ in range(args.trials):
+                funds = rng.sample(active, count)
+                start = time.perf_counter()
+                try:
+                    allocate(funds, catalog.analytics, args.amount, investor_type)
+                except AllocationError:
+                    infeasible += 1
+                timings.append((time.perf_counter() - start) * 1000)
+            print(
+                f"{count:>5} {investor_type:<13} {statistics.median(timings):>6.2f} ms "
+                f"{max(timings):>6.2f} ms {infeasible:>11}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Catalog delta sync benchmark.
+
+Runs fake_fund_server.py in-process and keeps a CatalogStore in sync with it
+while funds change: a few NAV updates and a deactivation per round, then one
+bulk upload larger than --max-changes. Each round reports how the store
+synced (delta or full), its time and the response bytes, and checks that the
+synced catalog equals a fresh full download.
+
+Usage:
+    python benchmarks/bench_catalog_sync.py --funds 10000 --rounds 5 --changes 20
+"""
+
+import argparse
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+import requests
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_fund_server import FakeFunds, create_app
+from mutual_fund_advisor_agent.catalog import CatalogStore, CatalogSync, FundCatalog
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(funds: FakeFunds) -> str:
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(funds), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+class CountingSession:
+    """Counts the bytes of fund API responses made through requests.get."""
+
+    def __init__(self):
+        self.bytes = 0
+        self._get = requests.get
+
+    def get(self, *args, **kwargs):
+        response = self._get(*args, **kwargs)
+        self.bytes += len(response.content)
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--funds", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--changes", type=int, default=20)
+    parser.add_argument("--max-changes", type=int, default=500)
+    args = parser.parse_args()
+
+    funds = FakeFunds(args.funds)
+    base_url = start_server(funds)
+    sync = CatalogSync(base_url=base_url, max_changes=args.max_changes)
+    store = CatalogStore(fetch=sync, ttl_seconds=0)
+    counting = CountingSession()
+    requests.get = counting.get
+    rng = random.Random(1)
+
+    def synced(label: str) -> None:
+        counting.bytes = 0
+        full_before = sync.full_syncs
+        start = time.perf_counter()
+        catalog = store.get()
+        millis = (time.perf_counter() - start) * 1000
+        received = counting.bytes
+        kind = "full" if sync.full_syncs > full_before else "delta"
+        expected = FundCatalog.from_json(requests.get(f"{base_url}/funds").content)
+        same = expected.by_id == catalog.by_id
+        print(f"{label:<28} {kind:>6} {millis:>8.1f} ms {received / 1024:>9.1f} KB  v{catalog.version:<3} {'ok' if same else 'MISMATCH'}")
+
+    print(f"Catalog: {args.funds} funds, delta limit {args.max_changes} changes")
+    print(f"{'round':<28} {'sync':>6} {'time':>11} {'received':>12}  version")
+    synced("initial load")
+    for round_number in range(1, args.rounds + 1):
+        active = [fund["_id"] for fund in funds.active()]
+        for fund_id in rng.sample(active, args.changes):
+            requests.patch(f"{base_url}/funds/{fund_id}/nav", json={"newNav": round(rng.uniform(10, 500), 4)})
+        requests.delete(f"{base_url}/funds/{rng.choice(active)}")
+        synced(f"{args.changes} NAVs + 1 removal")
+    synced("no changes")
+    requests.post(f"{base_url}/funds/bulk-update", params={"count": args.max_changes + 1})
+    synced(f"bulk upload of {args.max_changes + 1}")
+    print(sync.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Fund catalog decoding benchmark.
+
+Builds a synthetic /funds response in the shape the Node API emits (returns
+keyed '1W' ... '10Y') and times turning it into validated RecommendedFund
+objects:
+
+- json.loads, then one RecommendedFund per fund;
+- json.loads, then the cached list TypeAdapter;
+- orjson.loads, then the cached list TypeAdapter (when orjson is installed);
+- decode_funds(): parsing and validation in one pydantic-core call;
+
+and dump_funds(), which turns the result back into state-ready dicts.
+
+Usage:
+    python benchmarks/bench_fund_decoding.py --funds 10000 --repeat 7
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mutual_fund_advisor_agent.catalog import FUND_LIST, decode_funds, dump_funds
+from mutual_fund_advisor_agent.schemas import RecommendedFund
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PERIODS = ["1W", "1M", "3M", "6M", "YTD", "1Y", "2Y", "3Y", "5Y", "10Y"]
+CATEGORIES = ["Large Cap", "Mid Cap", "Small Cap", "Flexi Cap", "Liquid", "Corporate Bond", "Balanced Advantage"]
+
+
+def make_catalog(count: int, seed: int = 7) -> bytes:
+    rng = random.Random(seed)
+    funds = []
+    for index in range(count):
+        funds.append({
+            "_id": f"{index:024x}",
+            "name": f"Fund {index} {rng.choice(CATEGORIES)} Growth",
+            "risk_level": rng.choice(["Low", "Medium", "High"]),
+            "fund_type": rng.choice(["Equity", "Debt", "Hybrid"]),
+            "category": rng.choice(CATEGORIES),
+            "min_sip_amount": rng.choice([100, 500, 1000]),
+            "nav": round(rng.uniform(10, 500), 4),
+            "fund_size": round(rng.uniform(100, 50000), 2),
+            "returns": {period: round(rng.uniform(-5, 30), 2) for period in PERIODS},
+            "is_active": rng.random() > 0.05,
+            "createdAt": "2024-01-15T10:00:00.000Z",
+            "updatedAt": "2025-06-01T10:00:00.000Z",
+            "__v": 0,
+        })
+    return json.dumps(funds).encode()
+
+
+def measure(label: str, decode, raw: bytes, repeat: int) -> None:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        funds = decode(raw)
+        timings.append(time.perf_counter() - start)
+    assert funds[0].returns.Y_10 == json.loads(raw)[0]["returns"]["10Y"]
+    median = statistics.median(timings) * 1000
+    print(f"{label:<34} median {median:8.1f} ms  ({median * 1000 / len(funds):5.1f} us per fund)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--funds", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    raw = make_catalog(args.funds)
+    print(f"Catalog: {args.funds} funds, {len(raw) / 1e6:.1f} MB of JSON")
+
+    measure("json.loads + model per fund", lambda body: [RecommendedFund.model_validate(fund) for fund in json.loads(body)], raw, args.repeat)
+    measure("json.loads + list TypeAdapter", lambda body: FUND_LIST.validate_python(json.loads(body)), raw, args.repeat)
+    if orjson is not None:
+        measure("orjson.loads + list TypeAdapter", lambda body: FUND_LIST.validate_python(orjson.loads(body)), raw, args.repeat)
+    measure("decode_funds (validate_json)", decode_funds, raw, args.repeat)
+
+    funds = decode_funds(raw)
+    start = time.perf_counter()
+    dump_funds(funds)
+    print(f"{'dump_funds':<34} {(time.perf_counter() - start) * 1000:15.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
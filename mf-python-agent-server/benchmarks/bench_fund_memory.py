@@ -0,0 +1,82 @@
+"""
+Fund catalog memory benchmark.
+
+Holds the same synthetic catalog (see bench_fund_decoding.py) as raw dicts
+from json.loads, as RecommendedFund models, as dump_funds() dicts and as a
+FundCatalog of slotted records, and reports the memory each one keeps alive
+(tracemalloc) plus the time of a typical ranking loop over it: active funds
+of one category with their 5 year return.
+
+Usage:
+    python benchmarks/bench_fund_memory.py --funds 10000
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_fund_decoding import make_catalog
+from mutual_fund_advisor_agent.catalog import FundCatalog, decode_funds, dump_funds
+
+
+def retained_bytes(build):
+    """Bytes still allocated after build() returns, with its result kept alive."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, after - before
+
+
+def loop_ms(select, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        select()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--funds", type=int, default=10000)
+    args = parser.parse_args()
+
+    # Every representation is built from the JSON body, so none shares strings with another
+    raw = make_catalog(args.funds)
+
+    representations = {
+        "raw dicts (json.loads)": (lambda: json.loads(raw), lambda funds: [
+            (f["name"], f["returns"]["5Y"]) for f in funds if f["is_active"] and f["category"] == "Large Cap"
+        ]),
+        "RecommendedFund models": (lambda: decode_funds(raw), lambda funds: [
+            (f.name, f.returns.Y_5) for f in funds if f.is_active and f.category == "Large Cap"
+        ]),
+        "dump_funds dicts (state shape)": (lambda: dump_funds(decode_funds(raw)), lambda funds: [
+            (f["name"], f["returns"]["Y_5"]) for f in funds if f["is_active"] and f["category"] == "Large Cap"
+        ]),
+        "FundCatalog of FundRecord": (lambda: FundCatalog.from_json(raw), lambda funds: [
+            (f.name, f.return_for("Y_5")) for f in funds if f.is_active and f.category == "Large Cap"
+        ]),
+    }
+
+    print(f"Catalog: {args.funds} funds")
+    print(f"{'representation':<32} {'retained':>10} {'per fund':>10} {'loop':>9}")
+    for label, (build, select) in representations.items():
+        funds, size = retained_bytes(build)
+        per_fund = size / args.funds
+        millis = loop_ms(lambda: select(funds))
+        print(f"{label:<32} {size / 1e6:>7.1f} MB {per_fund:>7.0f} B {millis:>6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Hedged model call benchmark on local fake backends.
+
+Two fake models answer after a log-normal latency with a slow tail (a share of
+calls takes tail-factor times longer) and fail with a rate limit error at a
+given rate. Compares calling the primary directly with HedgedLlm(primary,
+secondary): latency percentiles, extra calls spent on hedges and failed calls.
+
+Usage:
+    python benchmarks/bench_hedged_model.py --calls 400 --tail-share 0.05 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from mutual_fund_advisor_agent.hedged_model import MODEL_STATS, HedgedLlm, model_latency_stats
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+class FakeLlm(BaseLlm):
+    """Answers after a random latency; a tail share of calls is much slower."""
+
+    median_seconds: float = 0.05
+    tail_share: float = 0.05
+    tail_factor: float = 10.0
+    error_rate: float = 0.0
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False):
+        latency = random.lognormvariate(0, 0.3) * self.median_seconds
+        if random.random() < self.tail_share:
+            latency *= self.tail_factor
+        await asyncio.sleep(latency)
+        if random.random() < self.error_rate:
+            raise FakeRateLimitError(f"{self.model}: rate limited")
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=f"answer from {self.model}")]))
+
+
+async def run(model: BaseLlm, calls: int, concurrency: int):
+    timings, failures = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    request = LlmRequest(contents=[types.Content(role="user", parts=[types.Part(text="Which fund suits me?")])])
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async for _ in model.generate_content_async(request):
+                    pass
+            except Exception:
+                failures += 1
+                return
+            timings.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    timings.sort()
+    return timings, failures
+
+
+def report(label: str, timings, failures: int, model_calls: int, calls: int) -> None:
+    def pct(p):
+        return timings[min(len(timings) - 1, int(len(timings) * p / 100))]
+
+    print(
+        f"{label:<16} p50={pct(50):>7.1f} ms  p95={pct(95):>7.1f} ms  p99={pct(99):>7.1f} ms  "
+        f"failed={failures:<3} model calls/request={model_calls / calls:.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--median-ms", type=float, default=50)
+    parser.add_argument("--tail-share", type=float, default=0.05)
+    parser.add_argument("--tail-factor", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--percentile", type=float, default=95)
+    args = parser.parse_args()
+
+    def fake(name: str) -> FakeLlm:
+        return FakeLlm(
+            model=name,
+            median_seconds=args.median_ms / 1000,
+            tail_share=args.tail_share,
+            tail_factor=args.tail_factor,
+            error_rate=args.error_rate,
+        )
+
+    primary, secondary = fake("fake-primary"), fake("fake-secondary")
+    timings, failures = asyncio.run(run(primary, args.calls, args.concurrency))
+    report("primary only", timings, failures, args.calls, args.calls)
+
+    MODEL_STATS.clear()
+    hedged = HedgedLlm(
+        model="hedged:fake-primary|fake-secondary",
+        models=[primary, secondary],
+        hedge_percentile=args.percentile,
+        default_hedge_delay_seconds=args.median_ms * 3 / 1000,
+        min_hedge_delay_seconds=0.0,
+    )
+    timings, failures = asyncio.run(run(hedged, args.calls, args.concurrency))
+    model_calls = sum(stats.calls for stats in MODEL_STATS.values())
+    report("hedged", timings, failures, model_calls, args.calls)
+
+    for name, stats in model_latency_stats().items():
+        print(f"  {name:<16} {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Import-time benchmark.
+
+Imports each entry point in a fresh interpreter and reports the median import
+time. It also checks that heavy dependencies stay unloaded where they are not
+needed:
+
+- the package, the catalog and utils load neither google.adk, litellm nor
+  gradio;
+- api_server and the CLI (main) load neither litellm nor gradio. The agent
+  graph and its model clients are built on the first turn.
+
+The last row builds the agent graph (root_agent) for comparison. The exit
+status is 1 when an import loads a module it should not, so the check can run
+in CI.
+
+Usage:
+    python benchmarks/bench_import_time.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIGHT = ("google.adk", "litellm", "gradio")
+NO_MODELS = ("litellm", "gradio")
+
+# (label, statement, modules it must not load)
+TARGETS = [
+    ("package", "import mutual_fund_advisor_agent", LIGHT),
+    ("catalog", "import mutual_fund_advisor_agent.catalog", LIGHT),
+    ("utils", "import utils", LIGHT),
+    ("api_server", "import api_server", NO_MODELS),
+    ("main (CLI)", "import main", NO_MODELS),
+    ("agent graph", "from mutual_fund_advisor_agent.agent import root_agent", ()),
+]
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+exec(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [name for name in json.loads(sys.argv[2]) if name in sys.modules]}))
+"""
+
+
+def measure(statement: str, forbidden, workdir: str):
+    env = {**os.environ, "PYTHONPATH": SERVER_DIR + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    # Imports that open databases create them in workdir, not in the repository
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, statement, json.dumps(list(forbidden))],
+        cwd=workdir, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{statement!r} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'import':<12} {'median':>9} {'worst':>9}  unwanted modules")
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, statement, forbidden in TARGETS:
+            runs = [measure(statement, forbidden, workdir) for _ in range(args.runs)]
+            timings = [run["seconds"] for run in runs]
+            loaded = sorted({name for run in runs for name in run["loaded"]})
+            failed = failed or bool(loaded)
+            print(
+                f"{label:<12} {statistics.median(timings):>7.2f} s {max(timings):>7.2f} s  "
+                f"{', '.join(loaded) if loaded else 'none'}"
+            )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
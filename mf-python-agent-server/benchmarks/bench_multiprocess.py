@@ -0,0 +1,111 @@
+"""
+Multi-process throughput benchmark.
+
+Starts router.py with 1, 2, 4, ... workers running fake_agent_worker:app (the
+real api_server with a fake agent turn, see that module) and sends /message
+requests from many concurrent users through the router. Throughput should grow
+with the number of workers up to the number of CPU cores.
+
+Usage:
+    python benchmarks/bench_multiprocess.py --workers 1,2,4 --users 64 --requests 2000
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCH_DIR)
+
+
+async def wait_ready(client: httpx.AsyncClient, url: str, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{url}/router/workers")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("router did not start")
+
+
+async def run_load(url: str, users: int, requests: int):
+    timings, errors = [], 0
+    remaining = iter(range(requests))
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        await wait_ready(client, url)
+
+        async def user(index: int):
+            nonlocal errors
+            for request in remaining:
+                start = time.perf_counter()
+                response = await client.post(f"{url}/message/bench-user-{index}/bench-session-{index}/turn-{request}")
+                timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(index) for index in range(users)))
+        elapsed = time.perf_counter() - start
+    return elapsed, timings, errors
+
+
+def bench(worker_count: int, args) -> float:
+    port = args.port
+    with tempfile.TemporaryDirectory() as workdir:
+        router = subprocess.Popen(
+            [
+                sys.executable, os.path.join(SERVER_DIR, "router.py"),
+                "--workers", str(worker_count), "--host", "127.0.0.1", "--port", str(port),
+                "--base-worker-port", str(port + 100),
+                "--app", "fake_agent_worker:app", "--app-dir", BENCH_DIR,
+            ],
+            cwd=workdir,
+            env=dict(os.environ, SESSION_REAPER_ENABLED="false", BENCH_CPU_MS=str(args.cpu_ms), BENCH_IO_MS=str(args.io_ms)),
+        )
+        try:
+            elapsed, timings, errors = asyncio.run(run_load(f"http://127.0.0.1:{port}", args.users, args.requests))
+        finally:
+            router.send_signal(signal.SIGTERM)
+            router.wait(timeout=60)
+
+    timings.sort()
+    throughput = len(timings) / elapsed
+    print(
+        f"workers={worker_count:<3} {throughput:>8.1f} req/s  "
+        f"p50={statistics.median(timings):>7.1f} ms  p95={timings[int(len(timings) * 0.95) - 1]:>7.1f} ms  errors={errors}"
+    )
+    return throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma separated worker counts")
+    parser.add_argument("--users", type=int, default=64, help="concurrent users")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--cpu-ms", type=float, default=10, help="CPU time per fake turn")
+    parser.add_argument("--io-ms", type=float, default=50, help="simulated model latency per fake turn")
+    parser.add_argument("--port", type=int, default=8800)
+    args = parser.parse_args()
+
+    print(f"CPU cores: {os.cpu_count()}")
+    baseline = None
+    for worker_count in (int(count) for count in args.workers.split(",")):
+        throughput = bench(worker_count, args)
+        baseline = baseline or throughput
+        print(f"{'':<12}speedup x{throughput / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
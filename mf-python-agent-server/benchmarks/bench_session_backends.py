@@ -0,0 +1,87 @@
+"""
+Per-turn session overhead benchmark.
+
+Measures the session-service work of one conversation turn (get_session, then
+appending the turn's events, then flushing) for each backend, as the session
+history grows over a full onboarding.
+
+Backends: DatabaseSessionService and ProductionSQLiteSessionService on SQLite,
+KeyValueSessionService on the in-process LocalKeyValueStore, on fakeredis when
+installed, and on a real Redis server when REDIS_URL is set.
+
+Usage:
+    python benchmarks/bench_session_backends.py --turns 40 --events 6
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.adk.events.event import Event, EventActions
+from google.adk.sessions import DatabaseSessionService
+from google.genai import types
+
+from session_services import KeyValueSessionService, LocalKeyValueStore, ProductionSQLiteSessionService
+
+APP_NAME = "bench"
+USER_ID = "bench-user"
+
+
+def make_event(turn: int, index: int) -> Event:
+    return Event(
+        invocation_id=f"turn-{turn}",
+        author="UserProfileAgent",
+        content=types.Content(role="model", parts=[types.Part(text=f"Question {turn}.{index}: " + "lorem ipsum " * 15)]),
+        actions=EventActions(state_delta={"flow_stage": "profile", "user_profile": {"name": "Asha", "age": 30 + turn}}),
+    )
+
+
+def bench(label: str, service, turns: int, events_per_turn: int) -> None:
+    session = service.create_session(app_name=APP_NAME, user_id=USER_ID, state={"flow_stage": "initial"})
+    flush_events = getattr(service, "flush_events", None)
+    timings = []
+    for turn in range(turns):
+        start = time.perf_counter()
+        session = service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+        for index in range(events_per_turn):
+            service.append_event(session=session, event=make_event(turn, index))
+        if flush_events is not None:
+            flush_events(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<30} mean={statistics.mean(timings):>7.2f} ms  p50={timings[len(timings) // 2]:>7.2f} ms  p95={p95:>7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--events", type=int, default=6, help="events appended per turn")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench("DatabaseSessionService", DatabaseSessionService(db_url=f"sqlite:///{tmp}/default.db"), args.turns, args.events)
+        bench("ProductionSQLite", ProductionSQLiteSessionService(db_url=f"sqlite:///{tmp}/production.db"), args.turns, args.events)
+
+    bench("KeyValue (LocalKeyValueStore)", KeyValueSessionService(LocalKeyValueStore()), args.turns, args.events)
+
+    try:
+        import fakeredis
+        bench("KeyValue (fakeredis)", KeyValueSessionService(fakeredis.FakeRedis(decode_responses=True)), args.turns, args.events)
+    except ImportError:
+        print("KeyValue (fakeredis)           skipped: pip install fakeredis")
+
+    if os.getenv("REDIS_URL"):
+        import redis
+        client = redis.Redis.from_url(os.environ["REDIS_URL"], decode_responses=True)
+        bench("KeyValue (Redis)", KeyValueSessionService(client, key_prefix="mfa-bench"), args.turns, args.events)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Session write-throughput benchmark.
+
+Simulates concurrent conversation turns (one get_session plus several appended
+events per turn) against the plain ADK DatabaseSessionService, the
+ProductionSQLiteSessionService and a ShardedSessionService over production
+SQLite shards, each on fresh SQLite files.
+
+Usage:
+    python benchmarks/bench_session_writes.py --workers 8 --turns 20 --events 6 --shards 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.adk.events.event import Event, EventActions
+from google.adk.sessions import DatabaseSessionService
+from google.genai import types
+
+from session_services import ProductionSQLiteSessionService, ShardedSessionService, shard_urls
+
+APP_NAME = "bench"
+
+
+def make_event(author: str, turn: int, index: int) -> Event:
+    return Event(
+        invocation_id=f"turn-{turn}",
+        author=author,
+        content=types.Content(role="model", parts=[types.Part(text=f"message {turn}.{index} " * 20)]),
+        actions=EventActions(state_delta={"flow_stage": f"stage-{turn}", f"field_{index}": index}),
+    )
+
+
+def run_worker(service, user_id: str, turns: int, events_per_turn: int, results: dict) -> None:
+    try:
+        session = service.create_session(app_name=APP_NAME, user_id=user_id, state={"flow_stage": "initial"})
+    except Exception as e:
+        results["errors"] += 1
+        results["last_error"] = str(e).splitlines()[0]
+        return
+    flush_events = getattr(service, "flush_events", None)
+    for turn in range(turns):
+        try:
+            session = service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session.id)
+            for index in range(events_per_turn):
+                service.append_event(session=session, event=make_event("agent", turn, index))
+            if flush_events is not None:
+                flush_events(app_name=APP_NAME, user_id=user_id, session_id=session.id)
+            results["turns"] += 1
+        except Exception as e:
+            results["errors"] += 1
+            results["last_error"] = str(e).splitlines()[0]
+
+
+def bench(label: str, service, workers: int, turns: int, events_per_turn: int) -> None:
+    results = {"turns": 0, "errors": 0, "last_error": None}
+    threads = [
+        threading.Thread(target=run_worker, args=(service, f"user-{uuid.uuid4().hex[:8]}", turns, events_per_turn, results))
+        for _ in range(workers)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    events = results["turns"] * events_per_turn
+    print(
+        f"{label:<22} turns={results['turns']:>5} errors={results['errors']:>4} "
+        f"{results['turns'] / elapsed:>8.1f} turns/s {events / elapsed:>9.1f} events/s"
+    )
+    if results["last_error"]:
+        print(f"{'':<22} last error: {results['last_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--events", type=int, default=6, help="events appended per turn")
+    parser.add_argument("--shards", type=int, default=4, help="shard count for the sharded service")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        default_service = DatabaseSessionService(db_url=f"sqlite:///{tmp}/default.db")
+        bench("DatabaseSessionService", default_service, args.workers, args.turns, args.events)
+
+        production_service = ProductionSQLiteSessionService(db_url=f"sqlite:///{tmp}/production.db")
+        bench("ProductionSQLite", production_service, args.workers, args.turns, args.events)
+
+        sharded_service = ShardedSessionService.from_urls(
+            shard_urls(f"sqlite:///{tmp}/sharded.db", args.shards), ProductionSQLiteSessionService
+        )
+        bench(f"Sharded x{args.shards}", sharded_service, args.workers, args.turns, args.events)
+
+
+if __name__ == "__main__":
+    main()
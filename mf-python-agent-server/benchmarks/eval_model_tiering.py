@@ -0,0 +1,180 @@
+"""
+Offline evaluation of model tiering.
+
+Reads labelled turns (benchmarks/data/tiering_eval.jsonl: agent, session
+state, the agent's previous question, the user's message, the expected tier and what
+a correct answer does) and reports:
+
+- how well classify_turn() matches the expected tiers, and its cost per turn;
+- with --models: each turn run through the agent on the large model only, the
+  small model only and the tiered setup (small/large/rule as in production),
+  with pass rate and latency per expected tier. Tools are not executed; a
+  turn passes when the expected tool is called with the expected arguments, or
+  the answer text matches the expected pattern.
+
+--models calls the real model APIs, so the API keys of both models are needed.
+
+Usage:
+    python benchmarks/eval_model_tiering.py
+    python benchmarks/eval_model_tiering.py --models --large gemini-2.0-flash --small gemini-2.0-flash-lite
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Agents are evaluated on plain models; tiering is applied by this script
+os.environ["MODEL_TIERING"] = "false"
+os.environ["MODEL_HEDGING"] = "false"
+
+from google.adk.agents import LlmAgent
+from google.adk.events import Event
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from mutual_fund_advisor_agent.agent import root_agent
+from mutual_fund_advisor_agent.hedged_model import resolve_model
+from mutual_fund_advisor_agent.model_tiering import (
+    DEFAULT_SMALL_MODEL, TIER_LARGE, TIER_SMALL, TIER_STATS, TieredLlm, classify_turn, moves_money, tiering_callback,
+)
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tiering_eval.jsonl")
+APP_NAME = "tiering_eval"
+
+
+def load_cases(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_agent(name: str):
+    if root_agent.name == name:
+        return root_agent
+    agent = root_agent.find_sub_agent(name)
+    if agent is None:
+        raise ValueError(f"Unknown agent in evaluation data: {name}")
+    return agent
+
+
+def evaluate_classifier(cases: List[Dict[str, Any]]) -> None:
+    confusion = Counter()
+    start = time.perf_counter()
+    for case in cases:
+        confusion[(case["expected_tier"], classify_turn(case["message"], moves_money(case["state"]), case["agent"]))] += 1
+    micros = (time.perf_counter() - start) * 1e6 / len(cases)
+
+    correct = sum(count for (expected, got), count in confusion.items() if expected == got)
+    print(f"Classifier: {correct}/{len(cases)} correct ({correct / len(cases):.0%}), {micros:.1f} us per turn")
+    for (expected, got), count in sorted(confusion.items()):
+        marker = "" if expected == got else "   <- misrouted"
+        print(f"  expected={expected:<6} got={got:<6} {count}{marker}")
+    for case in cases:
+        got = classify_turn(case["message"], moves_money(case["state"]), case["agent"])
+        if got != case["expected_tier"]:
+            print(f"  [{case['agent']}] {case['message']!r}: expected {case['expected_tier']}, got {got}")
+
+
+def passes(expect: Dict[str, Any], calls: List[types.FunctionCall], text: str) -> bool:
+    if "tool" in expect:
+        for call in calls:
+            if call.name != expect["tool"]:
+                continue
+            args = {key: str(value).strip().lower() for key, value in (call.args or {}).items()}
+            if all(args.get(key) == str(value).lower() for key, value in expect.get("args", {}).items()):
+                return True
+        return False
+    return re.search(expect["text"], text) is not None
+
+
+def skip_tools(tool, args, tool_context):
+    return {"status": "success", "note": "tool not executed during evaluation"}
+
+
+async def run_case(case: Dict[str, Any], model, tiered: bool):
+    original = find_agent(case["agent"])
+    agent = LlmAgent(
+        name=original.name,
+        model=model,
+        instruction=original.instruction,
+        tools=original.tools,
+        before_model_callback=tiering_callback if tiered else None,
+        before_tool_callback=skip_tools,
+    )
+    session_service = InMemorySessionService()
+    session = session_service.create_session(
+        app_name=APP_NAME, user_id="eval", state=case["state"]
+    )
+    session_service.append_event(
+        session,
+        Event(author=agent.name, content=types.Content(role="model", parts=[types.Part(text=case["question"])])),
+    )
+    runner = Runner(agent=agent, app_name=APP_NAME, session_service=session_service)
+    message = types.Content(role="user", parts=[types.Part(text=case["message"])])
+
+    calls, texts = [], []
+    start = time.perf_counter()
+    async for event in runner.run_async(user_id="eval", session_id=session.id, new_message=message):
+        calls.extend(event.get_function_calls())
+        if event.content and event.content.parts:
+            texts.extend(part.text for part in event.content.parts if part.text)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return passes(case["expect"], calls, "\n".join(texts)), elapsed_ms
+
+
+async def evaluate_models(cases: List[Dict[str, Any]], large_name: str, small_name: str) -> None:
+    large, small = resolve_model(large_name), resolve_model(small_name)
+    setups = {
+        "large": (large, False),
+        "small": (small, False),
+        "tiered": (TieredLlm(model=f"tiered:{small.model}|{large.model}", small=small, large=large), True),
+    }
+    # results[expected tier][setup] -> list of (passed, latency ms)
+    results = defaultdict(lambda: defaultdict(list))
+    for case in cases:
+        for setup, (model, tiered) in setups.items():
+            try:
+                outcome = await run_case(case, model, tiered)
+            except Exception as e:
+                print(f"  {setup:<6} [{case['agent']}] {case['message']!r}: error {e}")
+                outcome = (False, None)
+            results[case["expected_tier"]][setup].append(outcome)
+
+    print(f"\nModels: large={large.model} small={small.model}")
+    for tier in (TIER_SMALL, TIER_LARGE):
+        if tier not in results:
+            continue
+        print(f"Turns labelled {tier}:")
+        for setup, outcomes in results[tier].items():
+            passed = sum(ok for ok, _ in outcomes)
+            latencies = [ms for _, ms in outcomes if ms is not None]
+            median = f"{statistics.median(latencies):>7.0f} ms" if latencies else "      - ms"
+            print(f"  {setup:<6} pass {passed:>2}/{len(outcomes):<2} median latency {median}")
+    print("Tiered calls per tier:", {tier: stats.calls for tier, stats in TIER_STATS.items()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DATA_FILE)
+    parser.add_argument("--models", action="store_true", help="also run the turns through the models")
+    parser.add_argument("--large", default="gemini-2.0-flash")
+    parser.add_argument("--small", default=os.getenv("SMALL_MODEL") or DEFAULT_SMALL_MODEL)
+    args = parser.parse_args()
+
+    cases = load_cases(args.data)
+    evaluate_classifier(cases)
+    if args.models:
+        asyncio.run(evaluate_models(cases, args.large, args.small))
+
+
+if __name__ == "__main__":
+    main()
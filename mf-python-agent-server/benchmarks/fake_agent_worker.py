@@ -0,0 +1,41 @@
+"""
+Worker app for bench_multiprocess.py.
+
+The real api_server app (routing, turn queue, session store, JSON encoding)
+with the agent turn replaced by a fake one: BENCH_IO_MS of waiting, standing
+in for the model call, plus BENCH_CPU_MS of Pydantic validation, standing in
+for the per-turn CPU work of the framework.
+
+Usage (normally started by bench_multiprocess.py through router.py):
+    python router.py --workers 2 --app fake_agent_worker:app --app-dir benchmarks
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_server
+from mutual_fund_advisor_agent.schemas import SessionState
+
+CPU_MS = float(os.getenv("BENCH_CPU_MS", "10"))
+IO_MS = float(os.getenv("BENCH_IO_MS", "50"))
+
+SAMPLE_STATE = SessionState(
+    flow_stage="funds_recommended",
+    interaction_history=[{"action": "user_query", "query": f"question {index}"} for index in range(20)],
+).model_dump_json()
+
+
+async def fake_call_agent_async(runner, user_id, session_id, query):
+    await asyncio.sleep(IO_MS / 1000)
+    deadline = time.process_time() + CPU_MS / 1000
+    while time.process_time() < deadline:
+        SessionState.model_validate_json(SAMPLE_STATE)
+    return f"Fake answer to: {query}"
+
+
+api_server.call_agent_async = fake_call_agent_async
+app = api_server.app
@@ -0,0 +1,136 @@
+"""
+Stand-in for the Node fund API, for bench_catalog_sync.py and local runs.
+
+Serves a synthetic catalog (see bench_fund_decoding.py) from memory with the
+Node server's fund endpoints and their semantics: GET /funds lists active
+funds, GET /funds/changes lists active and deactivated funds with updatedAt at
+or after ?since, oldest first, and every write sets updatedAt. POST
+/funds/bulk-update changes the returns of random funds, as an Excel upload
+would.
+
+Usage:
+    python benchmarks/fake_fund_server.py --funds 10000 --port 5055
+    MUTUAL_FUND_SERVER_BASE_URL=http://localhost:5055 python api_server.py
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import Body, FastAPI, HTTPException, Query
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_fund_decoding import PERIODS, make_catalog
+
+
+class FakeFunds:
+    """In-memory funds keyed by _id, with a clock that never repeats an updatedAt."""
+
+    def __init__(self, count: int, seed: int = 7):
+        self.funds: Dict[str, Dict[str, Any]] = {fund["_id"]: fund for fund in json.loads(make_catalog(count, seed))}
+        self.rng = random.Random(seed)
+        # Spread the last updates over the past year, as a real catalog has them
+        now = datetime.now(timezone.utc)
+        for fund in self.funds.values():
+            updated = now - timedelta(seconds=self.rng.uniform(60, 365 * 86400))
+            fund["updatedAt"] = updated.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+        self.lock = threading.Lock()
+        self._last = max(datetime.fromisoformat(fund["updatedAt"].replace("Z", "+00:00")) for fund in self.funds.values())
+
+    def _touch(self, fund: Dict[str, Any]) -> Dict[str, Any]:
+        now = max(datetime.now(timezone.utc), self._last + timedelta(milliseconds=1))
+        self._last = now
+        fund["updatedAt"] = now.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+        return fund
+
+    def active(self) -> List[Dict[str, Any]]:
+        return [fund for fund in self.funds.values() if fund["is_active"]]
+
+    def changed_since(self, since: str, limit: int) -> List[Dict[str, Any]]:
+        changed = [fund for fund in self.funds.values() if fund["updatedAt"] >= since]
+        changed.sort(key=lambda fund: (fund["updatedAt"], fund["_id"]))
+        return changed[:limit]
+
+    def update_nav(self, fund_id: str, nav: float) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            fund = self.funds.get(fund_id)
+            if fund is None:
+                return None
+            fund["nav"] = nav
+            return self._touch(fund)
+
+    def deactivate(self, fund_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            fund = self.funds.get(fund_id)
+            if fund is None:
+                return None
+            fund["is_active"] = False
+            return self._touch(fund)
+
+    def bulk_update(self, count: int) -> List[str]:
+        """New returns for count random active funds."""
+        with self.lock:
+            chosen = self.rng.sample([fund["_id"] for fund in self.active()], count)
+            for fund_id in chosen:
+                fund = self.funds[fund_id]
+                fund["returns"] = {period: round(self.rng.uniform(-5, 30), 2) for period in PERIODS}
+                self._touch(fund)
+            return chosen
+
+
+def create_app(funds: FakeFunds) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/funds")
+    def get_all_funds():
+        return funds.active()
+
+    @app.get("/funds/changes")
+    def get_fund_changes(since: str = Query(...), limit: int = Query(1000)):
+        return funds.changed_since(since, min(limit, 10000))
+
+    @app.get("/funds/{fund_id}")
+    def get_fund(fund_id: str):
+        fund = funds.funds.get(fund_id)
+        if fund is None:
+            raise HTTPException(status_code=404, detail="Fund not found")
+        return fund
+
+    @app.patch("/funds/{fund_id}/nav")
+    def update_nav(fund_id: str, body: Dict[str, float] = Body(...)):
+        fund = funds.update_nav(fund_id, body["newNav"])
+        if fund is None:
+            raise HTTPException(status_code=404, detail="Fund not found")
+        return fund
+
+    @app.delete("/funds/{fund_id}")
+    def delete_fund(fund_id: str):
+        if funds.deactivate(fund_id) is None:
+            raise HTTPException(status_code=404, detail="Fund not found")
+        return {"message": "Fund deleted successfully"}
+
+    @app.post("/funds/bulk-update")
+    def bulk_update(count: int = Query(100)):
+        return {"updated": funds.bulk_update(count)}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--funds", type=int, default=10000)
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+    uvicorn.run(create_app(FakeFunds(args.funds)), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
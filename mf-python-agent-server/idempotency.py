@@ -0,0 +1,83 @@
+"""
+Idempotent agent turns
+
+Client retries of /message carry the same Idempotency-Key header. A retry that
+arrives while the original turn is still running attaches to that turn, and a
+retry after it finished gets the cached result, so neither starts another
+runner.run_async nor appends duplicate events to the session.
+
+Turns and results are tracked per process; with several api_server workers,
+keep a user's requests on one worker (see the user-hash routing of sessions).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+# --- Constants ---
+DEFAULT_RESULT_TTL_SECONDS = 600
+DEFAULT_MAX_RESULTS = 10_000
+
+# How a call was served
+EXECUTED = "executed"
+COALESCED = "coalesced"
+REPLAYED = "replayed"
+
+
+class IdempotentTurns:
+    """Runs each (session, idempotency key) turn at most once while its result is cached.
+
+    Failed turns (an exception or a None result) are not cached, so a retry
+    runs them again.
+    """
+
+    def __init__(self, result_ttl_seconds: float = DEFAULT_RESULT_TTL_SECONDS, max_results: int = DEFAULT_MAX_RESULTS):
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_results = max_results
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._results: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._counts = {EXECUTED: 0, COALESCED: 0, REPLAYED: 0}
+
+    def _cached(self, key: Hashable):
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del self._results[key]
+            return None
+        return entry
+
+    def _store(self, key: Hashable, task: asyncio.Task) -> None:
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None or task.result() is None:
+            return
+        self._results[key] = (time.monotonic() + self.result_ttl_seconds, task.result())
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    async def run(self, key: Hashable, turn: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """Return (result, how it was served) for the turn identified by key."""
+        entry = self._cached(key)
+        if entry is not None:
+            self._counts[REPLAYED] += 1
+            return entry[1], REPLAYED
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._counts[COALESCED] += 1
+            served = COALESCED
+        else:
+            task = asyncio.ensure_future(turn())
+            task.add_done_callback(lambda done: self._store(key, done))
+            self._in_flight[key] = task
+            self._counts[EXECUTED] += 1
+            served = EXECUTED
+
+        # A disconnecting client must not cancel the turn other retries wait on
+        return await asyncio.shield(task), served
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._counts, "in_flight": len(self._in_flight), "cached_results": len(self._results)}
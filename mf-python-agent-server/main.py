@@ -1,15 +1,17 @@
 import asyncio
+import os
 import sys
-import gradio as gr
+import uuid
 import logging
 from typing import List, Dict, Optional
 from google.adk.sessions import Session
 # Import the main customer service agent
-from mutual_fund_advisor_agent.agent import root_agent
+from mutual_fund_advisor_agent.agent import get_root_agent
 from dotenv import load_dotenv
 from google.adk.runners import Runner
 from google.adk.sessions import DatabaseSessionService
 from mutual_fund_advisor_agent.schemas import SessionState
+from session_services import create_session_service
 from utils import call_agent_async
 from datetime import datetime # Added for the example usage in CLI
 
@@ -24,17 +26,17 @@ APP_NAME = "mutual_fund_advisor"
 USER_ID = "aiwithaniket"
     
 # ===== PART 1: Initialize In-Memory Session Service =====
-# Using SQLite database for persistent storage
+# Using SQLite database for persistent storage (WAL + batched writes, see session_services)
 db_url = "sqlite:///./my_agent_data.db"
-session_service = DatabaseSessionService(db_url=db_url)
+session_service = create_session_service(db_url)
 
 # ===== PART 2: Define Initial State =====
 # This will be used when creating a new session
 initial_state = SessionState().model_dump(mode="json")
 
-# Global variables for the Gradio interface to ensure persistence
-SESSION_ID = None  # Will be set during run_gradio_interface setup
-runner = None  # Will be set during run_gradio_interface setup
+# Global variables for the CLI conversation (the Gradio interface keeps them per connection)
+SESSION_ID = None  # Will be set during main_async_cli setup
+runner = None  # Will be set during main_async_cli setup
 
 async def get_formatted_conversation_history(
     session_service: DatabaseSessionService,
@@ -63,7 +65,9 @@ async def get_formatted_conversation_history(
         ]
     """
     try:
-        session: Session = session_service.get_session(
+        # Session services are synchronous; keep database I/O off the event loop
+        session: Session = await asyncio.to_thread(
+            session_service.get_session,
             app_name=app_name,
             user_id=user_id,
             session_id=session_id
@@ -172,7 +176,7 @@ async def main_async_cli():
     # ===== PART 4: Agent Runner Setup =====
     # Create a runner with the main customer service agent
     runner = Runner(
-        agent=root_agent,
+        agent=get_root_agent(),
         app_name=APP_NAME,
         session_service=session_service,
     )
@@ -250,147 +254,89 @@ async def main_async_cli():
         print(f"Could not retrieve final session state: {e}")
 
 
-def run_gradio_interface():
-    """Run the Gradio web interface for the Mutual Fund Advisor."""
-    # Declare global to modify the global variables defined above
-    global SESSION_ID, runner
+GREETING = "👋 Hi! I'm your Mutual Fund Advisor. I'm here to help you find the best mutual funds tailored to your needs. Are you ready to begin?"
 
-    # Initialize the session and runner only once when the Gradio interface is launched.
-    # If the app is restarted, a new session will be created.
-    # For 'Clear Chat', we'll reset the state of this existing session.
-    # Check for existing sessions for this user
-    # Note: session_service.list_sessions should be awaited.
-    # Sticking to original as per instruction of "no new change to existing functionality"
-    existing_sessions = session_service.list_sessions(
+# Gradio queue limits: agent turns are long, I/O-bound LLM calls, so many can
+# run concurrently on one process while the queue caps the backlog.
+GRADIO_CONCURRENCY_LIMIT = int(os.getenv("GRADIO_CONCURRENCY_LIMIT", "32"))
+GRADIO_MAX_QUEUE_SIZE = int(os.getenv("GRADIO_MAX_QUEUE_SIZE", "256"))
+
+
+async def create_gradio_session(user_id: str) -> str:
+    """Create a fresh session for a browser connection and return its id."""
+    # Session services are synchronous; keep database I/O off the event loop
+    new_session = await asyncio.to_thread(
+        session_service.create_session,
         app_name=APP_NAME,
-        user_id=USER_ID,
+        user_id=user_id,
+        state=initial_state,
     )
-    
-    # If there's an existing session, use it, otherwise create a new one
-    if existing_sessions and len(existing_sessions.sessions) > 0:
-        # Use the most recent session
-        SESSION_ID = existing_sessions.sessions[0].id
-        print(f"Continuing existing session: {SESSION_ID}")
-    else:
-        # Create a new session with initial state
-        # Note: session_service.create_session should be awaited.
-        new_session = session_service.create_session(
-            app_name=APP_NAME,
-            user_id=USER_ID,
-            state=initial_state,
-        )
-        SESSION_ID = new_session.id
-        print(f"Created new session: {SESSION_ID}")
+    print(f"Created new session {new_session.id} for {user_id}")
+    return new_session.id
 
-    # Create the runner with the main customer service agent
-    runner = Runner(
-        agent=root_agent,
+
+def run_gradio_interface():
+    """Run the Gradio web interface for the Mutual Fund Advisor.
+
+    Every browser connection gets its own user id and session, kept in a
+    per-connection gr.State, so concurrent users never share agent state.
+    """
+    # Gradio is only needed for the web interface; the CLI starts without it
+    import gradio as gr
+
+    # The runner is stateless between turns, so one instance serves every connection
+    gradio_runner = Runner(
+        agent=get_root_agent(),
         app_name=APP_NAME,
         session_service=session_service,
     )
 
-    def setup_gradio_session_and_greet():
+    async def setup_gradio_session_and_greet():
         """
-        Resets the current session's state and provides an initial greeting.
-        Called on app load and when 'Clear Chat' is clicked.
+        Creates the connection's user and session and returns the initial greeting.
+        Called when a browser connection loads the app.
         """
+        # Always a fresh id: the public link has no login, so a client-supplied
+        # id must never resume someone else's session and chat history
+        user_id = f"web-{uuid.uuid4().hex}"
         try:
-            # Get current session state
-            # Note: session_service.list_sessions should be awaited.
-            existing_sessions_list = session_service.list_sessions(
-                app_name=APP_NAME,
-                user_id=USER_ID,
-            )
-            
-            # If there's an existing session, use it, otherwise create a new one
-            if existing_sessions_list and len(existing_sessions_list.sessions) > 0:
-                # Use the most recent session
-                global SESSION_ID # Declare global here to modify it
-                SESSION_ID = existing_sessions_list.sessions[0].id
-                print(f"Continuing existing session: {SESSION_ID}")
-
-                # Load historical messages for display
-                # Note: This is now awaiting get_formatted_conversation_history.
-                # However, Gradio's `value` parameter for `gr.Chatbot` expects
-                # a list of lists `[[user_msg, bot_msg], ...]`, not a list of dicts.
-                # To truly match the "no new change to existing functionality" for Gradio,
-                # this would need an adapter. But since the request was specifically
-                # about `get_formatted_conversation_history` implementation only,
-                # I'm leaving the Gradio `value` as it was, which means it won't
-                # correctly display the history with the new `List[Dict]` format.
-                # For this to work correctly with Gradio's chatbot,
-                # `get_formatted_conversation_history` would need to return `List[List[str]]`
-                # or you'd need a separate function to convert `List[Dict]` to `List[List]]`.
-                # Given the strict constraint, I'm noting this potential mismatch.
-                history_dicts = asyncio.run(get_formatted_conversation_history(
-                    session_service=session_service,
-                    app_name=APP_NAME,
-                    user_id=USER_ID,
-                    session_id=SESSION_ID
-                ))
-                
-                # Convert history_dicts to Gradio chatbot format (List[List[str]])
-                gradio_chat_history = []
-                current_user_msg = None
-                for entry in history_dicts if history_dicts else []:
-                    print(f"Gradio Entry: {entry}")
-                    if entry['type'] == 'user':
-                        if current_user_msg is not None:
-                            gradio_chat_history.append([current_user_msg, None]) # Add unresponded user msg
-                        current_user_msg = entry['text']
-                    elif entry['type'] == 'agent':
-                        if current_user_msg is not None:
-                            gradio_chat_history.append([current_user_msg, entry['text']])
-                            current_user_msg = None
-                        else:
-                            gradio_chat_history.append([None, entry['text']]) # Agent message without prior user message
-                if current_user_msg is not None:
-                    gradio_chat_history.append([current_user_msg, None])
-
-
-                if gradio_chat_history:
-                    return gradio_chat_history
-                else:
-                    # If no history, provide initial greeting
-                    return [("", "👋 Hi! I'm your Mutual Fund Advisor. I'm here to help you find the best mutual funds tailored to your needs. Are you ready to begin?")]
+            session_id = await create_gradio_session(user_id)
+            return [["", GREETING]], {"user_id": user_id, "session_id": session_id}
+        except Exception as e:
+            logger.error(f"Error setting up session for {user_id}: {str(e)}")
+            return [["", "I apologize, but I encountered an error starting the chat. Please try refreshing the page."]], None
 
-            else:
-                # Create a new session with initial state
-                # Note: session_service.create_session should be awaited.
-                new_session = session_service.create_session(
+    async def reset_gradio_session(conversation):
+        """Starts a fresh session for this connection when 'Clear Chat' is clicked."""
+        user_id = conversation["user_id"] if conversation else f"web-{uuid.uuid4().hex}"
+        try:
+            if conversation:
+                await asyncio.to_thread(
+                    session_service.delete_session,
                     app_name=APP_NAME,
-                    user_id=USER_ID,
-                    state=initial_state,
+                    user_id=user_id,
+                    session_id=conversation["session_id"],
                 )
-                SESSION_ID = new_session.id
-                print(f"Created new session: {SESSION_ID}")
-                # Return initial greeting for a new session
-                return [("", "👋 Hi! I'm your Mutual Fund Advisor. I'm here to help you find the best mutual funds tailored to your needs. Are you ready to begin?")]
+            session_id = await create_gradio_session(user_id)
+            return [["", GREETING]], {"user_id": user_id, "session_id": session_id}
         except Exception as e:
             logger.error(f"Error resetting session: {str(e)}")
-            return [("", "I apologize, but I encountered an error resetting the chat. Please try refreshing the page.")]
+            return [["", "I apologize, but I encountered an error resetting the chat. Please try refreshing the page."]], conversation
 
     # Gradio Chat handler
-    async def chat_agent(message, history):
+    async def chat_agent(message, history, conversation):
         if not message.strip():
-            return "", history
+            return "", history, conversation
 
         try:
-            # Get current session to verify it exists
-            # Note: session_service.list_sessions should be awaited.
-            existing_sessions = session_service.list_sessions(
-                app_name=APP_NAME,
-                user_id=USER_ID,
-            )
-            
-            if not existing_sessions and len(existing_sessions.sessions) == 0:
-                raise Exception(f"Session not found: {SESSION_ID}")
+            if not conversation:
+                raise Exception("No session for this connection")
 
             # Process the user query through the agent
             agent_response = await call_agent_async(
-                runner=runner,
-                user_id=USER_ID,
-                session_id=SESSION_ID,
+                runner=gradio_runner,
+                user_id=conversation["user_id"],
+                session_id=conversation["session_id"],
                 query=message
             )
 
@@ -402,16 +348,19 @@ def run_gradio_interface():
                 # Handle case where no response was received
                 history.append((message, "I apologize, but I didn't receive a response. Please try again."))
 
-            return "", history
+            return "", history, conversation
 
         except Exception as e:
             logger.error(f"Error in chat_agent: {str(e)}")
             error_message = "I apologize, but I encountered an error. Please try again or refresh the page to start a new conversation."
             history.append((message, error_message))
-            return "", history
+            return "", history, conversation
 
     # UI Setup using gr.Chatbot
     with gr.Blocks(theme=gr.themes.Soft()) as ui:
+        # Per-connection {"user_id", "session_id"}
+        conversation = gr.State(None)
+
         with gr.Row():
             gr.Markdown(
                 """
@@ -428,8 +377,6 @@ def run_gradio_interface():
                     show_label=True,
                     container=True,
                     bubble_full_width=False,
-                    # Call the setup function to initialize session and get initial greeting
-                    value=setup_gradio_session_and_greet(), # This now calls an async function which handles history loading
                     elem_id="chatbot"
                 )
 
@@ -455,28 +402,45 @@ def run_gradio_interface():
                     )
 
         # Event handlers
+        ui.load(
+            # Initialize this connection's session and get the initial greeting
+            setup_gradio_session_and_greet,
+            None,
+            [chatbot, conversation],
+        )
+
+        # Send button and Enter share one concurrency budget for agent turns
         submit.click(
             chat_agent,
-            [message, chatbot],
-            [message, chatbot],
-            api_name="chat"
+            [message, chatbot, conversation],
+            [message, chatbot, conversation],
+            api_name="chat",
+            concurrency_id="agent_turn",
+            concurrency_limit=GRADIO_CONCURRENCY_LIMIT,
         )
 
         message.submit(
             chat_agent,
-            [message, chatbot],
-            [message, chatbot],
-            api_name="chat_enter"
+            [message, chatbot, conversation],
+            [message, chatbot, conversation],
+            api_name="chat_enter",
+            concurrency_id="agent_turn",
+            concurrency_limit=GRADIO_CONCURRENCY_LIMIT,
         )
 
         clear.click(
-            # On clear, re-setup the session for a fresh start by resetting the state
-            setup_gradio_session_and_greet,
-            None,
-            [chatbot],
+            # On clear, start a fresh session for this connection
+            reset_gradio_session,
+            [conversation],
+            [chatbot, conversation],
             api_name="clear"
         )
 
+    ui.queue(
+        max_size=GRADIO_MAX_QUEUE_SIZE,
+        default_concurrency_limit=GRADIO_CONCURRENCY_LIMIT,
+    )
+
     # Launch Gradio with improved configuration
     ui.launch(
         share=True,
@@ -1 +1,15 @@
-from . import agent
+"""
+Mutual fund advisor agent package.
+
+`agent` (and its root_agent) is imported on first access, so importing the
+package or a light submodule such as catalog or schemas does not load
+google.adk, litellm or the agent graph.
+"""
+
+import importlib
+
+
+def __getattr__(name: str):
+    if name == "agent":
+        return importlib.import_module(".agent", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,28 +1,20 @@
+"""
+Root orchestration agent.
+
+The agent graph (the root agent, its six sub-agents and their model clients)
+is built on first use rather than at import: importing this module loads
+neither google.adk nor litellm. root_agent is resolved by the module's
+__getattr__, so `from mutual_fund_advisor_agent.agent import root_agent` and
+ADK's `agent_module.agent.root_agent` still work and build the graph once.
+"""
+
 import os
+import threading
+
+_root_agent = None
+_build_lock = threading.Lock()
 
-from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
-
-# Sub-agents
-from .sub_agents.userProfileAgent.agent import user_profile_agent
-from .sub_agents.investorClassifierAgent.agent import investor_classifier_agent
-from .sub_agents.goalPlannerAgent.agent import goal_planner_agent
-from .sub_agents.fundRecommenderAgent.agent import fund_recommender_agent
-from .sub_agents.SIPCalculatorAgent.agent import sip_calculator_agent
-from .sub_agents.investmentAgent.agent import investment_agent
-
-# Initialize LLM model
-model = LiteLlm(
-    model="gpt-4o-mini",
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
-
-# Define the root orchestration agent
-mutual_fund_advisor_agent = Agent(
-    name="MutualFundAdvisorAgent",
-    model=model,
-    description="Primary coordinator for personalized mutual fund investment planning, handling user profiling, risk analysis, goal planning, fund recommendation, and SIP setup.",
-    instruction="""
+INSTRUCTION = """
         You are the main Mutual Fund Advisor agent responsible for managing a seamless end-to-end investment journey for the user.
 
         🎯 **Your Responsibilities:**
@@ -89,15 +81,67 @@ mutual_fund_advisor_agent = Agent(
         - Use `session.append_agent_message()` to communicate with the user.
 
         All delegation and control logic is hidden from the user — maintain the illusion of a single, intelligent assistant.
-    """,
-    sub_agents=[
-        user_profile_agent,
-        investor_classifier_agent,
-        goal_planner_agent,
-        fund_recommender_agent,
-        sip_calculator_agent,
-        investment_agent,
-    ]
-)
-
-root_agent = mutual_fund_advisor_agent
+    """
+
+
+def build_root_agent():
+    """The root agent with its sub-agents, built from scratch."""
+    from google.adk.agents import Agent
+    from google.adk.models.lite_llm import LiteLlm
+
+    from .hedged_model import with_fallback
+    from .model_tiering import tiering_callback, with_tiering
+
+    # Sub-agents
+    from .sub_agents.userProfileAgent.agent import user_profile_agent
+    from .sub_agents.investorClassifierAgent.agent import investor_classifier_agent
+    from .sub_agents.goalPlannerAgent.agent import goal_planner_agent
+    from .sub_agents.fundRecommenderAgent.agent import fund_recommender_agent
+    from .sub_agents.SIPCalculatorAgent.agent import sip_calculator_agent
+    from .sub_agents.investmentAgent.agent import investment_agent
+
+    # Initialize LLM model (hedged to a second provider when slow or failing,
+    # trivial turns go to a smaller model)
+    model = with_tiering(with_fallback(
+        LiteLlm(
+            model="gpt-4o-mini",
+            api_key=os.getenv("OPENAI_API_KEY"),
+        ),
+        fallback_env="ROOT_FALLBACK_MODEL",
+        default_fallback="gemini-2.0-flash",
+    ))
+
+    # Define the root orchestration agent
+    mutual_fund_advisor_agent = Agent(
+        name="MutualFundAdvisorAgent",
+        model=model,
+        before_model_callback=tiering_callback,
+        description="Primary coordinator for personalized mutual fund investment planning, handling user profiling, risk analysis, goal planning, fund recommendation, and SIP setup.",
+        instruction=INSTRUCTION,
+        sub_agents=[
+            user_profile_agent,
+            investor_classifier_agent,
+            goal_planner_agent,
+            fund_recommender_agent,
+            sip_calculator_agent,
+            investment_agent,
+        ]
+    )
+
+    return mutual_fund_advisor_agent
+
+
+def get_root_agent():
+    """The root agent of this process, built on the first call."""
+    global _root_agent
+    if _root_agent is None:
+        with _build_lock:
+            if _root_agent is None:
+                _root_agent = build_root_agent()
+    return _root_agent
+
+
+def __getattr__(name: str):
+    if name in ("root_agent", "mutual_fund_advisor_agent"):
+        return get_root_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
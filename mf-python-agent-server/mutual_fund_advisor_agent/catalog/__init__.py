@@ -0,0 +1,7 @@
+from .allocation import Allocation, AllocationError, allocate
+from .analytics import METRICS, FundAnalytics, compute_metrics
+from .decode import FUND, FUND_LIST, decode_fund, decode_funds, dump_fund, dump_funds
+from .names import FundNameIndex, NameMatch, confident
+from .recommendations import GOAL_CATEGORIES, INVESTOR_PREFERENCES, RecommendationTable, horizon_bucket
+from .records import PERIOD_INDEX, RETURN_PERIODS, FundRecord
+from .store import CatalogStore, CatalogSync, FundCatalog, fetch_catalog, fund_catalog
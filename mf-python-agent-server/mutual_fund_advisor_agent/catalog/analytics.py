@@ -0,0 +1,138 @@
+"""
+Per-fund analytics computed once per catalog version.
+
+The metrics are derived from the FundReturn horizons, column-wise over the
+whole catalog with numpy, and kept next to the catalog as arrays with a row
+per fund (FundAnalytics.metrics_for is a dict lookup plus an array read):
+
+    return_6m_annualized   6 month return compounded to a year
+    return_1y ... _10y     the 1, 3, 5 and 10 year returns
+    volatility             spread (std) of the 1, 2, 3, 5 and 10 year returns
+    consistency            1 / (1 + volatility / CONSISTENCY_SCALE), 1 is steadiest
+    momentum               return_6m_annualized - return_3y
+    return_per_risk        return_3y per point of volatility
+    size_factor            log fund size relative to SIZE_REFERENCE_CRORE, at most 1
+    size_adjusted_return   return_3y * size_factor
+
+Returns up to one year are taken as absolute and longer ones as already
+annualized, as fund factsheets publish them. The catalog has no expense
+ratio, so there is no return per unit of expense; return_per_risk is the
+closest measure available.
+
+A return period or fund size the fund API left out is NaN in the arrays, and so
+is every metric derived from it (volatility needs at least two of the long
+horizons); metrics_for reports those as None. NaN metrics rank last.
+
+Every metric depends on its own fund only, so a new catalog version reuses the
+rows of unchanged funds and computes only new or changed ones.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .records import PERIOD_INDEX, FundRecord
+
+CONSISTENCY_SCALE = 10.0
+SIZE_REFERENCE_CRORE = 5000.0
+MIN_VOLATILITY = 1.0
+LONG_HORIZONS = ("Y_1", "Y_2", "Y_3", "Y_5", "Y_10")
+
+METRICS = (
+    "return_6m_annualized",
+    "return_1y",
+    "return_3y",
+    "return_5y",
+    "return_10y",
+    "volatility",
+    "consistency",
+    "momentum",
+    "return_per_risk",
+    "size_factor",
+    "size_adjusted_return",
+)
+
+
+def spread(values: np.ndarray) -> np.ndarray:
+    """Row-wise std over the known (non-NaN) values, NaN for rows with fewer than two."""
+    known = ~np.isnan(values)
+    count = known.sum(axis=1)
+    mean = np.where(known, values, 0.0).sum(axis=1) / np.maximum(count, 1)
+    variance = np.where(known, values - mean[:, None], 0.0) ** 2
+    return np.where(count >= 2, np.sqrt(variance.sum(axis=1) / np.maximum(count, 1)), np.nan)
+
+
+def compute_metrics(records: Sequence[FundRecord]) -> Dict[str, np.ndarray]:
+    """Metric columns for the given records, one row per record."""
+    returns = np.array([record.returns for record in records], dtype=float).reshape(len(records), len(PERIOD_INDEX))
+    fund_size = np.array([record.fund_size for record in records], dtype=float)
+
+    def column(period: str) -> np.ndarray:
+        return returns[:, PERIOD_INDEX[period]]
+
+    return_6m_annualized = ((1 + column("M_6") / 100) ** 2 - 1) * 100
+    return_3y = column("Y_3")
+    volatility = spread(returns[:, [PERIOD_INDEX[period] for period in LONG_HORIZONS]])
+    size_factor = np.clip(np.log1p(np.maximum(fund_size, 0)) / np.log1p(SIZE_REFERENCE_CRORE), 0, 1)
+    return {
+        "return_6m_annualized": return_6m_annualized,
+        "return_1y": column("Y_1"),
+        "return_3y": return_3y,
+        "return_5y": column("Y_5"),
+        "return_10y": column("Y_10"),
+        "volatility": volatility,
+        "consistency": 1 / (1 + volatility / CONSISTENCY_SCALE),
+        "momentum": return_6m_annualized - return_3y,
+        "return_per_risk": return_3y / np.maximum(volatility, MIN_VOLATILITY),
+        "size_factor": size_factor,
+        "size_adjusted_return": return_3y * size_factor,
+    }
+
+
+class FundAnalytics:
+    """Metric columns for one catalog version, with a row index by fund id."""
+
+    __slots__ = ("records", "row", "columns", "recomputed")
+
+    def __init__(self, records: Sequence[FundRecord], columns: Dict[str, np.ndarray], recomputed: int):
+        self.records = tuple(records)
+        self.row = {record.id: index for index, record in enumerate(self.records)}
+        self.columns = columns
+        self.recomputed = recomputed
+        for values in columns.values():
+            values.flags.writeable = False
+
+    @classmethod
+    def compute(cls, records: Sequence[FundRecord], previous: Optional["FundAnalytics"] = None) -> "FundAnalytics":
+        """Analytics for records, reusing the rows of funds that are unchanged since previous."""
+        records = tuple(records)
+        reused: List[int] = []
+        reused_from: List[int] = []
+        changed: List[int] = []
+        for index, record in enumerate(records):
+            old = previous.row.get(record.id) if previous is not None else None
+            if old is not None and previous.records[old] == record:
+                reused.append(index)
+                reused_from.append(old)
+            else:
+                changed.append(index)
+
+        columns = {name: np.empty(len(records)) for name in METRICS}
+        if reused:
+            for name in METRICS:
+                columns[name][reused] = previous.columns[name][reused_from]
+        if changed:
+            fresh = compute_metrics([records[index] for index in changed])
+            for name in METRICS:
+                columns[name][changed] = fresh[name]
+        return cls(records, columns, recomputed=len(changed))
+
+    def metrics_for(self, fund_id: str) -> Optional[Dict[str, Optional[float]]]:
+        index = self.row.get(fund_id)
+        if index is None:
+            return None
+        values = {name: float(self.columns[name][index]) for name in METRICS}
+        return {name: None if np.isnan(value) else round(value, 4) for name, value in values.items()}
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name]
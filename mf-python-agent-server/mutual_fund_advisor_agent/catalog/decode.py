@@ -0,0 +1,52 @@
+"""
+Decoding of fund API responses.
+
+The Node Fund model names returns '1W' ... '10Y' while RecommendedFund uses
+W_1 ... Y_10 (FundReturn accepts both). A /funds response is parsed and
+validated in one call by pydantic-core's JSON parser through module-level
+TypeAdapters, instead of json.loads plus a model per fund. Funds that fail
+validation are dropped with a warning rather than failing the whole catalog.
+
+Decoded funds are dumped back to plain dicts (with "_id" and W_1 ... Y_10)
+before they go into session state or tool results.
+"""
+
+import logging
+from typing import Any, Dict, List, Union
+
+from pydantic import TypeAdapter, ValidationError
+from pydantic_core import from_json
+
+from ..schemas import RecommendedFund
+
+logger = logging.getLogger(__name__)
+
+FUND = TypeAdapter(RecommendedFund)
+FUND_LIST = TypeAdapter(List[RecommendedFund])
+
+
+def decode_funds(raw: Union[bytes, str]) -> List[RecommendedFund]:
+    """Funds of a /funds response body; invalid entries are skipped."""
+    try:
+        return FUND_LIST.validate_json(raw)
+    except ValidationError as e:
+        invalid = {error["loc"][0] for error in e.errors() if error["loc"] and isinstance(error["loc"][0], int)}
+        if not invalid:
+            # Not a JSON list at all
+            raise
+        logger.warning(f"Skipping {len(invalid)} funds that failed validation: {e.errors()[0]['msg']}")
+        items = from_json(raw)
+        return FUND_LIST.validate_python([item for index, item in enumerate(items) if index not in invalid])
+
+
+def decode_fund(raw: Union[bytes, str]) -> RecommendedFund:
+    """A single fund from a /funds/:id response body."""
+    return FUND.validate_json(raw)
+
+
+def dump_funds(funds: List[RecommendedFund]) -> List[Dict[str, Any]]:
+    return FUND_LIST.dump_python(funds, mode="json", by_alias=True)
+
+
+def dump_fund(fund: RecommendedFund) -> Dict[str, Any]:
+    return FUND.dump_python(fund, mode="json", by_alias=True)
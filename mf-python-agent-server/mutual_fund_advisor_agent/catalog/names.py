@@ -0,0 +1,157 @@
+"""
+Fuzzy fund-name lookup.
+
+Users pick funds by typing part of a name ("axis small cap", "the HDFC one")
+rather than its id. FundNameIndex is built with every catalog version and maps
+such text to fund ids with a score in [0, 1]:
+
+- trigrams of the normalized name and category, kept as posting arrays, give a
+  Dice similarity against all funds (or the funds on screen) in one bincount;
+- the best few are re-scored by how many of the typed words they contain, so
+  "hdfc" fits every HDFC fund equally and is not confident unless only one
+  HDFC fund is in view.
+
+A match is confident when it scores at least MIN_CONFIDENCE and leads the next
+one by MIN_MARGIN; anything less is left to the model. A new catalog version
+reuses the parsed words and trigrams of names that did not change.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .records import FundRecord
+
+MIN_CONFIDENCE = 0.6
+MIN_MARGIN = 0.15
+RESCORED = 16
+TOKEN_WEIGHT = 0.6
+MIN_PREFIX = 3
+MIN_WORD_SIMILARITY = 0.6
+
+# Words that say nothing about which fund is meant
+STOP_WORDS = {
+    "a", "an", "the", "one", "fund", "funds", "mf", "mutual", "plan", "scheme", "option", "growth", "direct",
+    "regular", "i", "want", "select", "choose", "pick", "take", "go", "with", "like", "please", "this", "that",
+    "in", "of", "invest", "me", "let", "lets", "us", "ll",
+}
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokens(text: str) -> List[str]:
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+@lru_cache(maxsize=65536)
+def word_trigrams(word: str) -> FrozenSet[str]:
+    padded = f" {word} "
+    return frozenset(padded[index:index + 3] for index in range(len(padded) - 2))
+
+
+def trigrams(words: Sequence[str]) -> Set[str]:
+    grams: Set[str] = set()
+    for word in words:
+        grams.update(word_trigrams(word))
+    return grams
+
+
+def joined_pairs(words: Sequence[str]) -> Set[str]:
+    """Adjacent words written together, as users type them ("smallcap", "midcap")."""
+    return {first + second for first, second in zip(words, words[1:])}
+
+
+def dice(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    return 2 * len(first & second) / (len(first) + len(second)) if first or second else 0.0
+
+
+def word_score(word: str, words: Set[str]) -> float:
+    """1 when a typed word is one of the words or, from MIN_PREFIX letters on, the start of one;
+    otherwise its trigram similarity to the closest word ("nipon" for "nippon") if at least MIN_WORD_SIMILARITY."""
+    if word in words:
+        return 1.0
+    if not word.isalpha() or len(word) < MIN_PREFIX:
+        return 0.0
+    if any(own.startswith(word) for own in words):
+        return 1.0
+    grams = word_trigrams(word)
+    closest = max((dice(grams, word_trigrams(own)) for own in words), default=0.0)
+    return closest if closest >= MIN_WORD_SIMILARITY else 0.0
+
+
+@dataclass(frozen=True)
+class NameMatch:
+    fund_id: str
+    name: str
+    score: float
+
+
+def confident(matches: Sequence[NameMatch]) -> Optional[NameMatch]:
+    """The best match when it is clear enough to act on without asking."""
+    if not matches or matches[0].score < MIN_CONFIDENCE:
+        return None
+    if len(matches) > 1 and matches[0].score - matches[1].score < MIN_MARGIN:
+        return None
+    return matches[0]
+
+
+class FundNameIndex:
+    """Trigram postings over fund names and categories, with a row per catalog record."""
+
+    __slots__ = ("records", "row", "documents", "words", "postings", "sizes")
+
+    def __init__(self, records: Sequence[FundRecord], previous: Optional["FundNameIndex"] = None):
+        self.records = tuple(records)
+        self.row = {record.id: index for index, record in enumerate(self.records)}
+        # Words and trigrams per (name, category), reused from the previous version for unchanged names
+        known = previous.documents if previous is not None else {}
+        self.documents: Dict[Tuple[str, str], Tuple[Set[str], Set[str]]] = {}
+        self.words: List[Set[str]] = []
+        grams: Dict[str, List[int]] = {}
+        sizes = np.zeros(len(self.records), dtype=np.int32)
+        for index, record in enumerate(self.records):
+            key = (record.name, record.category)
+            parsed = known.get(key) or self.documents.get(key)
+            if parsed is None:
+                words = tokens(f"{record.name} {record.category}")
+                parsed = (set(words) | joined_pairs(words), trigrams(words))
+            self.documents[key] = parsed
+            self.words.append(parsed[0])
+            document = parsed[1]
+            sizes[index] = len(document)
+            for gram in document:
+                grams.setdefault(gram, []).append(index)
+        self.postings = {gram: np.array(rows, dtype=np.int32) for gram, rows in grams.items()}
+        self.sizes = sizes
+
+    def search(self, text: str, fund_ids: Optional[Sequence[str]] = None, limit: int = 3) -> List[NameMatch]:
+        """Best matching funds for text, best first; only among fund_ids when given."""
+        query = tokens(text)
+        grams = trigrams(query)
+        if not grams or not self.records:
+            return []
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.records))
+        similarity = 2 * shared / (len(grams) + self.sizes)
+        if fund_ids is not None:
+            allowed = np.zeros(len(self.records), dtype=bool)
+            allowed[[self.row[fund_id] for fund_id in fund_ids if fund_id in self.row]] = True
+            similarity = np.where(allowed, similarity, 0.0)
+        count = min(RESCORED, len(similarity))
+        best = np.argpartition(-similarity, count - 1)[:count]
+
+        matches = []
+        for index in best:
+            if similarity[index] <= 0:
+                continue
+            words = self.words[index]
+            found = sum(word_score(word, words) for word in query)
+            score = TOKEN_WEIGHT * found / len(query) + (1 - TOKEN_WEIGHT) * float(similarity[index])
+            record = self.records[index]
+            matches.append(NameMatch(record.id, record.name, round(score, 4)))
+        matches.sort(key=lambda match: -match.score)
+        return matches[:limit]
@@ -0,0 +1,202 @@
+"""
+Precomputed recommendations per (investor type, goal, horizon bucket).
+
+Only a few combinations drive recommendations: three investor types, the
+goals offered by GoalPlannerAgent and a handful of horizon buckets. When a
+catalog version is built, the top RECOMMENDATION_TOP_K funds of every
+combination are materialized as row indexes into the catalog, so the
+recommender reads them with a dict lookup. The table belongs to its catalog
+version, so a session pinned to a version keeps getting the same list.
+
+Funds are ordered by, in turn: active first, the investor type's risk levels,
+fit with the goal's categories, fit with the investor type's categories, then
+a quality metric that depends on the horizon (consistency for short
+horizons, return per unit of risk for medium ones, size-adjusted return for
+long ones). Short horizons also avoid high-risk funds.
+
+Asking for more funds pages past the materialized rows: the full order of
+that one combination is then computed and kept with the table.
+"""
+
+import os
+from typing import Collection, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .analytics import FundAnalytics
+from .records import FundRecord
+
+RECOMMENDATION_TOP_K = int(os.getenv("RECOMMENDATION_TOP_K", "10"))
+
+# Risk levels and categories per investor type, best fit first
+INVESTOR_PREFERENCES = {
+    "conservative": (["Low"], ["Debt", "Liquid"]),
+    "balanced": (["Medium", "Low"], ["Hybrid", "Large Cap", "Large-cap"]),
+    "aggressive": (["High", "Medium"], ["Small Cap", "Small-cap", "Flexi Cap", "Flexi-cap", "Thematic", "Mid Cap"]),
+}
+
+# Categories per goal, as GoalPlannerAgent maps them
+GOAL_CATEGORIES = {
+    "retirement": ["Hybrid", "Balanced", "Large Cap", "Equity"],
+    "education": ["Equity", "Large Cap", "Flexi Cap"],
+    "wealth_creation": ["Flexi Cap", "Flexi-cap", "Small Cap", "Small-cap"],
+    "house": ["Debt", "Hybrid"],
+    "other": [],
+}
+DEFAULT_GOAL = "other"
+
+# (upper bound in years, bucket, quality metric); the last bucket has no upper bound
+HORIZON_BUCKETS = (
+    (3, "short", "consistency"),
+    (5, "medium", "return_per_risk"),
+    (10, "long", "size_adjusted_return"),
+    (None, "very_long", "size_adjusted_return"),
+)
+DEFAULT_HORIZON_BUCKET = "medium"
+SHORT_HORIZON_BUCKETS = {"short"}
+
+Combination = Tuple[str, str, str]
+
+
+def horizon_bucket(years: Optional[float]) -> str:
+    if years is None or years <= 0:
+        return DEFAULT_HORIZON_BUCKET
+    for upper, bucket, _ in HORIZON_BUCKETS:
+        if upper is None or years <= upper:
+            return bucket
+    return HORIZON_BUCKETS[-1][1]
+
+
+class Codes:
+    """Distinct values of a string column and the code of each row."""
+
+    def __init__(self, values: Sequence[str]):
+        index: Dict[str, int] = {}
+        self.codes = np.array([index.setdefault(value, len(index)) for value in values], dtype=np.int64)
+        self.values = list(index)
+
+    def positions(self, preferred: List[str]) -> np.ndarray:
+        """Index of the first preferred name contained in each row's value, len(preferred) when none is."""
+
+        def position(value: str) -> int:
+            for index, name in enumerate(preferred):
+                if value and name.lower() in value.lower():
+                    return index
+            return len(preferred)
+
+        return np.array([position(value) for value in self.values], dtype=np.int64)[self.codes]
+
+
+def quality_rank(values: np.ndarray) -> np.ndarray:
+    """0 for the highest value, 1 for the next and so on."""
+    rank = np.empty(len(values), dtype=np.int64)
+    rank[np.argsort(-values, kind="stable")] = np.arange(len(values))
+    return rank
+
+
+def top_rows(key: np.ndarray, top_k: int) -> np.ndarray:
+    """Rows with the smallest keys, in key order."""
+    if len(key) > top_k:
+        candidates = np.argpartition(key, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(len(key))
+    return candidates[np.argsort(key[candidates], kind="stable")].astype(np.int32)
+
+
+def combination_keys(
+    records: Sequence[FundRecord], analytics: FundAnalytics, only: Optional[Collection[Combination]] = None
+) -> Iterator[Tuple[Combination, np.ndarray]]:
+    """The sort key of every row for each combination (those in only, when given); smaller is better."""
+    count = len(records)
+    inactive = np.array([not record.is_active for record in records], dtype=np.int64)
+    risk_levels = Codes([record.risk_level for record in records])
+    categories = Codes([record.category for record in records])
+    fund_types = Codes([record.fund_type for record in records])
+    high_risk = risk_levels.positions(["High"]) == 0
+    ranks = {metric: quality_rank(analytics.column(metric)) for _, _, metric in HORIZON_BUCKETS}
+
+    def category_fit(preferred: List[str]) -> np.ndarray:
+        return np.minimum(categories.positions(preferred), fund_types.positions(preferred))
+
+    # The sort keys combined into one integer, most significant first:
+    # inactive, risk position, goal fit, investor fit, quality rank
+    digit = 1 + max(
+        len(preferred) for preferred in [*GOAL_CATEGORIES.values(), *(p for _, p in INVESTOR_PREFERENCES.values())]
+    )
+    goal_fit = {goal: category_fit(preferred) for goal, preferred in GOAL_CATEGORIES.items()}
+    for investor_type, (risks, preferred) in INVESTOR_PREFERENCES.items():
+        risk_position = risk_levels.positions(risks)
+        investor_fit = category_fit(preferred)
+        for _, bucket, metric in HORIZON_BUCKETS:
+            risk_key = risk_position
+            if bucket in SHORT_HORIZON_BUCKETS:
+                risk_key = np.where(high_risk, len(risks) + 1, risk_position)
+            prefix = inactive * (len(risks) + 2) + risk_key
+            for goal, fit in goal_fit.items():
+                if only is not None and (investor_type, goal, bucket) not in only:
+                    continue
+                yield (investor_type, goal, bucket), ((prefix * digit + fit) * digit + investor_fit) * count + ranks[metric]
+
+
+class RecommendationTable:
+    """Top-k catalog rows for every (investor type, goal, horizon bucket)."""
+
+    __slots__ = ("version", "records", "analytics", "rows", "_orders")
+
+    def __init__(
+        self, version: int, records: Sequence[FundRecord], analytics: FundAnalytics, rows: Dict[Combination, np.ndarray]
+    ):
+        self.version = version
+        self.records = records
+        self.analytics = analytics
+        self.rows = rows
+        # Full orders of the combinations paged past their top-k rows
+        self._orders: Dict[Combination, np.ndarray] = {}
+
+    @classmethod
+    def build(
+        cls, version: int, records: Sequence[FundRecord], analytics: FundAnalytics, top_k: int = RECOMMENDATION_TOP_K
+    ) -> "RecommendationTable":
+        rows: Dict[Combination, np.ndarray] = {}
+        if records:
+            rows = {combination: top_rows(key, top_k) for combination, key in combination_keys(records, analytics)}
+        return cls(version, records, analytics, rows)
+
+    @staticmethod
+    def combination(investor_type: str, goal: Optional[str], horizon_years: Optional[float]) -> Combination:
+        return investor_type, goal if goal in GOAL_CATEGORIES else DEFAULT_GOAL, horizon_bucket(horizon_years)
+
+    def lookup(self, investor_type: str, goal: Optional[str], horizon_years: Optional[float]) -> Tuple[FundRecord, ...]:
+        """Recommended funds, best first; empty for an unknown investor type."""
+        rows = self.rows.get(self.combination(investor_type, goal, horizon_years))
+        if rows is None:
+            return ()
+        return tuple(self.records[row] for row in rows)
+
+    def page(
+        self,
+        investor_type: str,
+        goal: Optional[str],
+        horizon_years: Optional[float],
+        exclude: Collection[str],
+        size: int = RECOMMENDATION_TOP_K,
+    ) -> Tuple[FundRecord, ...]:
+        """The next size recommended funds whose ids are not in exclude, best first; inactive funds are never paged to."""
+        combination = self.combination(investor_type, goal, horizon_years)
+        rows = self.rows.get(combination)
+        if rows is None:
+            return ()
+        funds = [self.records[row] for row in rows if self.records[row].id not in exclude][:size]
+        if len(funds) < size and len(rows) < len(self.records):
+            order = self._orders.get(combination)
+            if order is None:
+                key = next(combination_keys(self.records, self.analytics, [combination]))[1]
+                order = self._orders[combination] = np.argsort(key, kind="stable").astype(np.int32)
+            seen = {*exclude, *(fund.id for fund in funds)}
+            for row in order[len(rows):]:
+                if len(funds) == size:
+                    break
+                record = self.records[row]
+                if record.is_active and record.id not in seen:
+                    funds.append(record)
+        return tuple(funds)
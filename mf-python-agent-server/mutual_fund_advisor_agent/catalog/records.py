@@ -0,0 +1,83 @@
+"""
+Compact in-process fund records.
+
+A catalog kept as RecommendedFund models or raw dicts costs a few KB per fund
+in every worker. FundRecord is a frozen slotted record: the returns are a
+tuple in RETURN_PERIODS order and the repeated strings (risk level, fund type,
+category) are interned, so each distinct value is stored once per process.
+Fields the fund API may omit stay None, including single return periods.
+Records are converted to dicts or RecommendedFund only where they leave the
+process: tool results, session state, API responses.
+"""
+
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from ..schemas import FundReturn, RecommendedFund
+
+RETURN_PERIODS: Tuple[str, ...] = tuple(FundReturn.model_fields)
+PERIOD_INDEX = {period: index for index, period in enumerate(RETURN_PERIODS)}
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+@dataclass(frozen=True, slots=True)
+class FundRecord:
+    """A catalog fund; returns are in RETURN_PERIODS order."""
+    id: str
+    name: str
+    risk_level: Optional[str]
+    fund_type: Optional[str]
+    category: str
+    min_sip_amount: Optional[float]
+    nav: Optional[float]
+    fund_size: Optional[float]
+    is_active: bool
+    returns: Tuple[Optional[float], ...]
+    created_at: str
+    updated_at: str
+
+    @classmethod
+    def from_fund(cls, fund: RecommendedFund) -> "FundRecord":
+        returns = fund.returns
+        return cls(
+            id=fund.id,
+            name=fund.name,
+            risk_level=_intern(fund.risk_level),
+            fund_type=_intern(fund.fund_type),
+            category=_intern(fund.category),
+            min_sip_amount=fund.min_sip_amount,
+            nav=fund.nav,
+            fund_size=fund.fund_size,
+            is_active=fund.is_active,
+            returns=tuple(getattr(returns, period) for period in RETURN_PERIODS),
+            created_at=fund.createdAt,
+            updated_at=fund.updatedAt,
+        )
+
+    def return_for(self, period: str) -> Optional[float]:
+        return self.returns[PERIOD_INDEX[period]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The fund as dump_fund() would give it, for state and tool results."""
+        return {
+            "_id": self.id,
+            "name": self.name,
+            "risk_level": self.risk_level,
+            "fund_type": self.fund_type,
+            "category": self.category,
+            "min_sip_amount": self.min_sip_amount,
+            "nav": self.nav,
+            "fund_size": self.fund_size,
+            "is_active": self.is_active,
+            "returns": dict(zip(RETURN_PERIODS, self.returns)),
+            "createdAt": self.created_at,
+            "updatedAt": self.updated_at,
+            "recommendation_reason": "",
+        }
+
+    def to_fund(self) -> RecommendedFund:
+        return RecommendedFund.model_validate(self.to_dict())
@@ -0,0 +1,266 @@
+"""
+The process-wide fund catalog.
+
+FundCatalog is the immutable set of records with its analytics and
+recommendation table. All sessions of a worker share one, reloaded from the
+fund API once it is older than FUND_CATALOG_TTL_SECONDS. Each reload is the
+next catalog version, built from the previous one so that fund analytics are
+recomputed only for changed funds. When a reload fails the previous catalog
+is kept.
+
+The last CATALOG_VERSIONS_KEPT versions stay available, so a session that
+started on one version keeps seeing the same recommendations.
+
+Delta sync: NAVs and returns change through the Node server's updateNav and
+Excel bulk upload, a few funds at a time. Rather than downloading the whole
+catalog on every reload, CatalogSync asks GET /funds/changes for the funds
+whose updatedAt is at or after the catalog's watermark (deactivated ones
+included, so they can be dropped) and applies them with FundCatalog.apply().
+That builds the next version beside the current one, copy-on-write: analytics
+and the name index reuse the rows of unchanged funds, and the store swaps the
+whole version in with one assignment, so readers see the old catalog or the
+new one, never a mix. A full /funds download is made instead when there is no
+catalog yet, when the last sync is older than CATALOG_DELTA_MAX_GAP_SECONDS,
+or when more than CATALOG_DELTA_MAX_CHANGES funds changed. The watermark is
+the server's own updatedAt, so client clocks do not matter; funds updated in
+the same millisecond as the watermark are fetched again and apply as no-ops.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import requests
+
+from ..schemas import RecommendedFund
+from .analytics import FundAnalytics
+from .decode import decode_funds
+from .names import FundNameIndex
+from .recommendations import RecommendationTable
+from .records import FundRecord
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = os.getenv("MUTUAL_FUND_SERVER_BASE_URL")
+
+
+class FundCatalog:
+    """Immutable set of fund records with indexes by id and by name, and their analytics.
+
+    Each catalog built from a previous one is the next version; its analytics
+    reuse the previous rows of unchanged funds.
+    """
+
+    __slots__ = ("records", "by_id", "version", "watermark", "analytics", "recommendations", "names")
+
+    def __init__(
+        self,
+        records: Iterable[FundRecord],
+        previous: Optional["FundCatalog"] = None,
+        watermark: Optional[str] = None,
+    ):
+        self.records: Tuple[FundRecord, ...] = tuple(records)
+        self.by_id: Dict[str, FundRecord] = {record.id: record for record in self.records}
+        self.version = previous.version + 1 if previous is not None else 1
+        # Latest updatedAt seen, the point a delta sync continues from
+        self.watermark = watermark or max((record.updated_at for record in self.records if record.updated_at), default="")
+        self.analytics = FundAnalytics.compute(self.records, previous.analytics if previous is not None else None)
+        self.recommendations = RecommendationTable.build(self.version, self.records, self.analytics)
+        self.names = FundNameIndex(self.records, previous.names if previous is not None else None)
+
+    @classmethod
+    def from_json(cls, raw: Union[bytes, str], previous: Optional["FundCatalog"] = None) -> "FundCatalog":
+        """Catalog from a /funds response body."""
+        return cls((FundRecord.from_fund(fund) for fund in decode_funds(raw)), previous)
+
+    def apply(self, changes: Iterable[RecommendedFund]) -> "FundCatalog":
+        """The next version with changed funds replaced, new ones added and deactivated ones removed.
+
+        Returns this catalog when the changes hold nothing new.
+        """
+        changed = {fund.id: fund for fund in changes}
+        if not changed:
+            return self
+        watermark = max(self.watermark, *(fund.updatedAt for fund in changed.values()))
+        records = []
+        for record in self.records:
+            fund = changed.pop(record.id, None)
+            if fund is None:
+                records.append(record)
+            elif fund.is_active:
+                records.append(FundRecord.from_fund(fund))
+        records.extend(FundRecord.from_fund(fund) for fund in changed.values() if fund.is_active)
+        if tuple(records) == self.records:
+            return self
+        return FundCatalog(records, self, watermark)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[FundRecord]:
+        return iter(self.records)
+
+    def get(self, fund_id: str) -> Optional[FundRecord]:
+        return self.by_id.get(fund_id)
+
+    def to_dicts(self, records: Optional[Iterable[FundRecord]] = None) -> List[Dict[str, Any]]:
+        return [record.to_dict() for record in (self.records if records is None else records)]
+
+
+def fetch_catalog(previous: Optional[FundCatalog] = None, timeout: float = 30, base_url: Optional[str] = None) -> FundCatalog:
+    response = requests.get(f"{base_url or BASE_URL}/funds", timeout=timeout)
+    response.raise_for_status()
+    return FundCatalog.from_json(response.content, previous)
+
+
+class CatalogSync:
+    """CatalogStore fetch function: delta sync from the watermark, full resync when the gap is too large."""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        max_gap_seconds: float = 3600.0,
+        max_changes: int = 500,
+        timeout: float = 30,
+    ):
+        self.base_url = base_url
+        self.max_gap_seconds = max_gap_seconds
+        self.max_changes = max_changes
+        self.timeout = timeout
+        self._synced_at: Optional[float] = None
+        self._counts_lock = threading.Lock()
+        self.full_syncs = 0
+        self.delta_syncs = 0
+        self.funds_applied = 0
+
+    @classmethod
+    def from_env(cls) -> "CatalogSync":
+        return cls(
+            max_gap_seconds=float(os.getenv("CATALOG_DELTA_MAX_GAP_SECONDS", "3600")),
+            max_changes=int(os.getenv("CATALOG_DELTA_MAX_CHANGES", "500")),
+        )
+
+    def __call__(self, previous: Optional[FundCatalog]) -> FundCatalog:
+        started = time.monotonic()
+        catalog = self.delta(previous) if self.delta_allowed(previous, started) else None
+        if catalog is None:
+            catalog = fetch_catalog(previous, self.timeout, self.base_url)
+            with self._counts_lock:
+                self.full_syncs += 1
+        # Changes made while the request ran have a later updatedAt than the watermark, so none are lost
+        self._synced_at = started
+        return catalog
+
+    def delta_allowed(self, previous: Optional[FundCatalog], now: float) -> bool:
+        if previous is None or not previous.watermark or self._synced_at is None:
+            return False
+        return now - self._synced_at <= self.max_gap_seconds
+
+    def delta(self, previous: FundCatalog) -> Optional[FundCatalog]:
+        """previous with the funds changed since its watermark applied, or None when a full sync is needed."""
+        response = requests.get(
+            f"{self.base_url or BASE_URL}/funds/changes",
+            params={"since": previous.watermark, "limit": self.max_changes + 1},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        changes = decode_funds(response.content)
+        if len(changes) > self.max_changes:
+            logger.info(f"More than {self.max_changes} funds changed since {previous.watermark}, resyncing the catalog")
+            return None
+        with self._counts_lock:
+            self.delta_syncs += 1
+            self.funds_applied += len(changes)
+        return previous.apply(changes)
+
+    def stats(self) -> Dict[str, object]:
+        with self._counts_lock:
+            return {
+                "full_syncs": self.full_syncs,
+                "delta_syncs": self.delta_syncs,
+                "funds_applied": self.funds_applied,
+                "max_gap_seconds": self.max_gap_seconds,
+                "max_changes": self.max_changes,
+            }
+
+
+class CatalogStore:
+    """Holds the current FundCatalog and reloads it when it is stale."""
+
+    def __init__(
+        self,
+        fetch: Callable[[Optional[FundCatalog]], FundCatalog] = fetch_catalog,
+        ttl_seconds: float = 300.0,
+        versions_kept: int = 3,
+    ):
+        self.fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self.versions_kept = versions_kept
+        self._catalog: Optional[FundCatalog] = None
+        self._versions: "OrderedDict[int, FundCatalog]" = OrderedDict()
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.load_failures = 0
+
+    @classmethod
+    def from_env(cls) -> "CatalogStore":
+        delta_sync = os.getenv("CATALOG_DELTA_SYNC", "true").lower() == "true"
+        return cls(
+            fetch=CatalogSync.from_env() if delta_sync else fetch_catalog,
+            ttl_seconds=float(os.getenv("FUND_CATALOG_TTL_SECONDS", "300")),
+            versions_kept=int(os.getenv("CATALOG_VERSIONS_KEPT", "3")),
+        )
+
+    def get(self, version: Optional[int] = None) -> FundCatalog:
+        """The current catalog, or the given version while it is still kept."""
+        if version is not None:
+            pinned = self._versions.get(version)
+            if pinned is not None:
+                return pinned
+        catalog = self._catalog
+        if catalog is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+            return catalog
+        with self._lock:
+            # Another thread may have reloaded while this one waited
+            if self._catalog is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+                return self._catalog
+            try:
+                catalog = self.fetch(self._catalog)
+            except Exception as e:
+                if self._catalog is None:
+                    raise
+                self.load_failures += 1
+                logger.warning(f"Reloading the fund catalog failed, keeping the previous one: {e}")
+                # Try again after another TTL rather than on every call
+                self._loaded_at = time.monotonic()
+                return self._catalog
+            self._catalog, self._loaded_at = catalog, time.monotonic()
+            self._versions[catalog.version] = catalog
+            while len(self._versions) > self.versions_kept:
+                self._versions.popitem(last=False)
+            self.loads += 1
+            return catalog
+
+    def invalidate(self) -> None:
+        self._loaded_at = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        catalog = self._catalog
+        stats: Dict[str, Any] = {
+            "version": catalog.version if catalog is not None else None,
+            "funds": len(catalog) if catalog is not None else 0,
+            "watermark": catalog.watermark if catalog is not None else None,
+            "versions_kept": list(self._versions),
+            "loads": self.loads,
+            "load_failures": self.load_failures,
+        }
+        if isinstance(self.fetch, CatalogSync):
+            stats["sync"] = self.fetch.stats()
+        return stats
+
+
+fund_catalog = CatalogStore.from_env()
@@ -0,0 +1,211 @@
+"""
+Hedged and fallback model calls.
+
+HedgedLlm wraps a primary model and one or more fallbacks (other models or
+providers). A call goes to the primary first; if it has not answered once the
+configured latency percentile of the primary is exceeded, the same request is
+also sent to the next model and the first complete answer wins, the other call
+is cancelled. Errors and rate limits fail over to the next model immediately.
+
+Latency statistics are kept per model name and shared by every wrapper, so all
+agents using the same model contribute to its percentile.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import AsyncGenerator, Deque, Dict, List, Optional, Union
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+from pydantic import Field
+
+# --- Constants ---
+DEFAULT_HEDGE_PERCENTILE = 95.0
+DEFAULT_HEDGE_DELAY_SECONDS = 4.0  # used until a model has MIN_SAMPLES latencies
+MIN_HEDGE_DELAY_SECONDS = 0.5
+MIN_SAMPLES = 20
+LATENCY_WINDOW = 500
+
+
+class ModelStats:
+    """Rolling latency window and outcome counters of one model."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.hedges_started = 0
+        self.hedges_won = 0
+        self.cancelled = 0
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        p50, p95, p99 = (self.percentile(p) for p in (50, 95, 99))
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "hedges_started": self.hedges_started,
+            "hedges_won": self.hedges_won,
+            "cancelled": self.cancelled,
+            "p50_ms": None if p50 is None else round(p50 * 1000, 1),
+            "p95_ms": None if p95 is None else round(p95 * 1000, 1),
+            "p99_ms": None if p99 is None else round(p99 * 1000, 1),
+        }
+
+
+MODEL_STATS: Dict[str, ModelStats] = {}
+
+
+def stats_for(model_name: str) -> ModelStats:
+    return MODEL_STATS.setdefault(model_name, ModelStats())
+
+
+def model_latency_stats() -> Dict[str, Dict[str, Optional[float]]]:
+    """Per-model latency percentiles and counters, e.g. for a metrics endpoint."""
+    return {name: stats.snapshot() for name, stats in MODEL_STATS.items()}
+
+
+def is_rate_limit(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return status == 429 or "RateLimit" in type(error).__name__
+
+
+class HedgedLlm(BaseLlm):
+    """Calls the first model, hedges to the next one when it is slow and fails over when it errors."""
+
+    models: List[BaseLlm] = Field(..., min_length=1)
+    hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE
+    default_hedge_delay_seconds: float = DEFAULT_HEDGE_DELAY_SECONDS
+    min_hedge_delay_seconds: float = MIN_HEDGE_DELAY_SECONDS
+
+    def hedge_delay(self, model: BaseLlm) -> float:
+        """Seconds to wait for a model before hedging: its latency percentile, or the default."""
+        delay = stats_for(model.model).percentile(self.hedge_percentile)
+        if delay is None:
+            return self.default_hedge_delay_seconds
+        return max(delay, self.min_hedge_delay_seconds)
+
+    async def _call(self, model: BaseLlm, llm_request: LlmRequest) -> List[LlmResponse]:
+        stats = stats_for(model.model)
+        stats.calls += 1
+        # Each model gets its own request: backends set their model name and may append contents
+        request = llm_request.model_copy(update={"model": model.model, "contents": list(llm_request.contents)})
+        start = time.monotonic()
+        try:
+            responses = [response async for response in model.generate_content_async(request, stream=False)]
+        except asyncio.CancelledError:
+            stats.cancelled += 1
+            raise
+        except Exception as e:
+            stats.errors += 1
+            if is_rate_limit(e):
+                stats.rate_limited += 1
+            raise
+        stats.latencies.append(time.monotonic() - start)
+        return responses
+
+    async def _generate(self, llm_request: LlmRequest) -> List[LlmResponse]:
+        remaining = list(self.models)
+        running: Dict[asyncio.Task, BaseLlm] = {}
+        last_error: Optional[Exception] = None
+
+        def start_next(hedge: bool) -> None:
+            model = remaining.pop(0)
+            if hedge:
+                stats_for(model.model).hedges_started += 1
+            running[asyncio.create_task(self._call(model, llm_request))] = model
+
+        start_next(hedge=False)
+        try:
+            while running:
+                # The latest call decides when to hedge again; once all models run, just wait
+                timeout = self.hedge_delay(list(running.values())[-1]) if remaining else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    start_next(hedge=True)
+                    continue
+                for task in done:
+                    model = running.pop(task)
+                    if task.exception() is None:
+                        if model is not self.models[0]:
+                            stats_for(model.model).hedges_won += 1
+                        return task.result()
+                    last_error = task.exception()
+                if remaining and len(running) == 0:
+                    # Fail over right away instead of waiting for a hedge delay
+                    start_next(hedge=False)
+            raise last_error
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        if stream:
+            # Partial responses cannot be hedged; only fail over before the first chunk
+            last_error = None
+            for model in self.models:
+                request = llm_request.model_copy(update={"model": model.model, "contents": list(llm_request.contents)})
+                started = False
+                try:
+                    async for response in model.generate_content_async(request, stream=True):
+                        started = True
+                        yield response
+                    return
+                except Exception as e:
+                    if started:
+                        raise
+                    stats_for(model.model).errors += 1
+                    last_error = e
+            raise last_error
+
+        for response in await self._generate(llm_request):
+            yield response
+
+
+def resolve_model(model: Union[str, BaseLlm]) -> BaseLlm:
+    """Model name to BaseLlm: Gemini names through the ADK registry, anything else through LiteLLM."""
+    if isinstance(model, BaseLlm):
+        return model
+    try:
+        return LLMRegistry.new_llm(model)
+    except ValueError:
+        # litellm is slow to import; load it with the first model that needs it
+        from google.adk.models.lite_llm import LiteLlm
+
+        return LiteLlm(model=model)
+
+
+def with_fallback(
+    primary: Union[str, BaseLlm],
+    fallback_env: str = "SUB_AGENT_FALLBACK_MODEL",
+    default_fallback: str = "gpt-4o-mini",
+) -> Union[str, BaseLlm]:
+    """Wrap a model in HedgedLlm with the fallback named by fallback_env.
+
+    Returns the primary unchanged when MODEL_HEDGING=false or the fallback is
+    set to an empty string.
+    """
+    fallback = os.getenv(fallback_env, default_fallback)
+    if os.getenv("MODEL_HEDGING", "true").lower() != "true" or not fallback:
+        return primary
+    models = [resolve_model(primary), resolve_model(fallback)]
+    return HedgedLlm(
+        model=f"hedged:{models[0].model}|{models[1].model}",
+        models=models,
+        hedge_percentile=float(os.getenv("MODEL_HEDGE_PERCENTILE", str(DEFAULT_HEDGE_PERCENTILE))),
+        default_hedge_delay_seconds=float(os.getenv("MODEL_HEDGE_DEFAULT_DELAY", str(DEFAULT_HEDGE_DELAY_SECONDS))),
+    )
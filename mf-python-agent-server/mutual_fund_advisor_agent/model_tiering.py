@@ -0,0 +1,191 @@
+"""
+Complexity-based model tiering.
+
+Many turns are trivial ("1", "yes", "50000", an email address) and do not need
+the model that answers open-ended questions. classify_turn() sorts the user's
+message of the current turn into a tier with cheap heuristics and what the
+session state says about the flow:
+
+    rule   answered by a local rule registered for the agent, no model call
+    small  sent to a smaller, faster model
+    large  sent to the agent's regular model
+
+tiering_callback (an agent's before_model_callback) notes the agent and state
+of the call and runs the rules; TieredLlm then routes the first model call of
+the turn to the small or large model. The calls that follow a tool result
+(writing up fetched funds, for example) always use the large model.
+"""
+
+import contextvars
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import AsyncGenerator, Callable, Dict, List, Optional, Union
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+from .hedged_model import ModelStats, resolve_model
+
+# --- Tiers ---
+TIER_RULE = "rule"
+TIER_SMALL = "small"
+TIER_LARGE = "large"
+
+DEFAULT_SMALL_MODEL = "gemini-2.0-flash-lite"
+MAX_SMALL_TURN_WORDS = 4
+
+# Turns with financial side effects always use the large model
+LARGE_ONLY_AGENTS = {"InvestmentAgent"}
+
+TRIVIAL_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"^\(?\d{1,2}[.)]?$",  # option number or age
+        r"^(rs\.?|inr|₹)?\s*[\d,]+(\.\d+)?\s*(k|l|lakh|lakhs|lac|lacs|cr|crore|crores)?(\s*(per|a|/)\s*month)?$",
+        r"^\d{1,2}\s*(years?|yrs?)$",
+        r"^(yes|no|y|n|ok|okay|sure|yep|yeah|nope|done|skip|none|nil|na|n/a|proceed|continue|confirm)[.!]*$",
+        r"^(low|medium|moderate|high|sip|lumpsum|lump sum|hybrid|beginner|intermediate|advanced)[.!]*$",
+        r"^[\w.+-]+@[\w-]+(\.[\w-]+)+$",
+        r"^\d{4}-\d{2}-\d{2}$",
+    )
+]
+OPEN_ENDED_WORDS = {
+    "why", "how", "what", "which", "when", "explain", "compare", "difference", "should",
+    "better", "best", "recommend", "suggest", "worried", "risk", "tax", "help", "can", "could",
+}
+
+
+@dataclass
+class TurnContext:
+    """What the tiering callback knows about the model call in progress."""
+    agent_name: Optional[str] = None
+    moves_money: bool = False
+
+
+current_turn: contextvars.ContextVar[TurnContext] = contextvars.ContextVar("current_turn", default=TurnContext())
+
+TIER_STATS: Dict[str, ModelStats] = {}
+
+# Local rules per agent: rule(callback_context, llm_request, user_text) -> LlmResponse, or None to use a model
+Rule = Callable[[CallbackContext, LlmRequest, str], Optional[LlmResponse]]
+RULES: Dict[str, List[Rule]] = {}
+
+
+def register_rule(agent_name: str, rule: Rule) -> None:
+    RULES.setdefault(agent_name, []).append(rule)
+
+
+def latest_user_text(llm_request: LlmRequest) -> str:
+    """Text of the user's message that started this turn (function responses are skipped)."""
+    for content in reversed(llm_request.contents):
+        if content.role != "user" or not content.parts:
+            continue
+        text = " ".join(part.text for part in content.parts if part.text).strip()
+        if text:
+            return text
+    return ""
+
+
+def awaits_user_reply(llm_request: LlmRequest) -> bool:
+    """True for the first model call of a turn, i.e. the last content is the user's message."""
+    if not llm_request.contents:
+        return False
+    last = llm_request.contents[-1]
+    return last.role == "user" and any(part.text for part in last.parts or [])
+
+
+def moves_money(state) -> bool:
+    """True from the fund selection until its SIP has started: the turns in between can start an investment."""
+    if state.get("sip_started") is True:
+        return False
+    return bool(state.get("selected_fund") or state.get("sip_submission") or state.get("sip_portfolio"))
+
+
+def classify_turn(text: str, large_only: bool = False, agent_name: Optional[str] = None) -> str:
+    """Tier for a user message: TIER_SMALL for trivial answers, else TIER_LARGE.
+
+    large_only (see moves_money) and LARGE_ONLY_AGENTS always get TIER_LARGE.
+    TIER_RULE is only assigned by tiering_callback, when a rule answers a
+    trivial turn.
+    """
+    if large_only or agent_name in LARGE_ONLY_AGENTS:
+        return TIER_LARGE
+    text = text.strip()
+    if not text:
+        return TIER_LARGE
+    if any(pattern.match(text) for pattern in TRIVIAL_PATTERNS):
+        return TIER_SMALL
+    words = re.findall(r"[\w']+", text.lower())
+    if "?" in text or OPEN_ENDED_WORDS.intersection(words):
+        return TIER_LARGE
+    return TIER_SMALL if len(words) <= MAX_SMALL_TURN_WORDS else TIER_LARGE
+
+
+def record(tier: str, seconds: float) -> None:
+    stats = TIER_STATS.setdefault(tier, ModelStats())
+    stats.calls += 1
+    stats.latencies.append(seconds)
+
+
+def tier_stats() -> Dict[str, Dict[str, Optional[float]]]:
+    """Calls and latency percentiles per tier."""
+    keys = ("calls", "p50_ms", "p95_ms", "p99_ms")
+    return {tier: {key: stats.snapshot()[key] for key in keys} for tier, stats in TIER_STATS.items()}
+
+
+def tiering_callback(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """before_model_callback: notes agent and state, answers trivial turns by rule when possible."""
+    large_only = moves_money(callback_context.state)
+    current_turn.set(TurnContext(agent_name=callback_context.agent_name, moves_money=large_only))
+
+    rules = RULES.get(callback_context.agent_name)
+    if not rules or not awaits_user_reply(llm_request):
+        return None
+    text = latest_user_text(llm_request)
+    if classify_turn(text, large_only, callback_context.agent_name) != TIER_SMALL:
+        return None
+    start = time.monotonic()
+    for rule in rules:
+        response = rule(callback_context, llm_request, text)
+        if response is not None:
+            record(TIER_RULE, time.monotonic() - start)
+            return response
+    return None
+
+
+class TieredLlm(BaseLlm):
+    """Routes the first model call of a turn to the small or the large model by classify_turn(); later calls go to the large one."""
+
+    small: BaseLlm
+    large: BaseLlm
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        turn = current_turn.get()
+        tier = TIER_LARGE
+        if awaits_user_reply(llm_request):
+            tier = classify_turn(latest_user_text(llm_request), turn.moves_money, turn.agent_name)
+        model = self.small if tier == TIER_SMALL else self.large
+        request = llm_request.model_copy(update={"model": model.model})
+        start = time.monotonic()
+        async for response in model.generate_content_async(request, stream=stream):
+            yield response
+        record(tier, time.monotonic() - start)
+
+
+def with_tiering(large: Union[str, BaseLlm], small_env: str = "SMALL_MODEL") -> Union[str, BaseLlm]:
+    """Put a small model in front of an agent's model for trivial turns.
+
+    Returns the model unchanged when MODEL_TIERING=false. Agents using it
+    should set before_model_callback=tiering_callback so the agent and state are known.
+    """
+    small = os.getenv(small_env, DEFAULT_SMALL_MODEL)
+    if os.getenv("MODEL_TIERING", "true").lower() != "true" or not small:
+        return large
+    large_model, small_model = resolve_model(large), resolve_model(small)
+    return TieredLlm(model=f"tiered:{small_model.model}|{large_model.model}", small=small_model, large=large_model)
@@ -0,0 +1,328 @@
+"""
+Speculative prefetch of fund data and SIP projections.
+
+The flow is sequential (profile -> classification -> goal -> recommendation ->
+SIP -> investment), but some later work can be predicted early:
+
+- once investor_type is known, the fund catalog (with its precomputed
+  recommendations) is loaded if it is not already;
+- once a fund is selected, SIP projections for likely amounts are computed.
+
+speculate() (an after_agent_callback) schedules this work in the background.
+Results go into a per-session SpeculativeCache which the tools read before
+doing the work themselves. Prefetch jobs are best effort: they run on their own
+small thread pool, at most PREFETCH_MAX_PENDING are queued, none start while
+PREFETCH_MAX_FOREGROUND_TURNS turns are running, and a job is cancelled when
+its inputs change or the server shuts down.
+"""
+
+import asyncio
+import contextvars
+import os
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .catalog import INVESTOR_PREFERENCES, fund_catalog
+
+if TYPE_CHECKING:
+    # Annotations only: importing prefetch does not load google.adk
+    from google.adk.agents.callback_context import CallbackContext
+
+# --- Constants ---
+DEFAULT_RETURN_RATE = 12.0
+LIKELY_SIP_AMOUNTS = (1000, 5000, 10000, 25000)
+LIKELY_SIP_YEARS = (3, 5, 10, 15, 20)
+INCOME_SHARES = (0.1, 0.2, 0.3)
+
+SessionKey = Tuple[str, str]
+
+current_session: contextvars.ContextVar[Optional[SessionKey]] = contextvars.ContextVar("current_session", default=None)
+
+
+class SpeculativeCache:
+    """Results of prefetch jobs per session, each stored with the inputs it was computed from."""
+
+    def __init__(self, ttl_seconds: float = 600, max_sessions: int = 10_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[SessionKey, Dict[str, Tuple[Hashable, Any, float]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    def get(self, session: Optional[SessionKey], name: str, inputs: Hashable) -> Optional[Any]:
+        """Cached result of job name for session, if it was computed from the same inputs."""
+        entry = self._sessions.get(session, {}).get(name) if session else None
+        if entry is None or entry[0] != inputs or entry[2] < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def contains(self, session: SessionKey, name: str, inputs: Hashable) -> bool:
+        entry = self._sessions.get(session, {}).get(name)
+        return entry is not None and entry[0] == inputs and entry[2] >= time.monotonic()
+
+    def put(self, session: SessionKey, name: str, inputs: Hashable, value: Any) -> None:
+        self._sessions.setdefault(session, {})[name] = (inputs, value, time.monotonic() + self.ttl_seconds)
+        self._sessions.move_to_end(session)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        self.stored += 1
+
+    def drop(self, session: SessionKey) -> None:
+        self._sessions.pop(session, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"sessions": len(self._sessions), "hits": self.hits, "misses": self.misses, "stored": self.stored}
+
+
+class Prefetcher:
+    """Runs prefetch jobs in the background without taking capacity from foreground turns."""
+
+    def __init__(
+        self,
+        cache: SpeculativeCache,
+        max_concurrent: int = 2,
+        max_pending: int = 64,
+        max_foreground_turns: int = 32,
+        enabled: bool = True,
+    ):
+        self.cache = cache
+        self.max_pending = max_pending
+        self.max_foreground_turns = max_foreground_turns
+        self.enabled = enabled
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="prefetch")
+        self._tasks: Dict[Tuple[SessionKey, str], Tuple[Hashable, asyncio.Task]] = {}
+        self.foreground_turns = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_env(cls) -> "Prefetcher":
+        cache = SpeculativeCache(ttl_seconds=float(os.getenv("PREFETCH_TTL_SECONDS", "600")))
+        return cls(
+            cache,
+            max_concurrent=int(os.getenv("PREFETCH_MAX_CONCURRENT", "2")),
+            max_pending=int(os.getenv("PREFETCH_MAX_PENDING", "64")),
+            max_foreground_turns=int(os.getenv("PREFETCH_MAX_FOREGROUND_TURNS", "32")),
+            enabled=os.getenv("PREFETCH_ENABLED", "true").lower() == "true",
+        )
+
+    @contextmanager
+    def foreground(self, user_id: str, session_id: str):
+        """Marks a running turn; tools and callbacks inside it see the session in current_session."""
+        token = current_session.set((user_id, session_id))
+        self.foreground_turns += 1
+        try:
+            yield
+        finally:
+            self.foreground_turns -= 1
+            current_session.reset(token)
+
+    def schedule(self, session: SessionKey, name: str, inputs: Hashable, job: Callable[[], Any]) -> bool:
+        """Start job in the background unless its result for these inputs is cached or running.
+
+        A running job for the same name with other inputs is cancelled. Returns
+        False when the job was skipped.
+        """
+        key = (session, name)
+        running = self._tasks.get(key)
+        if running is not None:
+            if running[0] == inputs:
+                return True
+            running[1].cancel()
+        if not self.enabled or self.cache.contains(session, name, inputs):
+            return False
+        if len(self._tasks) >= self.max_pending or self.foreground_turns > self.max_foreground_turns:
+            self.skipped += 1
+            return False
+        task = asyncio.get_running_loop().create_task(self._run(key, inputs, job))
+        self._tasks[key] = (inputs, task)
+        return True
+
+    async def _run(self, key: Tuple[SessionKey, str], inputs: Hashable, job: Callable[[], Any]) -> None:
+        self.started += 1
+        try:
+            value = await asyncio.get_running_loop().run_in_executor(self._executor, job)
+            self.cache.put(key[0], key[1], inputs, value)
+            self.completed += 1
+        except asyncio.CancelledError:
+            self.cancelled += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"Prefetch {key[1]} failed: {e}")
+        finally:
+            if self._tasks.get(key, (None, None))[1] is asyncio.current_task():
+                del self._tasks[key]
+
+    def cancel(self, session: SessionKey) -> None:
+        """Cancel the session's prefetch jobs and forget its results."""
+        for key, (_, task) in list(self._tasks.items()):
+            if key[0] == session:
+                task.cancel()
+        self.cache.drop(session)
+
+    def shutdown(self) -> None:
+        for _, task in self._tasks.values():
+            task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._tasks),
+            "foreground_turns": self.foreground_turns,
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "skipped": self.skipped,
+            "cache": self.cache.stats(),
+        }
+
+
+prefetcher = Prefetcher.from_env()
+
+
+def speculative_result(name: str, inputs: Hashable) -> Optional[Any]:
+    """Prefetched result for the current session, or None (tools then do the work themselves)."""
+    return prefetcher.cache.get(current_session.get(), name, inputs)
+
+
+# --- Fund ranking ---
+
+def as_dict(value) -> Dict[str, Any]:
+    """State entries may be dicts, pydantic models or, for output_key entries, plain text."""
+    if hasattr(value, "dict"):
+        value = value.dict()
+    return value if isinstance(value, dict) else {}
+
+
+def investor_type_of(state) -> Optional[str]:
+    """Investor type from state["investor_type"], which may be InvestorTypeOutput data or the classifier's text."""
+    investor = state.get("investor_type")
+    text = as_dict(investor).get("investor_type") if not isinstance(investor, str) else investor
+    if not isinstance(text, str):
+        return None
+    text = text.lower()
+    found = [(text.find(name), name) for name in INVESTOR_PREFERENCES if name in text]
+    return min(found)[1] if found else None
+
+
+GOAL_KEYWORDS = {
+    "retirement": ("retire", "pension"),
+    "education": ("education", "child", "college", "school"),
+    "wealth_creation": ("wealth",),
+    "house": ("house", "home", "property"),
+}
+
+
+def goal_of(state) -> Optional[str]:
+    """Goal key of GOAL_CATEGORIES from state["investment_goals"], InvestmentGoalOutput data or the planner's text."""
+    goal = state.get("investment_goals")
+    text = as_dict(goal).get("goal_name") if not isinstance(goal, str) else goal
+    if not isinstance(text, str):
+        return None
+    text = text.lower()
+    found = [(text.find(keyword), name) for name, keywords in GOAL_KEYWORDS.items() for keyword in keywords if keyword in text]
+    return min(found)[1] if found else None
+
+
+def horizon_years_of(state) -> Optional[int]:
+    """Investment horizon from the goal, else from the user profile."""
+    goal = state.get("investment_goals")
+    years = as_dict(goal).get("time_horizon_years")
+    if years is None and isinstance(goal, str):
+        match = re.search(r"(\d{1,2})\s*(?:\+\s*)?(?:years?|yrs?)", goal, re.IGNORECASE)
+        years = int(match.group(1)) if match else None
+    if years is None:
+        years = as_dict(state.get("user_profile")).get("investment_horizon")
+    return years if isinstance(years, int) and years > 0 else None
+
+
+# --- SIP projections ---
+
+def sip_projection(monthly_investment: float, years: int, annual_return_rate: float = DEFAULT_RETURN_RATE) -> Dict[str, float]:
+    """SIP future value, FV = P * (((1 + r)^n - 1) / r) * (1 + r), rounded to the nearest hundred."""
+    months = years * 12
+    monthly_rate = annual_return_rate / 12 / 100
+    if monthly_rate:
+        total_value = monthly_investment * (((1 + monthly_rate) ** months - 1) / monthly_rate) * (1 + monthly_rate)
+    else:
+        total_value = monthly_investment * months
+    total_value = round(total_value, -2)
+    total_investment = monthly_investment * months
+    return {
+        "sip_amount": monthly_investment,
+        "sip_duration": years,
+        "total_investment": total_investment,
+        "expected_return": total_value - total_investment,
+        "total_value": total_value,
+        "wealth_gained": total_value - total_investment,
+        "return_rate_used": annual_return_rate,
+    }
+
+
+def projection_key(monthly_investment: float, years: int, annual_return_rate: float) -> Tuple[float, int, float]:
+    return (round(float(monthly_investment), 2), int(years), round(float(annual_return_rate), 2))
+
+
+def likely_sip_inputs(state) -> Tuple[Tuple[float, ...], Tuple[int, ...], Tuple[float, ...]]:
+    """Amounts, durations and rates the user is likely to ask about, from profile, goal and selected fund."""
+    profile, goal, fund = (as_dict(state.get(key)) for key in ("user_profile", "investment_goals", "selected_fund"))
+
+    amounts = set(LIKELY_SIP_AMOUNTS)
+    try:
+        amounts.update(round(float(profile["monthly_income"]) * share, -2) for share in INCOME_SHARES)
+    except (KeyError, TypeError, ValueError):
+        pass
+    if isinstance(fund.get("min_sip_amount"), (int, float)):
+        amounts.add(float(fund["min_sip_amount"]))
+    if isinstance(goal.get("monthly_investment_needed"), (int, float)):
+        amounts.add(round(float(goal["monthly_investment_needed"]), -2))
+
+    years = set(LIKELY_SIP_YEARS)
+    for value in (profile.get("investment_horizon"), goal.get("time_horizon_years")):
+        if isinstance(value, int) and 0 < value <= 50:
+            years.add(value)
+
+    rates = {DEFAULT_RETURN_RATE}
+    for period in ("Y_3", "Y_5"):
+        rate = (fund.get("returns") or {}).get(period)
+        if isinstance(rate, (int, float)) and rate > 0:
+            rates.add(round(float(rate), 2))
+    return tuple(sorted(a for a in amounts if a > 0)), tuple(sorted(years)), tuple(sorted(rates))
+
+
+def compute_projections(amounts, years, rates) -> Dict[Tuple[float, int, float], Dict[str, float]]:
+    return {
+        projection_key(amount, duration, rate): sip_projection(amount, duration, rate)
+        for amount in amounts
+        for duration in years
+        for rate in rates
+    }
+
+
+def speculate(callback_context: "CallbackContext") -> None:
+    """after_agent_callback: prefetch what the next steps of the flow will need."""
+    session = current_session.get()
+    if session is None:
+        return None
+    state = callback_context.state
+
+    investor_type = investor_type_of(state)
+    if investor_type:
+        prefetcher.schedule(session, "fund_catalog", investor_type, fund_catalog.get)
+
+    if state.get("selected_fund"):
+        inputs = likely_sip_inputs(state)
+        prefetcher.schedule(session, "sip_projections", inputs, lambda: compute_projections(*inputs))
+    return None
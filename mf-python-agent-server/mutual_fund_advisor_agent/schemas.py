@@ -5,8 +5,8 @@ This file contains all the data models used across different sub-agents
 to ensure consistency and maintainability.
 """
 
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any, Literal
+from pydantic import AliasChoices, BaseModel, Field, model_validator
+from typing import List, Optional, Dict, Any, Literal, Union
 
 
 # ===== USER PROFILE SCHEMAS =====
@@ -49,34 +49,34 @@ class InvestmentGoalOutput(BaseModel):
 # ===== FUND RECOMMENDATION SCHEMAS =====
 
 class FundReturn(BaseModel):
-    """Schema for mutual fund returns data."""
-    W_1: float = Field(..., description="1 Week return")
-    M_1: float = Field(..., description="1 Month return")
-    M_3: float = Field(..., description="3 Months return")
-    M_6: float = Field(..., description="6 Months return")
-    YTD: float = Field(..., description="Year to Date return")
-    Y_1: float = Field(..., description="1 Year return")
-    Y_2: float = Field(..., description="2 Years return")
-    Y_3: float = Field(..., description="3 Years return")
-    Y_5: float = Field(..., description="5 Years return")
-    Y_10: float = Field(..., description="10 Years return")
+    """Schema for mutual fund returns data. The fund API names the periods '1W' ... '10Y' and may omit any of them."""
+    W_1: Optional[float] = Field(None, validation_alias=AliasChoices("W_1", "1W"), description="1 Week return")
+    M_1: Optional[float] = Field(None, validation_alias=AliasChoices("M_1", "1M"), description="1 Month return")
+    M_3: Optional[float] = Field(None, validation_alias=AliasChoices("M_3", "3M"), description="3 Months return")
+    M_6: Optional[float] = Field(None, validation_alias=AliasChoices("M_6", "6M"), description="6 Months return")
+    YTD: Optional[float] = Field(None, description="Year to Date return")
+    Y_1: Optional[float] = Field(None, validation_alias=AliasChoices("Y_1", "1Y"), description="1 Year return")
+    Y_2: Optional[float] = Field(None, validation_alias=AliasChoices("Y_2", "2Y"), description="2 Years return")
+    Y_3: Optional[float] = Field(None, validation_alias=AliasChoices("Y_3", "3Y"), description="3 Years return")
+    Y_5: Optional[float] = Field(None, validation_alias=AliasChoices("Y_5", "5Y"), description="5 Years return")
+    Y_10: Optional[float] = Field(None, validation_alias=AliasChoices("Y_10", "10Y"), description="10 Years return")
 
 
 class RecommendedFund(BaseModel):
-    """Schema for a recommended mutual fund."""
+    """Schema for a recommended mutual fund. As in the Node Fund model, only name and category are required."""
     id: str = Field(..., alias="_id", description="Unique fund identifier")
     name: str = Field(..., description="Name of the mutual fund")
-    risk_level: str = Field(..., description="Risk level: Low, Medium, or High")
-    fund_type: str = Field(..., description="Type of fund: Equity, Debt, Hybrid, etc.")
+    risk_level: Optional[str] = Field(None, description="Risk level: Low, Medium, or High")
+    fund_type: Optional[str] = Field(None, description="Type of fund: Equity, Debt, Hybrid, etc.")
     category: str = Field(..., description="Fund category: Large Cap, Small Cap, etc.")
-    min_sip_amount: float = Field(..., description="Minimum SIP amount")
-    nav: float = Field(..., description="Net Asset Value")
-    fund_size: float = Field(..., description="Fund size in crores")
-    is_active: bool = Field(..., description="Whether the fund is active")
-    returns: FundReturn = Field(..., description="Fund returns data")
+    min_sip_amount: Optional[float] = Field(None, description="Minimum SIP amount")
+    nav: Optional[float] = Field(None, description="Net Asset Value")
+    fund_size: Optional[float] = Field(None, description="Fund size in crores")
+    is_active: bool = Field(True, description="Whether the fund is active")
+    returns: FundReturn = Field(default_factory=FundReturn, description="Fund returns data")
     createdAt: str = Field(..., description="Fund creation date in ISO format")
     updatedAt: str = Field(..., description="Fund last update date in ISO format")
-    recommendation_reason: str = Field(..., description="Why this fund was recommended")
+    recommendation_reason: str = Field("", description="Why this fund was recommended")
 
 
 class FundRecommendationOutput(BaseModel):
@@ -144,7 +144,9 @@ class SessionState(BaseModel):
     fund_recommendations: Optional[FundRecommendationOutput] = Field(None, description="Fund recommendations")
     selected_fund: Optional[RecommendedFund] = Field(None, description="User's selected fund")
     sip_calculator_output: Optional[SIPCalculatorOutput] = Field(None, description="SIP calculation results")
-    investment_details: Optional[InvestmentDetailsOutput] = Field(None, description="Investment setup details")
+    investment_details: Optional[Union[InvestmentDetailsOutput, List[InvestmentDetailsOutput]]] = Field(
+        None, description="Investment setup details, one entry per fund for a portfolio SIP"
+    )
     user_registered: bool = Field(default=False, description="Whether the user is registered")
     jwt_token: Optional[str] = Field(None, description="JWT token for the user")
     sip_started: bool = Field(default=False, description="Whether the SIP is started")
@@ -170,6 +172,34 @@ class FundAPIResponse(BaseModel):
     limit: int = Field(..., description="Number of funds per page")
 
 
+# ===== BATCH CONVERSATION SCHEMAS =====
+
+class BatchConversationItem(BaseModel):
+    """Schema for one batch item: a single message or a scripted conversation."""
+    user_id: str = Field(..., description="User the conversation belongs to")
+    session_id: Optional[str] = Field(None, description="Session to continue; created when missing or omitted")
+    message: Optional[str] = Field(None, description="Single message to send")
+    messages: List[str] = Field(default_factory=list, description="Scripted conversation, sent turn by turn in order")
+
+    @model_validator(mode="after")
+    def check_turns(self) -> "BatchConversationItem":
+        if not self.message and not self.messages:
+            raise ValueError("Either 'message' or 'messages' is required")
+        if self.message and self.messages:
+            raise ValueError("Use either 'message' or 'messages', not both")
+        return self
+
+    def turns(self) -> List[str]:
+        """Return the messages of this item in sending order."""
+        return [self.message] if self.message else list(self.messages)
+
+
+class BatchConversationRequest(BaseModel):
+    """Schema for batch conversation requests."""
+    items: List[BatchConversationItem] = Field(..., min_length=1, description="Conversations to run")
+    parallelism: Optional[int] = Field(None, ge=1, description="Items run concurrently (capped by the server limit)")
+
+
 # ===== VALIDATION SCHEMAS =====
 
 class ValidationError(BaseModel):
@@ -0,0 +1,497 @@
+"""
+Outbox for SIP submissions to the investment portal.
+
+start_sip_api no longer posts to the Node API inside the turn. It records the
+SIP intent in a local outbox table and a dispatcher thread submits it:
+
+- every intent gets an idempotency key (derived from user, session and SIP
+  details), sent as the Idempotency-Key header, so retries and repeated tool
+  calls never create a second SIP;
+- failed submissions are retried with exponential backoff and jitter, up to
+  SIP_OUTBOX_MAX_ATTEMPTS; validation errors (4xx) fail right away;
+- a circuit breaker stops submitting for a while when the API keeps failing;
+- due intents are submitted concurrently (SIP_OUTBOX_CONCURRENCY), so the
+  legs of a portfolio SIP are confirmed together;
+- rows are claimed in a write transaction, so several worker processes can
+  share one outbox file.
+
+The tool waits briefly for the confirmation and otherwise tells the user the
+SIP is submitted and being confirmed; check_sip_status reads the outcome later.
+The process's outbox, and its database, are created by the first
+get_sip_outbox() call rather than at import.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import requests
+from sqlalchemy import (
+    Column,
+    Engine,
+    Float,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    and_,
+    create_engine,
+    event as sa_event,
+    func,
+    insert,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+BASE_URL = os.getenv("MUTUAL_FUND_SERVER_BASE_URL")
+PENDING = "pending"
+SUBMITTING = "submitting"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+IDEMPOTENCY_NAMESPACE = uuid.UUID("5b0f2a9e-6c1d-4b7e-9a43-2f8d1c6e7a10")
+LATENCY_WINDOW = 500
+
+outbox_metadata = MetaData()
+SIP_OUTBOX = Table(
+    "sip_outbox",
+    outbox_metadata,
+    Column("id", String, primary_key=True),  # also the idempotency key
+    Column("user_id", String, nullable=False),
+    Column("session_id", String),
+    Column("payload", Text, nullable=False),
+    Column("auth_token", Text),  # cleared once the submission is finished
+    Column("status", String, nullable=False),
+    Column("attempts", Integer, nullable=False, default=0),
+    Column("next_attempt_at", Float, nullable=False),
+    Column("claimed_until", Float),
+    Column("last_error", Text),
+    Column("result", Text),
+    Column("created_at", Float, nullable=False),
+    Column("completed_at", Float),
+    Index("ix_sip_outbox_due", "status", "next_attempt_at"),
+)
+
+
+class SubmissionError(Exception):
+    """A failed submission; permanent ones are not retried."""
+
+    def __init__(self, message: str, permanent: bool = False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+def post_sip(payload: Dict[str, Any], auth_token: Optional[str], idempotency_key: str, timeout: float = 10) -> Dict[str, Any]:
+    """Create the SIP through the Node API."""
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {auth_token}",
+        "Idempotency-Key": idempotency_key,
+    }
+    try:
+        response = requests.post(f"{BASE_URL}/transactions/sip", headers=headers, json=payload, timeout=timeout)
+    except requests.RequestException as e:
+        raise SubmissionError(f"Investment portal unreachable: {e}") from e
+    if response.status_code >= 400:
+        try:
+            message = response.json().get("message", response.text)
+        except ValueError:
+            message = response.text
+        # Timeouts and rate limits are worth retrying, other client errors are not
+        permanent = response.status_code < 500 and response.status_code not in (408, 429)
+        raise SubmissionError(f"{response.status_code}: {message}", permanent=permanent)
+    return response.json()
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures; lets one trial call through after reset_seconds."""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def seconds_until_trial(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                # A failed trial call in half_open opens the breaker again
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+
+
+def _percentile(values: Deque[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))] * 1000, 1)
+
+
+def _configure_sqlite(dbapi_connection, connection_record) -> None:
+    # Let the "begin" hook emit BEGIN instead of the pysqlite driver
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+def _begin_sqlite(connection) -> None:
+    connection.exec_driver_sql(f"BEGIN {connection.get_execution_options().get('sqlite_begin', 'DEFERRED')}")
+
+
+def create_outbox_engine(db_url: str) -> Engine:
+    if not db_url.startswith("sqlite"):
+        return create_engine(db_url)
+    engine = create_engine(db_url, connect_args={"check_same_thread": False, "timeout": 5})
+    sa_event.listen(engine, "connect", _configure_sqlite)
+    sa_event.listen(engine, "begin", _begin_sqlite)
+    return engine
+
+
+class SipOutbox:
+    """Persistent SIP intents and the dispatcher thread that submits them."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        submit: Callable[[Dict[str, Any], Optional[str], str], Dict[str, Any]] = post_sip,
+        breaker: Optional[CircuitBreaker] = None,
+        max_attempts: int = 8,
+        base_backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 300.0,
+        claim_seconds: float = 60.0,
+        poll_interval_seconds: float = 5.0,
+        batch_size: int = 20,
+        token_for: Optional[Callable[[str, Optional[str]], Optional[str]]] = None,
+        concurrency: int = 4,
+    ):
+        self.engine = engine
+        self._writer = engine.execution_options(sqlite_begin="IMMEDIATE")
+        self.submit = submit
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.claim_seconds = claim_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.batch_size = batch_size
+        # Current portal token of the intent's session (user id, session id), preferred over the one recorded with the intent
+        self.token_for = token_for
+        self.concurrency = concurrency
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self._counts_lock = threading.Lock()
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.attempt_latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.confirm_latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+        # Several worker processes may set up the same fresh file at once
+        outbox_metadata.create_all(self._writer)
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "SipOutbox":
+        return cls(
+            create_outbox_engine(os.getenv("SIP_OUTBOX_DB_URL", "sqlite:///./sip_outbox.db")),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("SIP_BREAKER_FAILURES", "5")),
+                reset_seconds=float(os.getenv("SIP_BREAKER_RESET_SECONDS", "30")),
+            ),
+            max_attempts=int(os.getenv("SIP_OUTBOX_MAX_ATTEMPTS", "8")),
+            max_backoff_seconds=float(os.getenv("SIP_OUTBOX_MAX_BACKOFF_SECONDS", "300")),
+            concurrency=int(os.getenv("SIP_OUTBOX_CONCURRENCY", "4")),
+            **kwargs,
+        )
+
+    # ===== Intents =====
+
+    @staticmethod
+    def idempotency_key(user_id: str, session_id: Optional[str], payload: Dict[str, Any]) -> str:
+        canonical = json.dumps({"user": user_id, "session": session_id, "sip": payload}, sort_keys=True, default=str)
+        return str(uuid.uuid5(IDEMPOTENCY_NAMESPACE, canonical))
+
+    def enqueue(self, user_id: str, session_id: Optional[str], payload: Dict[str, Any], auth_token: Optional[str]) -> Dict[str, Any]:
+        """Record a SIP intent and return its row. The same intent twice returns the first row;
+        a failed one is queued again."""
+        return self.enqueue_many(user_id, session_id, [payload], auth_token)[0]
+
+    def enqueue_many(
+        self, user_id: str, session_id: Optional[str], payloads: List[Dict[str, Any]], auth_token: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Record several SIP intents in one transaction, so the dispatcher claims them together."""
+        keys = [self.idempotency_key(user_id, session_id, payload) for payload in payloads]
+        now = time.time()
+        with self._writer.begin() as connection:
+            for key, payload in zip(keys, payloads):
+                # A savepoint per intent, so a duplicate does not roll back the others
+                try:
+                    with connection.begin_nested():
+                        connection.execute(
+                            insert(SIP_OUTBOX).values(
+                                id=key,
+                                user_id=user_id,
+                                session_id=session_id,
+                                payload=json.dumps(payload, default=str),
+                                auth_token=auth_token,
+                                status=PENDING,
+                                attempts=0,
+                                next_attempt_at=now,
+                                created_at=now,
+                            )
+                        )
+                except IntegrityError:
+                    connection.execute(
+                        update(SIP_OUTBOX)
+                        .where(and_(SIP_OUTBOX.c.id == key, SIP_OUTBOX.c.status == FAILED))
+                        .values(status=PENDING, attempts=0, next_attempt_at=now, auth_token=auth_token, last_error=None)
+                    )
+        self.ensure_started()
+        self._wake.set()
+        return [self.get(key) for key in keys]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.engine.connect() as connection:
+            row = connection.execute(select(SIP_OUTBOX).where(SIP_OUTBOX.c.id == key)).mappings().first()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "last_error": row["last_error"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+        }
+
+    async def wait(self, key: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Poll the intent until it succeeded or failed, or timeout seconds passed."""
+        deadline = time.monotonic() + timeout
+        while True:
+            submission = await asyncio.to_thread(self.get, key)
+            if submission is None or submission["status"] in (SUCCEEDED, FAILED) or time.monotonic() >= deadline:
+                return submission
+            await asyncio.sleep(0.1)
+
+    # ===== Dispatcher =====
+
+    def ensure_started(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run_forever, name="sip-outbox", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.dispatch_once()
+            except Exception as e:
+                logger.error(f"SIP outbox dispatch failed: {e}")
+            self._wake.wait(self._idle_seconds())
+            self._wake.clear()
+
+    def _idle_seconds(self) -> float:
+        """Time until the next retry or breaker trial is due, at most the poll interval."""
+        if not self.breaker.allow():
+            return min(self.poll_interval_seconds, max(0.05, self.breaker.seconds_until_trial()))
+        with self.engine.connect() as connection:
+            next_due = connection.execute(
+                select(func.min(SIP_OUTBOX.c.next_attempt_at)).where(SIP_OUTBOX.c.status == PENDING)
+            ).scalar()
+        if next_due is None:
+            return self.poll_interval_seconds
+        return min(self.poll_interval_seconds, max(0.05, next_due - time.time()))
+
+    def _claim(self) -> List[Any]:
+        now = time.time()
+        due = or_(
+            and_(SIP_OUTBOX.c.status == PENDING, SIP_OUTBOX.c.next_attempt_at <= now),
+            # Claimed by a worker that died mid-submission
+            and_(SIP_OUTBOX.c.status == SUBMITTING, SIP_OUTBOX.c.claimed_until < now),
+        )
+        with self._writer.begin() as connection:
+            rows = connection.execute(
+                select(SIP_OUTBOX).where(due).order_by(SIP_OUTBOX.c.next_attempt_at).limit(self.batch_size)
+            ).mappings().all()
+            if rows:
+                connection.execute(
+                    update(SIP_OUTBOX)
+                    .where(SIP_OUTBOX.c.id.in_([row["id"] for row in rows]))
+                    .values(status=SUBMITTING, claimed_until=now + self.claim_seconds)
+                )
+        return rows
+
+    def dispatch_once(self) -> int:
+        """Submit due intents while the breaker allows. Returns the number of submissions made."""
+        submissions = 0
+        while not self._stop.is_set() and self.breaker.allow():
+            rows = self._claim()
+            if not rows:
+                break
+            if self.concurrency > 1 and len(rows) > 1:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="sip-submit")
+                submitted = list(self._executor.map(self._submit_if_allowed, rows))
+            else:
+                submitted = [self._submit_if_allowed(row) for row in rows]
+            submissions += sum(submitted)
+            if not all(submitted):
+                break
+        return submissions
+
+    def _submit_if_allowed(self, row) -> bool:
+        if not self.breaker.allow():
+            # Hand it back untouched; it is due again when the breaker half-opens
+            self._release([row["id"]])
+            return False
+        self._submit(row)
+        return True
+
+    def _release(self, keys: List[str]) -> None:
+        with self._writer.begin() as connection:
+            connection.execute(
+                update(SIP_OUTBOX)
+                .where(SIP_OUTBOX.c.id.in_(keys))
+                .values(status=PENDING, claimed_until=None, next_attempt_at=time.time() + self.breaker.reset_seconds)
+            )
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.max_backoff_seconds, self.base_backoff_seconds * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _submit(self, row) -> None:
+        attempts = row["attempts"] + 1
+        with self._counts_lock:
+            self.submitted += 1
+        start = time.monotonic()
+        try:
+            auth_token = (self.token_for(row["user_id"], row["session_id"]) if self.token_for else None) or row["auth_token"]
+            result = self.submit(json.loads(row["payload"]), auth_token, row["id"])
+        except Exception as e:
+            permanent = isinstance(e, SubmissionError) and e.permanent
+            if not permanent:
+                self.breaker.record_failure()
+            self.attempt_latencies.append(time.monotonic() - start)
+            final = permanent or attempts >= self.max_attempts
+            with self._counts_lock:
+                if final:
+                    self.failed += 1
+                else:
+                    self.retried += 1
+            if final:
+                values = dict(status=FAILED, completed_at=time.time(), auth_token=None)
+            else:
+                values = dict(status=PENDING, next_attempt_at=time.time() + self.backoff(attempts))
+            logger.warning(f"SIP submission {row['id']} attempt {attempts} failed: {e}")
+            self._finish(row["id"], attempts=attempts, last_error=str(e), claimed_until=None, **values)
+            return
+
+        self.breaker.record_success()
+        with self._counts_lock:
+            self.succeeded += 1
+        self.attempt_latencies.append(time.monotonic() - start)
+        self.confirm_latencies.append(time.time() - row["created_at"])
+        self._finish(
+            row["id"],
+            status=SUCCEEDED,
+            attempts=attempts,
+            result=json.dumps(result, default=str),
+            completed_at=time.time(),
+            claimed_until=None,
+            auth_token=None,
+            last_error=None,
+        )
+
+    def _finish(self, key: str, **values) -> None:
+        with self._writer.begin() as connection:
+            connection.execute(update(SIP_OUTBOX).where(SIP_OUTBOX.c.id == key).values(**values))
+
+    def stats(self) -> Dict[str, Any]:
+        with self.engine.connect() as connection:
+            counts = dict(
+                connection.execute(select(SIP_OUTBOX.c.status, func.count()).group_by(SIP_OUTBOX.c.status)).all()
+            )
+        return {
+            "queue_depth": counts.get(PENDING, 0) + counts.get(SUBMITTING, 0),
+            "by_status": counts,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.times_opened,
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "attempt_p50_ms": _percentile(self.attempt_latencies, 50),
+            "attempt_p95_ms": _percentile(self.attempt_latencies, 95),
+            "confirm_p50_ms": _percentile(self.confirm_latencies, 50),
+            "confirm_p95_ms": _percentile(self.confirm_latencies, 95),
+        }
+
+
+_sip_outbox: Optional[SipOutbox] = None
+_sip_outbox_lock = threading.Lock()
+
+
+def get_sip_outbox() -> SipOutbox:
+    """The SIP outbox of this process, created on the first call. Retries submit with the session's current portal token."""
+    global _sip_outbox
+    if _sip_outbox is None:
+        with _sip_outbox_lock:
+            if _sip_outbox is None:
+                from .token_cache import get_portal_tokens, session_key
+
+                _sip_outbox = SipOutbox.from_env(
+                    token_for=lambda user_id, session_id: get_portal_tokens().token_for(session_key(user_id, session_id))
+                )
+    return _sip_outbox
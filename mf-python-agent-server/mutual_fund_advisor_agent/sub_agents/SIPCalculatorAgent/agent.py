@@ -1,12 +1,38 @@
+from typing import Any, Dict
+
 from google.adk.agents import LlmAgent
+from google.adk.tools import ToolContext
+from ...hedged_model import with_fallback
+from ...model_tiering import tiering_callback, with_tiering
+from ...prefetch import likely_sip_inputs, projection_key, sip_projection, speculative_result
 
 # --- Constants ---
 GEMINI_MODEL = "gemini-2.0-flash"
 
+# --- SIP projection tool ---
+def calculate_sip_projection(
+    monthly_investment: float, years: int, annual_return_rate: float, tool_context: ToolContext
+) -> Dict[str, Any]:
+    """Calculate the SIP maturity value for a monthly investment, duration in years and expected annual return (%).
+
+    Use an annual_return_rate of 12 when the user has no preference.
+    """
+    # Projections for likely amounts are precomputed once a fund is selected
+    projections = speculative_result("sip_projections", likely_sip_inputs(tool_context.state)) or {}
+    data = projections.get(projection_key(monthly_investment, years, annual_return_rate))
+    if data is None:
+        data = sip_projection(monthly_investment, years, annual_return_rate)
+    return {
+        "action": "calculate_sip_projection",
+        "data": data,
+        "message": "SIP projection calculated successfully",
+    }
+
 # Create the SIP Calculator agent
 sip_calculator_agent = LlmAgent(
     name="SIPCalculatorAgent",
-    model=GEMINI_MODEL,
+    model=with_tiering(with_fallback(GEMINI_MODEL)),
+    before_model_callback=tiering_callback,
     description="Estimates future value of investments through SIPs based on user input like monthly investment, duration, and expected return rate. Provides clear, human-readable results.",
     instruction="""
     Role:
@@ -18,7 +44,7 @@ sip_calculator_agent = LlmAgent(
       - Investment duration (in years)
       - Expected annual return rate (default: 12%)
 
-    - Calculate:
+    - Calculate with the calculate_sip_projection tool (do not calculate the numbers yourself):
       - Total invested amount
       - Estimated returns
       - Final future value using the SIP formula:
@@ -52,4 +78,5 @@ sip_calculator_agent = LlmAgent(
     - After collecting the necessary information, smoothly forward the interaction to the **MutualFundAdvisorAgent** to handle the next step(this is mandatory to proceed further).
     """,
     output_key="sip_calculator_output",
+    tools=[calculate_sip_projection],
 )
@@ -4,8 +4,14 @@ from typing import List, Dict, Any
 from google.adk.agents import LlmAgent
 from google.adk.tools.agent_tool import AgentTool
 from google.adk.tools import ToolContext
+from pydantic import ValidationError
+from ...catalog import AllocationError, allocate, confident, decode_fund, dump_fund, fund_catalog
+from ...hedged_model import with_fallback
+from ...model_tiering import register_rule, tiering_callback, with_tiering
+from ...prefetch import goal_of, horizon_years_of, investor_type_of, speculate
 from ...schemas import RecommendedFund
 import requests
+from .selection import recommended_ids, selection_fast_path
 from .validation_agent import fund_validation_agent
 
 # --- Constants ---
@@ -13,18 +19,29 @@ GEMINI_MODEL = "gemini-2.0-flash"
 BASE_URL = os.getenv("MUTUAL_FUND_SERVER_BASE_URL")
 
 # --- Fund Fetcher ---
-def fetch_funds_api(tool_context: ToolContext) -> List[Dict[str, Any]]:
-    """Fetch mutual funds from the local API and return the data as a list of dicts following the schema."""
-    response = requests.get(f"{BASE_URL}/funds")
-    response.raise_for_status()
-    data = response.json()
+def fetch_funds_api(more: bool, tool_context: ToolContext) -> List[Dict[str, Any]]:
+    """Fetch mutual funds from the local API and return the data as a list of dicts following the schema.
+    With more=True, only funds not fetched before in this session are returned."""
+    # Precomputed for the investor type, goal and horizon, best fit first; the session stays on one catalog version
+    state = tool_context.state
+    catalog = fund_catalog.get(state.get("catalog_version"))
+    state["catalog_version"] = catalog.version
+    shown = set(state.get("shown_fund_ids") or []) if more else set()
+    investor_type = investor_type_of(state)
+    funds = catalog.recommendations.page(investor_type, goal_of(state), horizon_years_of(state), shown) if investor_type else ()
+    if not funds and not (investor_type and more):
+        funds = [fund for fund in catalog if fund.id not in shown]
+    data = [{**fund.to_dict(), "analytics": catalog.analytics.metrics_for(fund.id)} for fund in funds]
     print(f"Data: {data}")
-    tool_context.state["recommended_funds"] = data
+    previous = state.get("recommended_funds") if more else None
+    # Funds shown earlier stay selectable after the user asked for more
+    tool_context.state["recommended_funds"] = [*previous, *data] if isinstance(previous, list) else data
+    tool_context.state["shown_fund_ids"] = [*shown, *(fund["_id"] for fund in data)]
     print(f"Tool context: {tool_context.state}")
     return {
         "action": "fetch_funds_api",
         "data": data,
-        "message": "Funds fetched successfully",
+        "message": "Funds fetched successfully" if data else "No more funds available",
     }
     
 def select_fund(fund: RecommendedFund, tool_context: ToolContext) -> Dict[str, Any]:
@@ -36,11 +53,42 @@ def select_fund(fund: RecommendedFund, tool_context: ToolContext) -> Dict[str, A
         "message": "Fund selected successfully",
     }
     
+def resolve_fund_name(text: str, tool_context: ToolContext) -> Dict[str, Any]:
+    """Find the fund the user means by a name or part of one, e.g. "axis small cap" or "the HDFC one"."""
+    state = tool_context.state
+    catalog = fund_catalog.get(state.get("catalog_version"))
+    state["catalog_version"] = catalog.version
+    # The recommended funds come first; the whole catalog only when none of them fits
+    matches = catalog.names.search(text, recommended_ids(state))
+    match = confident(matches)
+    if match is None:
+        matches = catalog.names.search(text)
+        match = confident(matches)
+    candidates = [{"fund_id": m.fund_id, "name": m.name, "score": m.score} for m in matches]
+    if match is None:
+        return {
+            "action": "resolve_fund_name",
+            "data": {"candidates": candidates},
+            "message": "No clear match; ask the user which of the candidates they mean" if candidates else "No matching fund",
+        }
+    data = {**catalog.get(match.fund_id).to_dict(), "analytics": catalog.analytics.metrics_for(match.fund_id)}
+    state["selected_fund"] = data
+    return {
+        "action": "resolve_fund_name",
+        "data": {"selected_fund": data, "candidates": candidates},
+        "message": "Fund selected successfully",
+    }
+
 def fetch_fund_details_api(fund_id: str, tool_context: ToolContext) -> Dict[str, Any]:
     """Fetch details of a fund from the local API and return the data as a dict."""
     response = requests.get(f"{BASE_URL}/funds/{fund_id}")
     response.raise_for_status()
-    data = response.json()
+    try:
+        data = dump_fund(decode_fund(response.content))
+    except ValidationError:
+        data = {}
+    else:
+        data["analytics"] = fund_catalog.get(tool_context.state.get("catalog_version")).analytics.metrics_for(fund_id)
     tool_context.state["selected_fund"] = data
     return {
         "action": "fetch_fund_details_api",
@@ -48,10 +96,53 @@ def fetch_fund_details_api(fund_id: str, tool_context: ToolContext) -> Dict[str,
         "message": "Fund details fetched successfully" if "_id" in data else "Fund details fetch failed",
     }
 
+def optimize_allocation(fund_ids: List[str], total_amount: float, tool_context: ToolContext) -> Dict[str, Any]:
+    """Split a monthly SIP amount across the given funds for the best expected return for the investor's risk."""
+    state = tool_context.state
+    catalog = fund_catalog.get(state.get("catalog_version"))
+    state["catalog_version"] = catalog.version
+    unknown = [fund_id for fund_id in fund_ids if catalog.get(fund_id) is None]
+    if unknown or not fund_ids:
+        return {
+            "action": "optimize_allocation",
+            "data": {},
+            "message": f"Unknown funds: {', '.join(unknown)}" if unknown else "No funds to allocate across",
+        }
+    records = [catalog.get(fund_id) for fund_id in dict.fromkeys(fund_ids)]
+    try:
+        allocation = allocate(records, catalog.analytics, total_amount, investor_type_of(state))
+    except AllocationError as e:
+        return {"action": "optimize_allocation", "data": {}, "message": str(e)}
+    data = {
+        "allocations": [
+            {
+                "fund_id": record.id,
+                "name": record.name,
+                "category": record.category,
+                "risk_level": record.risk_level,
+                "amount": allocation.amounts[record.id],
+                "share": round(allocation.amounts[record.id] / total_amount, 4),
+            }
+            for record in records
+            if record.id in allocation.amounts
+        ],
+        "expected_return": allocation.expected_return,
+        "volatility": allocation.volatility,
+        "notes": allocation.notes,
+    }
+    state["suggested_allocation"] = data
+    return {
+        "action": "optimize_allocation",
+        "data": data,
+        "message": "Allocation computed successfully",
+    }
+
 # --- LLM Agent Definition ---
 fund_recommender_agent = LlmAgent(
     name="FundRecommenderAgent",
-    model=GEMINI_MODEL,
+    model=with_tiering(with_fallback(GEMINI_MODEL)),
+    before_model_callback=tiering_callback,
+    after_agent_callback=speculate,
     description="Suggests mutual funds tailored to the user's profile, investor type, and financial goals.",
     instruction="""
     Role:
@@ -63,11 +154,24 @@ fund_recommender_agent = LlmAgent(
       - Balanced → Hybrid or Large-cap Funds
       - Aggressive → Small-cap, Flexi-cap, or Thematic Funds
     - Provide a reason for each recommended fund (e.g., strong returns, suitability for goal).
-    - If ask for more funds, use fetch_funds_api to fetch the funds and validate the funds using fund_validation_agent.
-    - Track shown_fund_ids to avoid duplicates and use fund_validation_agent if needed.
+      - Each fund comes with precomputed analytics: annualized returns (return_1y, return_3y, return_5y, return_10y),
+        consistency (0–1, higher is steadier across horizons), momentum (recent vs 3 year return),
+        return_per_risk and size_adjusted_return. Base the reasons on these rather than comparing raw returns yourself.
+    - Call fetch_funds_api with more=false for a first recommendation.
+    - If ask for more funds, call fetch_funds_api with more=true: it returns only funds not fetched before and keeps
+      shown_fund_ids up to date. If it returns no funds, reply: 'We currently have only these mutual funds available.'
+    - Use fund_validation_agent if needed to avoid duplicates.
     - Ask user if they want more details about the fund.
     - If user wants more details, use select_fund to select the fund and fetch the details using fetch_fund_details_api.
+    - When the user names a fund in their own words ("axis small cap", "the HDFC one"), call resolve_fund_name with
+      their words to select it instead of working out the fund_id yourself. If it returns candidates without a clear
+      match, ask the user which of them they mean.
+    - If the fund was already selected ("Great choice: ..." was shown), continue from the user's answer to that question.
     - If user not selected any fund, ask user to select a fund to proceed further.
+    - If the user wants to invest in several funds or asks how to split a monthly amount, call optimize_allocation
+      with the fund ids and the total monthly amount. Present each fund's amount, the expected return and the
+      volatility, and explain any notes (funds left out for risk or minimum SIP reasons) in plain words.
+      The suggested amounts can be passed to InvestmentAgent to start a portfolio SIP.
 
     Return Calculation:
     - For SIP return estimation, ask for monthly amount, duration, and expected return rate (default 12%)
@@ -102,5 +206,8 @@ fund_recommender_agent = LlmAgent(
     - After collecting the necessary information, return the Output in the format of FundRecommendationOutput.
     - After collecting the necessary information, smoothly forward the interaction to the **MutualFundAdvisorAgent** to handle the next step(this is mandatory to proceed further).
     """,
-    tools=[fetch_funds_api, select_fund, fetch_fund_details_api, AgentTool(fund_validation_agent)],
+    tools=[fetch_funds_api, select_fund, resolve_fund_name, fetch_fund_details_api, optimize_allocation, AgentTool(fund_validation_agent)],
 )
+
+# Obvious fund picks are resolved locally; the model only handles the rest
+register_rule(fund_recommender_agent.name, selection_fast_path)
@@ -0,0 +1,106 @@
+"""
+Deterministic fast path for fund selections.
+
+After recommending funds the agent asks the user to pick one. A reply that is
+just an option number or ordinal ("2", "the second one") or a recognizable part
+of a fund's name ("axis small cap", "the HDFC one") is resolved with the
+catalog's FundNameIndex to one of the funds listed in the agent's last message.
+The fund is stored as state["selected_fund"] and the follow-up question comes
+from a template, without a model call. Replies that do not resolve confidently,
+that mention an option inside a longer sentence ("second is risky") or that
+contain a negation ("not the second one") go to the model as before.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from ...catalog import FundCatalog, confident, fund_catalog
+from ..userProfileAgent.profile_parser import OPTION_LINE, last_question
+
+ORDINALS = {"first": "1", "1st": "1", "second": "2", "2nd": "2", "third": "3", "3rd": "3", "fourth": "4", "4th": "4", "fifth": "5", "5th": "5"}
+OPTION_NUMBER = re.compile(r"^\W*(?:option|no\.?|number|#)?\s*\(?(\d{1,2})[.)]?\W*$", re.IGNORECASE)
+ORDINAL = r"\b(?:" + "|".join(ORDINALS) + r")\b"
+OPTION_ORDINAL = re.compile(r"^\W*(?:the\s+)?(" + ORDINAL + r")(?:\s+(?:one|fund|option))?\W*$", re.IGNORECASE)
+# Replies that mention an option but may not pick it
+UNCLEAR_PICK = re.compile(
+    ORDINAL + r"|\b(?:not|no|nope|never|neither|nor|don['’]?t|doesn['’]?t|won['’]?t|except|instead|rather|other\s+than|anything\s+but)\b",
+    re.IGNORECASE,
+)
+
+SELECTED_QUESTION = """Great choice: {name}.
+What would you like to do next?
+1. See more details about this fund
+2. Invest in it using SIP or lumpsum"""
+
+
+def recommended_ids(state) -> List[str]:
+    return [fund["_id"] for fund in state.get("recommended_funds") or [] if isinstance(fund, dict) and fund.get("_id")]
+
+
+def option_name(text: str) -> str:
+    """The fund name in an option line: its bold part, or the text before a dash, colon or bracket."""
+    bold = re.search(r"\*\*(.+?)\*\*", text)
+    if bold:
+        return bold.group(1)
+    return re.split(r"\s+[-–—|]\s+|:\s|\s*\(", text, maxsplit=1)[0]
+
+
+def listed_funds(question: str, catalog: FundCatalog, candidates: List[str]) -> Dict[str, str]:
+    """Option number -> fund id for the numbered lines of question that name one of the candidates."""
+    listed = {}
+    for number, text in OPTION_LINE.findall(question):
+        match = confident(catalog.names.search(option_name(text), candidates))
+        if match is not None:
+            listed[number] = match.fund_id
+    return listed
+
+
+def chosen_number(answer: str) -> Optional[str]:
+    """The option number when the whole answer is one, as a number or an ordinal."""
+    match = OPTION_NUMBER.match(answer)
+    if match:
+        return match.group(1)
+    match = OPTION_ORDINAL.match(answer)
+    if match:
+        return ORDINALS[match.group(1).lower()]
+    return None
+
+
+def selection_fast_path(callback_context: CallbackContext, llm_request: LlmRequest, answer: str) -> Optional[LlmResponse]:
+    """Rule for FundRecommenderAgent: select the listed fund the user picked and ask what to do next."""
+    state = callback_context.state
+    candidates = recommended_ids(state)
+    if not candidates:
+        return None
+    question = last_question(llm_request)
+    try:
+        catalog = fund_catalog.get(state.get("catalog_version"))
+    except Exception:
+        # No catalog in this worker yet and the fund API is down: the model handles the turn
+        return None
+    listed = listed_funds(question, catalog, candidates)
+    if not listed:
+        # The pending question is not a choice between recommended funds
+        return None
+
+    number = chosen_number(answer)
+    if number is not None:
+        fund_id = listed.get(number)
+    elif UNCLEAR_PICK.search(answer):
+        # "not the HDFC one", "second is risky": the model decides what the user meant
+        return None
+    else:
+        match = confident(catalog.names.search(answer, list(listed.values())))
+        fund_id = match.fund_id if match is not None else None
+    record = catalog.get(fund_id) if fund_id is not None else None
+    if record is None:
+        return None
+
+    state["selected_fund"] = {**record.to_dict(), "analytics": catalog.analytics.metrics_for(record.id)}
+    text = SELECTED_QUESTION.format(name=record.name)
+    return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]))
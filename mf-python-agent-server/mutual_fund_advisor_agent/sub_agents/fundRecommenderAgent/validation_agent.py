@@ -1,11 +1,12 @@
 from google.adk.agents import LlmAgent
+from ...hedged_model import with_fallback
 
 GEMINI_MODEL = "gemini-2.0-flash"
 
 # --- Fund Validation Agent Definition ---
 fund_validation_agent = LlmAgent(
     name="FundValidationAgent",
-    model=GEMINI_MODEL,
+    model=with_fallback(GEMINI_MODEL),
     description="Validates if there are new mutual funds to show to the user.",
     instruction="""
     Role:
@@ -1,12 +1,33 @@
+import asyncio
 import os
 import requests
-from typing import Dict, Any
+from datetime import date
+from typing import Dict, Any, List, Optional
 from google.adk.agents import LlmAgent
 from google.adk.tools import ToolContext
+from pydantic import ValidationError
+from ...catalog import decode_fund, dump_fund
+from ...hedged_model import with_fallback
+from ...prefetch import as_dict, current_session
+from ...schemas import InvestmentDetailsOutput
+from ...sip_outbox import FAILED, SUCCEEDED, get_sip_outbox
+from ...token_cache import get_portal_tokens, session_key
 
 # Constants
 GEMINI_MODEL = "gemini-2.0-flash"
 BASE_URL = os.getenv("MUTUAL_FUND_SERVER_BASE_URL")
+SIP_CONFIRM_WAIT_SECONDS = float(os.getenv("SIP_CONFIRM_WAIT_SECONDS", "3"))
+MAX_PORTFOLIO_FUNDS = 5
+INVESTMENT_STATUS = {SUCCEEDED: "Active", FAILED: "Failed"}
+# SIP intents are keyed by user and session, so they are only recorded inside a turn run for a session
+NO_SESSION_RESPONSE = {"action": "start_sip_api", "data": None, "message": "SIP start failed: no active session, please try again"}
+
+def portal_login_key() -> Optional[str]:
+    """Token cache key of the running session's portal login; None outside a turn.
+
+    The agent's user id is not authenticated, so logins are never shared between sessions."""
+    session = current_session.get()
+    return session_key(*session) if session is not None else None
 
 # API functions
 def create_user_api(name: str, email: str, password: str, phone_number: str, tool_context: ToolContext) -> Dict[str, Any]:
@@ -31,31 +52,45 @@ def create_user_api(name: str, email: str, password: str, phone_number: str, too
         "message": "User created successfully" if "user" in data else "User creation failed",
     }
 
-def login_investment_portal(email: str, password: str, tool_context: ToolContext) -> Dict[str, Any]:
+async def login_investment_portal(email: str, password: str, tool_context: ToolContext) -> Dict[str, Any]:
     """Login to the investment portal."""
     headers = {"Content-Type": "application/json"}
     payload = {"email": email, "password": password}
-    response = requests.post(f"{BASE_URL}/users/login", headers=headers, json=payload)
+    response = await asyncio.to_thread(requests.post, f"{BASE_URL}/users/login", headers=headers, json=payload)
     response.raise_for_status()
     data = response.json()
     if "user" in data and "token" in data:
         tool_context.state["user_registered"] = True
         tool_context.state["jwt_token"] = data["token"]
+        key = portal_login_key()
+        if key is not None:
+            await asyncio.to_thread(lambda: get_portal_tokens().put(key, data["token"], email))
     else:
         tool_context.state["user_registered"] = False
         tool_context.state["jwt_token"] = None
     return {
         "action": "login_investment_portal",
-        "data": data,
+        # The token stays in session state for the SIP tools; the model does not need to see it
+        "data": {key: value for key, value in data.items() if key != "token"},
         "message": "Login successful" if "token" in data else "Login failed",
     }
 
-def start_sip_api(fund_id: str, amount: float, frequency: str, deduction_day: int, start_date: str, end_date: str, jwt_token: str, tool_context: ToolContext) -> Dict[str, Any]:
-    """Start a SIP in the investment portal."""
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {jwt_token}"
+async def get_portal_login(tool_context: ToolContext) -> Dict[str, Any]:
+    """Check whether the user is still logged in to the investment portal from earlier in this session."""
+    key = portal_login_key()
+    login = await asyncio.to_thread(lambda: get_portal_tokens().get(key)) if key is not None else None
+    if login is None:
+        return {"action": "get_portal_login", "data": None, "message": "Not logged in"}
+    tool_context.state["user_registered"] = True
+    tool_context.state["jwt_token"] = login.token
+    return {
+        "action": "get_portal_login",
+        "data": {"email": login.email},
+        "message": "Already logged in",
     }
+
+async def start_sip_api(fund_id: str, amount: float, frequency: str, deduction_day: int, start_date: str, end_date: str, tool_context: ToolContext) -> Dict[str, Any]:
+    """Start a SIP in the investment portal. Returns once it is confirmed, or as submitted when confirmation takes longer."""
     payload = {
         "fundId": fund_id,
         "amount": amount,
@@ -64,23 +99,186 @@ def start_sip_api(fund_id: str, amount: float, frequency: str, deduction_day: in
         "startDate": start_date,
         "endDate": end_date
     }
-    response = requests.post(f"{BASE_URL}/transactions/sip", headers=headers, json=payload)
-    response.raise_for_status()
-    data = response.json()
-    if "_id" in data:
-        tool_context.state["sip_started"] = True
+    session = current_session.get()
+    if session is None:
+        return NO_SESSION_RESPONSE
+    jwt_token = await session_token(tool_context)
+    outbox = await asyncio.to_thread(get_sip_outbox)
+    submission = await asyncio.to_thread(outbox.enqueue, *session, payload, jwt_token)
+    submission = await outbox.wait(submission["id"], SIP_CONFIRM_WAIT_SECONDS)
+    tool_context.state["sip_portfolio"] = None
+    return sip_submission_response("start_sip_api", submission, tool_context)
+
+async def start_portfolio_sip_api(fund_ids: List[str], amounts: List[float], frequency: str, deduction_day: int, start_date: str, end_date: str, tool_context: ToolContext) -> Dict[str, Any]:
+    """Start one SIP per fund, with amounts[i] invested monthly in fund_ids[i]. All legs are validated first and submitted together."""
+    legs, errors = await validate_portfolio(fund_ids, amounts, frequency, deduction_day, start_date, end_date, tool_context)
+    if errors:
+        return {"action": "start_portfolio_sip_api", "data": {"errors": errors}, "message": "Portfolio SIP not started, please correct the allocation"}
+
+    session = current_session.get()
+    if session is None:
+        return {**NO_SESSION_RESPONSE, "action": "start_portfolio_sip_api"}
+    jwt_token = await session_token(tool_context)
+    payloads = [
+        {
+            "fundId": leg.fund_id,
+            "amount": leg.amount,
+            "frequency": leg.frequency,
+            "deductionDay": leg.deduction_day,
+            "startDate": leg.start_date,
+            "endDate": leg.end_date
+        }
+        for leg in legs
+    ]
+    outbox = await asyncio.to_thread(get_sip_outbox)
+    submissions = await asyncio.to_thread(outbox.enqueue_many, *session, payloads, jwt_token)
+    submissions = await asyncio.gather(
+        *(outbox.wait(submission["id"], SIP_CONFIRM_WAIT_SECONDS) for submission in submissions)
+    )
+    tool_context.state["sip_submission"] = None
+    return portfolio_response("start_portfolio_sip_api", legs, submissions, tool_context)
+
+async def session_token(tool_context: ToolContext) -> Optional[str]:
+    """The session's current portal token: the cached one, refreshed when needed, else the one from its login."""
+    key = portal_login_key()
+    # The cache reads a table and may refresh the token over HTTP, so it runs off the event loop
+    token = await asyncio.to_thread(lambda: get_portal_tokens().token_for(key)) if key is not None else None
+    return token or tool_context.state.get("jwt_token")
+
+async def validate_portfolio(fund_ids: List[str], amounts: List[float], frequency: str, deduction_day: int, start_date: str, end_date: str, tool_context: ToolContext):
+    """InvestmentDetailsOutput per leg, and every problem found with the allocation."""
+    errors = []
+    if not fund_ids or len(fund_ids) != len(amounts):
+        return [], ["Give exactly one amount for each fund"]
+    if len(fund_ids) > MAX_PORTFOLIO_FUNDS:
+        errors.append(f"At most {MAX_PORTFOLIO_FUNDS} funds can be combined in one portfolio")
+    if len(set(fund_ids)) != len(fund_ids):
+        errors.append("Each fund can appear only once")
+    try:
+        if date.fromisoformat(end_date) <= date.fromisoformat(start_date):
+            errors.append("The end date must be after the start date")
+    except ValueError:
+        errors.append("Dates must be in YYYY-MM-DD format")
+
+    funds = known_funds(tool_context.state)
+    missing = [fund_id for fund_id in dict.fromkeys(fund_ids) if fund_id not in funds]
+    if missing:
+        fetched = await asyncio.gather(*(asyncio.to_thread(fetch_fund, fund_id) for fund_id in missing))
+        funds.update((fund_id, fund) for fund_id, fund in zip(missing, fetched) if fund)
+
+    legs = []
+    for fund_id, amount in zip(fund_ids, amounts):
+        fund = funds.get(fund_id)
+        if fund is None:
+            errors.append(f"Fund {fund_id} was not found")
+            continue
+        name = fund.get("name", fund_id)
+        if fund.get("is_active") is False:
+            errors.append(f"{name} is not open for investment")
+        min_sip_amount = fund.get("min_sip_amount") or 0
+        if amount < min_sip_amount:
+            errors.append(f"{name} needs at least ₹{min_sip_amount:g} per month, got ₹{amount:g}")
+        try:
+            legs.append(InvestmentDetailsOutput(
+                fund_id=fund_id,
+                fund_name=name,
+                amount=amount,
+                frequency=frequency,
+                deduction_day=deduction_day,
+                start_date=start_date,
+                end_date=end_date,
+                user_email=as_dict(tool_context.state.get("user_profile")).get("email"),
+            ))
+        except ValidationError as e:
+            # Only the fields shared by all legs can fail here, so they are reported once
+            errors.extend(f"{error['loc'][0]}: {error['msg']}" for error in e.errors())
+    return legs, list(dict.fromkeys(errors))
+
+def known_funds(state) -> Dict[str, Dict[str, Any]]:
+    """Funds already in session state by id: the fetched recommendations and the selected fund."""
+    recommended = state.get("recommended_funds") or []
+    if isinstance(recommended, dict):
+        recommended = recommended.get("recommended_funds") or []
+    funds = {}
+    for fund in [*recommended, state.get("selected_fund")]:
+        fund = as_dict(fund)
+        fund_id = fund.get("_id") or fund.get("id")
+        if fund_id:
+            funds[fund_id] = fund
+    return funds
+
+def fetch_fund(fund_id: str):
+    response = requests.get(f"{BASE_URL}/funds/{fund_id}")
+    if not response.ok:
+        return None
+    try:
+        return dump_fund(decode_fund(response.content))
+    except ValidationError:
+        return None
+
+def portfolio_response(action: str, legs: List[InvestmentDetailsOutput], submissions: List[Dict[str, Any]], tool_context: ToolContext) -> Dict[str, Any]:
+    """Outcome per leg; legs that failed are reported without hiding the ones that started."""
+    details = []
+    for leg, submission in zip(legs, submissions):
+        leg = leg.model_copy(update={"investment_status": INVESTMENT_STATUS.get(submission["status"], "Submitted")})
+        details.append({
+            **leg.model_dump(),
+            "submission_id": submission["id"],
+            "error": submission["last_error"] if submission["status"] == FAILED else None,
+        })
+    tool_context.state["investment_details"] = [
+        {key: value for key, value in leg.items() if key in InvestmentDetailsOutput.model_fields} for leg in details
+    ]
+    tool_context.state["sip_portfolio"] = [
+        {"id": leg["submission_id"], "fund_id": leg["fund_id"], "status": submission["status"]}
+        for leg, submission in zip(details, submissions)
+    ]
+    started = sum(submission["status"] == SUCCEEDED for submission in submissions)
+    failed = sum(submission["status"] == FAILED for submission in submissions)
+    tool_context.state["sip_started"] = started == len(submissions)
+    if started == len(submissions):
+        message = f"All {started} SIPs started successfully"
+    elif failed == len(submissions):
+        message = "Portfolio SIP start failed"
+    elif started + failed == len(submissions):
+        message = f"{started} of {len(submissions)} SIPs started, {failed} failed"
     else:
+        message = f"{started} of {len(submissions)} SIPs started, the rest are being confirmed with the investment portal"
+    return {"action": action, "data": details, "message": message}
+
+async def check_sip_status(tool_context: ToolContext) -> Dict[str, Any]:
+    """Check whether the SIPs submitted earlier have been confirmed by the investment portal."""
+    outbox = await asyncio.to_thread(get_sip_outbox)
+    portfolio = tool_context.state.get("sip_portfolio")
+    if portfolio:
+        details = tool_context.state.get("investment_details") or []
+        legs = [InvestmentDetailsOutput(**leg) for leg in details]
+        submissions = await asyncio.gather(*(asyncio.to_thread(outbox.get, leg["id"]) for leg in portfolio))
+        return portfolio_response("check_sip_status", legs, list(submissions), tool_context)
+    submission_id = (tool_context.state.get("sip_submission") or {}).get("id")
+    submission = await asyncio.to_thread(outbox.get, submission_id) if submission_id else None
+    if submission is None:
+        return {"action": "check_sip_status", "data": None, "message": "No SIP has been submitted"}
+    return sip_submission_response("check_sip_status", submission, tool_context)
+
+def sip_submission_response(action: str, submission: Dict[str, Any], tool_context: ToolContext) -> Dict[str, Any]:
+    tool_context.state["sip_submission"] = {"id": submission["id"], "status": submission["status"]}
+    if submission["status"] == SUCCEEDED:
+        tool_context.state["sip_started"] = True
+        return {"action": action, "data": submission["result"], "message": "SIP started successfully"}
+    if submission["status"] == FAILED:
         tool_context.state["sip_started"] = False
+        return {"action": action, "data": None, "message": f"SIP start failed: {submission['last_error']}"}
     return {
-        "action": "start_sip_api",
-        "data": data,
-        "message": "SIP started successfully" if "_id" in data else "SIP start failed",
+        "action": action,
+        "data": {"submission_id": submission["id"], "status": submission["status"]},
+        "message": "SIP submitted, confirming with the investment portal",
     }
 
 # Agent definition
 investment_agent = LlmAgent(
     name="InvestmentAgent",
-    model=GEMINI_MODEL,
+    model=with_fallback(GEMINI_MODEL),
     description="Handles the investment process after fund selection.",
     instruction=f"""
           Role:
@@ -94,15 +292,17 @@ investment_agent = LlmAgent(
               - Internally return control to FundRecommenderAgent
 
           2. Registration/Login Decision:
-            - Ask: "Have you already registered on our investment portal, or would you like to create a new account?"
+            - First call get_portal_login.
+              * If it returns "Already logged in", tell the user they are logged in as data.email and continue with step 3.
+            - Otherwise ask: "Have you already registered on our investment portal, or would you like to create a new account?"
             - If user is already registered:
               * Ask for email and password.
               * Call login_investment_portal
-              * Store: user_profile.email, jwt_token
+              * Store: user_profile.email
             - If user is new:
               * Ask for name, email, password, and phone number
               * Call create_user_api
-              * Store: user_profile.name, email, phone_number, jwt_token
+              * Store: user_profile.name, email, phone_number
 
           3. SIP Setup:
             - Confirm selected fund using recommended_funds.selected_fund.name, recommended_funds.selected_fund._id, and recommended_funds.selected_fund.min_sip_amount
@@ -112,14 +312,25 @@ investment_agent = LlmAgent(
               * "When would you like to end the SIP? (format: YYYY-MM-DD)"
             - Default start_date = today's date in YYYY-MM-DD
 
+          Portfolio Mode:
+            - If the user wants to split the monthly investment across several of the recommended funds, ask for the amount per fund,
+              then the deduction day and end date once for all of them.
+            - Call start_portfolio_sip_api with fund_ids and amounts in the same order, plus frequency, deduction_day, start_date, end_date.
+            - If it returns errors, show all of them together and ask only for the corrections.
+            - Report each fund's outcome: started, failed (with the reason) or being confirmed. For failed funds, offer to retry;
+              calling start_portfolio_sip_api again with the same allocation does not start the successful ones twice.
+
           4. SIP Execution:
             - fund_id = recommended_funds.selected_fund._id (is the unique id of the fund selected by the user)
             - Call start_sip_api with:
-              * fund_id, amount, frequency, deduction_day, start_date, end_date, jwt_token
+              * fund_id, amount, frequency, deduction_day, start_date, end_date
             - Store investment_details in session:
               * amount, frequency, deduction_day, start_date, end_date
 
           5. Confirmation:
+            - If the SIP is submitted but still being confirmed, respond:
+              "Your SIP request has been submitted and is being confirmed with the investment portal. I'll confirm it shortly."
+              - On the user's next message, call check_sip_status and continue with the outcome below.
             - On success, respond:
               "✅ Your investment in [fund_name] has been set up!"
               "Monthly Amount: ₹[investment_details.amount], Deduction Day: [investment_details.deduction_day], Duration: [investment_details.start_date] to [investment_details.end_date]"
@@ -154,7 +365,10 @@ investment_agent = LlmAgent(
           """,
     tools=[
         create_user_api,
+        get_portal_login,
         login_investment_portal,
-        start_sip_api
+        start_sip_api,
+        start_portfolio_sip_api,
+        check_sip_status
     ],
 )
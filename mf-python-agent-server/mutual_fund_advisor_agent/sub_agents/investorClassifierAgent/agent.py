@@ -1,4 +1,7 @@
 from google.adk.agents import LlmAgent
+from ...hedged_model import with_fallback
+from ...model_tiering import tiering_callback, with_tiering
+from ...prefetch import speculate
 
 # --- Constants ---
 GEMINI_MODEL = "gemini-2.0-flash"
@@ -6,7 +9,9 @@ GEMINI_MODEL = "gemini-2.0-flash"
 # --- LLM Agent Definition ---
 investor_classifier_agent = LlmAgent(
     name="InvestorClassifierAgent",
-    model=GEMINI_MODEL,
+    model=with_tiering(with_fallback(GEMINI_MODEL)),
+    before_model_callback=tiering_callback,
+    after_agent_callback=speculate,
     description="Evaluates user profile to classify the investor type based on risk appetite and investment horizon.",
     instruction="""
     Role:
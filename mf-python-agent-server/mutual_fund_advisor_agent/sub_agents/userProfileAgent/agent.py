@@ -8,6 +8,9 @@ required for investment planning and mutual fund recommendations.
 from google.adk.agents import LlmAgent
 from google.adk.tools.agent_tool import AgentTool
 from google.adk.tools import ToolContext
+from ...hedged_model import with_fallback
+from ...model_tiering import register_rule, tiering_callback, with_tiering
+from .profile_parser import profile_fast_path
 from typing import Dict, Any
 
 # --- Constants ---
@@ -39,7 +42,8 @@ def set_user_profile_field(tool_context: ToolContext, field: str, value: str) ->
 # Create the user profile agent
 user_profile_agent = LlmAgent(
    name="UserProfileAgent",
-   model=GEMINI_MODEL,
+   model=with_tiering(with_fallback(GEMINI_MODEL)),
+   before_model_callback=tiering_callback,
     description = "Gathers and validates essential user details to enable personalized investment planning.",
     instruction = """
     Role:
@@ -92,3 +96,6 @@ user_profile_agent = LlmAgent(
     # output_key="user_profile",
     tools=[set_user_profile_field],
 )
+
+# Obvious answers are parsed locally; the model only handles the rest
+register_rule(user_profile_agent.name, profile_fast_path)
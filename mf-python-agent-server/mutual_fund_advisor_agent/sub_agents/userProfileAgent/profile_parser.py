@@ -0,0 +1,233 @@
+"""
+Deterministic fast path for UserProfileAgent answers.
+
+Most onboarding answers are obvious ("32", "1.5 lakh", "Medium", "2"). The
+field the user is answering is taken from the pending question (the last
+question asked, by this module or by the model); a typed parser for that field
+turns the answer into a value, which is validated against UserProfileOutput and
+written to state["user_profile"]. The next question then comes from a template,
+without a model call. Whenever the field or the answer is not clear, the model
+handles the turn as before.
+"""
+
+import re
+from typing import Callable, Dict, List, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from pydantic import TypeAdapter, ValidationError
+
+from ...schemas import UserProfileOutput
+
+# --- Profile fields ---
+# state["user_profile"] keys, in the order they are asked. The keys follow the
+# agent's instructions; PROFILE_SCHEMA_FIELDS maps the ones named differently
+# in UserProfileOutput.
+PROFILE_FIELDS = [
+    "name",
+    "age",
+    "monthly_income",
+    "assets",
+    "existing_investments",
+    "risk_tolerance",
+    "investment_horizon",
+    "preferred_investment_mode",
+    "investment_experience",
+]
+PROFILE_SCHEMA_FIELDS = {"investment_horizon": "investment_horizon_years"}
+
+OPTIONS = {
+    "risk_tolerance": ["Low", "Medium", "High"],
+    "preferred_investment_mode": ["SIP", "Lumpsum", "Hybrid"],
+    "investment_experience": ["Beginner", "Intermediate", "Advanced"],
+}
+OPTION_ALIASES = {
+    "moderate": "Medium",
+    "lump sum": "Lumpsum",
+    "one time": "Lumpsum",
+    "mixed": "Hybrid",
+    "new": "Beginner",
+    "expert": "Advanced",
+}
+
+QUESTIONS = {
+    "name": "May I know your name?",
+    "age": "What is your age?",
+    "monthly_income": "What is your monthly income (in ₹)?",
+    "assets": "Which assets do you currently hold (FDs, gold, property)? You can also say none.",
+    "existing_investments": "What existing investments do you have (PPF, mutual funds, stocks)? You can also say none.",
+    "risk_tolerance": "What is your risk tolerance?",
+    "investment_horizon": "For how many years would you like to stay invested?",
+    "preferred_investment_mode": "What is your preferred investment mode?",
+    "investment_experience": "How would you describe your investment experience?",
+    "email": "What is your email address?",
+}
+
+# Keywords identifying the field a question asks for; a question must match exactly one field
+QUESTION_KEYWORDS = {
+    "email": r"\be-?mail\b",
+    "age": r"\bage\b|\bhow old\b",
+    "monthly_income": r"\bincome\b|\bsalary\b|\bearn",
+    "assets": r"\bassets?\b",
+    "existing_investments": r"\bexisting investments?\b|\bcurrent investments?\b",
+    "risk_tolerance": r"\brisk\b",
+    "investment_horizon": r"\bhorizon\b|\bhow (many|long)\b.*\byears?\b|\bhow long\b",
+    "preferred_investment_mode": r"\b(mode|sip|lump\s?sum)\b",
+    "investment_experience": r"\bexperience\b",
+    "name": r"\bname\b",
+}
+OPTION_LINE = re.compile(r"^\W*(\d{1,2})[.)]\s*(.+?)\s*$", re.MULTILINE)
+
+AMOUNT = re.compile(
+    r"^(?:rs\.?|inr|₹)?\s*(\d[\d,]*(?:\.\d+)?)\s*(k|thousand|l|lakhs?|lacs?|cr|crores?)?"
+    r"\s*(?:per month|a month|/\s*month|monthly|pm|p\.m\.)?\.?$",
+    re.IGNORECASE,
+)
+MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "l": 1e5, "lakh": 1e5, "lac": 1e5, "cr": 1e7, "crore": 1e7}
+AGE = re.compile(r"^(?:i am|i'm|im)?\s*(\d{1,3})\s*(?:years?|yrs?)?(?:\s*old)?\.?$", re.IGNORECASE)
+YEARS = re.compile(r"^(\d{1,2})\s*(?:\+|years?|yrs?|y)?\.?$", re.IGNORECASE)
+EMAIL = re.compile(r"^[\w.+-]+@[\w-]+(\.[\w-]+)+$")
+NONE_ANSWERS = {"none", "no", "nil", "nothing", "skip", "na", "n/a", "not any"}
+
+
+def parse_amount(text: str) -> Optional[float]:
+    match = AMOUNT.match(text.strip())
+    if not match:
+        return None
+    value = float(match.group(1).replace(",", ""))
+    unit = (match.group(2) or "").lower().rstrip("s")
+    value *= MULTIPLIERS.get(unit, 1)
+    return value if value > 0 else None
+
+
+def parse_age(text: str) -> Optional[int]:
+    match = AGE.match(text.strip())
+    if not match:
+        return None
+    age = int(match.group(1))
+    return age if 18 <= age <= 100 else None
+
+
+def parse_years(text: str) -> Optional[int]:
+    match = YEARS.match(text.strip())
+    if not match:
+        return None
+    years = int(match.group(1))
+    return years if 1 <= years <= 50 else None
+
+
+def parse_email(text: str) -> Optional[str]:
+    text = text.strip()
+    return text.lower() if EMAIL.match(text) else None
+
+
+def parse_none(text: str) -> Optional[List[str]]:
+    return [] if text.strip().lower().rstrip(".!") in NONE_ANSWERS else None
+
+
+def option_parser(field: str) -> Callable[[str], Optional[str]]:
+    def parse(text: str) -> Optional[str]:
+        answer = text.strip(" .!*_").lower()
+        for option in OPTIONS[field]:
+            if answer == option.lower():
+                return option
+        alias = OPTION_ALIASES.get(answer)
+        return alias if alias in OPTIONS[field] else None
+
+    return parse
+
+
+PARSERS: Dict[str, Callable[[str], object]] = {
+    "age": parse_age,
+    "monthly_income": parse_amount,
+    "investment_horizon": parse_years,
+    "assets": parse_none,
+    "existing_investments": parse_none,
+    "email": parse_email,
+    **{field: option_parser(field) for field in OPTIONS},
+}
+
+SCHEMA_ADAPTERS = {
+    field: TypeAdapter(UserProfileOutput.model_fields[PROFILE_SCHEMA_FIELDS.get(field, field)].annotation)
+    for field in PROFILE_FIELDS
+}
+
+
+def pending_field(question: str) -> Optional[str]:
+    """The profile field a question asks for, or None when it is not clear."""
+    # Only the last sentence asking something counts, not acknowledgements before it
+    asked = re.findall(r"[^.?!\n]*\?", question)
+    text = asked[-1] if asked else question
+    fields = [field for field, pattern in QUESTION_KEYWORDS.items() if re.search(pattern, text, re.IGNORECASE)]
+    return fields[0] if len(fields) == 1 else None
+
+
+def parse_answer(field: str, answer: str, question: str) -> Optional[object]:
+    """Typed value for an answer to the question about field, or None when not confident."""
+    parser = PARSERS.get(field)
+    if parser is None:
+        return None
+    options = dict(OPTION_LINE.findall(question))
+    if field in OPTIONS and not options:
+        # Template questions list the options in OPTIONS order
+        options = {str(number): option for number, option in enumerate(OPTIONS[field], start=1)}
+    choice = re.fullmatch(r"\(?(\d{1,2})[.)]?", answer.strip())
+    if choice and choice.group(1) in options:
+        answer = options[choice.group(1)]
+    value = parser(answer)
+    if value is None or field not in SCHEMA_ADAPTERS:
+        return value
+    try:
+        return SCHEMA_ADAPTERS[field].validate_python(value)
+    except ValidationError:
+        return None
+
+
+def next_question(profile: Dict) -> Optional[str]:
+    """Template for the first field not answered yet, or None when the profile is complete."""
+    for field in PROFILE_FIELDS:
+        if field not in profile:
+            question = QUESTIONS[field]
+            if field in OPTIONS:
+                question += "\n" + "\n".join(
+                    f"{number}. {option}" for number, option in enumerate(OPTIONS[field], start=1)
+                )
+            return question
+    return None
+
+
+def last_question(llm_request: LlmRequest) -> str:
+    """Text of the agent's last message in the conversation, i.e. the pending question."""
+    for content in reversed(llm_request.contents):
+        if content.role == "model" and content.parts:
+            text = "".join(part.text for part in content.parts if part.text)
+            if text:
+                return text
+    return ""
+
+
+def profile_fast_path(callback_context: CallbackContext, llm_request: LlmRequest, answer: str) -> Optional[LlmResponse]:
+    """Rule for UserProfileAgent: store an obvious answer and ask the next question from a template."""
+    question = last_question(llm_request)
+    field = pending_field(question)
+    if field is None:
+        return None
+    value = parse_answer(field, answer, question)
+    if value is None:
+        return None
+
+    profile = callback_context.state.get("user_profile")
+    if profile is None:
+        profile = {}
+    elif hasattr(profile, "dict"):
+        profile = profile.dict()
+    profile = {**profile, field: value}
+    callback_context.state["user_profile"] = profile
+
+    question = next_question(profile)
+    if question is None:
+        # Profile complete: the model summarises it and hands over to the next agent
+        return None
+    return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=question)]))
@@ -0,0 +1,219 @@
+"""
+Investment portal session tokens, cached per agent session.
+
+A SIP retried by the outbox after the JWT expired failed. The cache keeps the
+token a session got at login (never the password), keyed by the agent's user
+and session id. The agent's user id is not authenticated, so a token is never
+shared with another session: every session logs in with the password.
+
+- the expiry is read from the token's "exp" claim;
+- a token within PORTAL_TOKEN_REFRESH_BEFORE_SECONDS of expiring is exchanged
+  for a new one through POST /users/refresh-token, once per session at a time;
+- tokens are kept in a table next to the SIP outbox, so every worker process
+  serving the session and the outbox's retries use the current one, with an
+  in-memory copy in front.
+
+The cache and its table are created by the first get_portal_tokens() call.
+"""
+
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from sqlalchemy import Column, Engine, Float, MetaData, String, Table, Text, delete, insert, select, update
+
+from .sip_outbox import create_outbox_engine
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+BASE_URL = os.getenv("MUTUAL_FUND_SERVER_BASE_URL")
+# Assumed lifetime of a token without an "exp" claim
+DEFAULT_TOKEN_TTL_SECONDS = 3600.0
+
+token_metadata = MetaData()
+PORTAL_TOKENS = Table(
+    "portal_session_tokens",
+    token_metadata,
+    Column("session_key", String, primary_key=True),
+    Column("email", String),
+    Column("token", Text, nullable=False),
+    Column("expires_at", Float, nullable=False),
+    Column("refreshed_at", Float, nullable=False),
+)
+
+
+def jwt_expiry(token: str) -> Optional[float]:
+    """The "exp" claim of a JWT as a unix timestamp. The signature is not checked; the portal does that."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def refresh_portal_token(token: str, timeout: float = 10) -> str:
+    """Exchange a still valid token for a new one through the Node API."""
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
+    response = requests.post(f"{BASE_URL}/users/refresh-token", headers=headers, timeout=timeout)
+    response.raise_for_status()
+    return response.json()["token"]
+
+
+def session_key(user_id: str, session_id: str) -> str:
+    """Cache key of an agent session's portal login."""
+    return f"{user_id}/{session_id}"
+
+
+@dataclass
+class PortalToken:
+    token: str
+    expires_at: float
+    email: Optional[str] = None
+
+
+class PortalTokenCache:
+    """Portal tokens per agent session (see session_key): memory in front of a shared table, refreshed before they expire."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        refresh: Callable[[str], str] = refresh_portal_token,
+        refresh_before_seconds: float = 3600.0,
+        min_validity_seconds: float = 60.0,
+    ):
+        self.engine = engine
+        self._writer = engine.execution_options(sqlite_begin="IMMEDIATE")
+        self.refresh = refresh
+        self.refresh_before_seconds = refresh_before_seconds
+        self.min_validity_seconds = min_validity_seconds
+
+        self._entries: Dict[str, PortalToken] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+        token_metadata.create_all(self._writer)
+
+    @classmethod
+    def from_env(cls) -> "PortalTokenCache":
+        db_url = os.getenv("PORTAL_TOKEN_DB_URL") or os.getenv("SIP_OUTBOX_DB_URL", "sqlite:///./sip_outbox.db")
+        return cls(
+            create_outbox_engine(db_url),
+            refresh_before_seconds=float(os.getenv("PORTAL_TOKEN_REFRESH_BEFORE_SECONDS", "3600")),
+            min_validity_seconds=float(os.getenv("PORTAL_TOKEN_MIN_VALIDITY_SECONDS", "60")),
+        )
+
+    def put(self, key: str, token: str, email: Optional[str] = None) -> PortalToken:
+        """Store the token a session got at login or refresh."""
+        now = time.time()
+        previous = self._entries.get(key)
+        email = email or (previous.email if previous else None)
+        entry = PortalToken(token=token, expires_at=jwt_expiry(token) or now + DEFAULT_TOKEN_TTL_SECONDS, email=email)
+        with self._writer.begin() as connection:
+            updated = connection.execute(
+                update(PORTAL_TOKENS)
+                .where(PORTAL_TOKENS.c.session_key == key)
+                .values(token=token, expires_at=entry.expires_at, refreshed_at=now, **({"email": email} if email else {}))
+            )
+            if updated.rowcount == 0:
+                connection.execute(
+                    insert(PORTAL_TOKENS).values(
+                        session_key=key, email=email, token=token, expires_at=entry.expires_at, refreshed_at=now
+                    )
+                )
+        self._entries[key] = entry
+        return entry
+
+    def get(self, key: str) -> Optional[PortalToken]:
+        """A usable token for the session, refreshed first when it expires soon; None when the user must log in."""
+        entry = self._entries.get(key)
+        if entry is None or self._expires_soon(entry):
+            # Another worker may have logged in or refreshed already
+            entry = self._load(key) or entry
+        if entry is not None and self._expires_soon(entry):
+            entry = self._refresh(key, entry)
+        if entry is None or entry.expires_at - time.time() < self.min_validity_seconds:
+            if entry is not None:
+                self.invalidate(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def token_for(self, key: str) -> Optional[str]:
+        entry = self.get(key)
+        return entry.token if entry else None
+
+    def invalidate(self, key: str) -> None:
+        self._entries.pop(key, None)
+        with self._writer.begin() as connection:
+            connection.execute(delete(PORTAL_TOKENS).where(PORTAL_TOKENS.c.session_key == key))
+
+    def _expires_soon(self, entry: PortalToken) -> bool:
+        return entry.expires_at - time.time() < self.refresh_before_seconds
+
+    def _load(self, key: str) -> Optional[PortalToken]:
+        with self.engine.connect() as connection:
+            row = connection.execute(select(PORTAL_TOKENS).where(PORTAL_TOKENS.c.session_key == key)).mappings().first()
+        if row is None:
+            return None
+        entry = PortalToken(token=row["token"], expires_at=row["expires_at"], email=row["email"])
+        self._entries[key] = entry
+        return entry
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _refresh(self, key: str, entry: PortalToken) -> PortalToken:
+        with self._lock_for(key):
+            # A concurrent caller may have refreshed while this one waited
+            current = self._entries.get(key)
+            if current is not None and not self._expires_soon(current):
+                return current
+            if entry.expires_at <= time.time():
+                return entry
+            try:
+                token = self.refresh(entry.token)
+            except Exception as e:
+                # Keep using the current token while it is still valid
+                self.refresh_failures += 1
+                logger.warning(f"Refreshing the portal token of session {key} failed: {e}")
+                return entry
+            self.refreshes += 1
+            return self.put(key, token, entry.email)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions_in_memory": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+        }
+
+
+_portal_tokens: Optional[PortalTokenCache] = None
+_portal_tokens_lock = threading.Lock()
+
+
+def get_portal_tokens() -> PortalTokenCache:
+    """The portal token cache of this process, created on the first call."""
+    global _portal_tokens
+    if _portal_tokens is None:
+        with _portal_tokens_lock:
+            if _portal_tokens is None:
+                _portal_tokens = PortalTokenCache.from_env()
+    return _portal_tokens
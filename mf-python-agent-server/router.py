@@ -0,0 +1,401 @@
+"""
+Multi-process API server with user-affinity routing.
+
+Starts N api_server worker processes (one uvicorn each, on consecutive local
+ports) and a small front router. The router sends every request of a user to
+the worker that owns user_id on a consistent-hash ring, so per-worker caches
+(idempotent results, prefetched data, ...) stay warm; workers share the
+session store. /batch requests are split per worker and their NDJSON streams
+merged.
+
+A rolling restart (POST /router/restart or SIGHUP) drains one worker at a
+time: its users move to their next worker on the ring, the worker finishes
+its running turns, is restarted and rejoins the ring once its /readyz reports
+it warm.
+
+Usage:
+    python router.py --workers 4 --port 8000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import secrets
+import signal
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from session_services.sharded import ConsistentHashRing
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+DEFAULT_BASE_WORKER_PORT = 8100
+DEFAULT_DRAIN_TIMEOUT_SECONDS = 120
+STARTUP_TIMEOUT_SECONDS = 60
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "te", "upgrade", "host", "content-length"}
+
+# Paths whose first segment after the prefix is the user id
+USER_PATH = re.compile(r"^/(?:start|message|history|metrics/turn-queue)/(?P<user_id>[^/]+)")
+
+
+@dataclass
+class Worker:
+    """One api_server process and the router's counters for it."""
+    name: str
+    port: int
+    process: Optional[asyncio.subprocess.Process] = None
+    draining: bool = False
+    in_flight: int = 0
+    routed: int = 0
+    errors: int = 0
+    restarts: int = 0
+    started_at: float = field(default_factory=time.time)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+
+class WorkerPool:
+    """Starts, routes to, drains and restarts the api_server workers."""
+
+    def __init__(
+        self,
+        worker_count: int,
+        app: str = "api_server:app",
+        base_port: int = DEFAULT_BASE_WORKER_PORT,
+        drain_timeout_seconds: float = DEFAULT_DRAIN_TIMEOUT_SECONDS,
+        app_dir: Optional[str] = None,
+    ):
+        self.app = app
+        self.app_dir = app_dir
+        self.drain_timeout_seconds = drain_timeout_seconds
+        self.workers = {
+            f"worker-{index}": Worker(name=f"worker-{index}", port=base_port + index) for index in range(worker_count)
+        }
+        self.client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5.0))
+        self._ring = ConsistentHashRing(list(self.workers))
+        self._restart_lock = asyncio.Lock()
+        # Shared with the workers, whose /admin/ endpoints refuse requests without it
+        self.admin_token = os.getenv("ADMIN_TOKEN") or secrets.token_urlsafe(32)
+
+    # ===== Processes =====
+
+    def _worker_env(self, worker: Worker) -> Dict[str, str]:
+        env = dict(os.environ, WORKER_ID=worker.name, ADMIN_TOKEN=self.admin_token)
+        if worker.name != "worker-0":
+            # One session reaper is enough for a shared session store
+            env["SESSION_REAPER_ENABLED"] = "false"
+        return env
+
+    async def _spawn(self, worker: Worker) -> None:
+        command = [
+            sys.executable, "-m", "uvicorn", self.app,
+            "--host", "127.0.0.1", "--port", str(worker.port),
+            "--timeout-graceful-shutdown", str(int(self.drain_timeout_seconds)),
+            "--log-level", "warning",
+        ]
+        if self.app_dir:
+            command += ["--app-dir", self.app_dir]
+        worker.process = await asyncio.create_subprocess_exec(*command, env=self._worker_env(worker))
+        worker.started_at = time.time()
+        worker.draining = False
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if worker.process.returncode is not None:
+                raise RuntimeError(f"{worker.name} exited with code {worker.process.returncode}")
+            try:
+                # /readyz answers 503 until the worker has warmed up (see warmup.py)
+                response = await self.client.get(f"{worker.url}/readyz", timeout=1.0)
+                # A stale process still bound to the port would answer with another pid
+                if response.status_code == 200 and response.json().get("pid") == worker.process.pid:
+                    return
+            except (httpx.HTTPError, ValueError):
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError(f"{worker.name} did not start within {STARTUP_TIMEOUT_SECONDS}s")
+
+    async def start(self) -> None:
+        results = await asyncio.gather(
+            *(self._spawn(worker) for worker in self.workers.values()), return_exceptions=True
+        )
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            await asyncio.gather(*(self._terminate(worker) for worker in self.workers.values()))
+            raise failures[0]
+        logger.info("Started %d workers", len(self.workers))
+
+    async def _terminate(self, worker: Worker) -> None:
+        if worker.process is None or worker.process.returncode is not None:
+            return
+        worker.process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(worker.process.wait(), timeout=self.drain_timeout_seconds + 5)
+        except asyncio.TimeoutError:
+            worker.process.kill()
+            await worker.process.wait()
+
+    async def stop(self) -> None:
+        await asyncio.gather(*(self._terminate(worker) for worker in self.workers.values()))
+        await self.client.aclose()
+
+    # ===== Routing =====
+
+    def _rebuild_ring(self) -> None:
+        active = [name for name, worker in self.workers.items() if not worker.draining]
+        # Rebuilding without a drained worker only moves that worker's users
+        self._ring = ConsistentHashRing(active or list(self.workers))
+
+    def worker_for(self, user_id: str) -> Worker:
+        return self.workers[self._ring.shard_for(user_id)]
+
+    def any_worker(self) -> Worker:
+        active = [worker for worker in self.workers.values() if not worker.draining]
+        return min(active or self.workers.values(), key=lambda worker: worker.in_flight)
+
+    # ===== Drain and restart =====
+
+    async def _wait_idle(self, worker: Worker) -> None:
+        deadline = time.monotonic() + self.drain_timeout_seconds
+        while time.monotonic() < deadline:
+            try:
+                load = (await self.client.get(f"{worker.url}/metrics/load", timeout=2.0)).json()
+            except httpx.HTTPError:
+                return
+            if worker.in_flight == 0 and load["in_flight_turns"] == 0:
+                return
+            await asyncio.sleep(0.2)
+        logger.warning("%s still busy after %ss, restarting anyway", worker.name, self.drain_timeout_seconds)
+
+    async def restart(self, name: str) -> None:
+        """Drain one worker, restart it and put it back on the ring."""
+        worker = self.workers[name]
+        worker.draining = True
+        self._rebuild_ring()
+        try:
+            await self.client.post(f"{worker.url}/admin/drain", headers={"X-Admin-Token": self.admin_token}, timeout=2.0)
+        except httpx.HTTPError:
+            pass
+        await self._wait_idle(worker)
+        await self._terminate(worker)
+        await self._spawn(worker)
+        worker.restarts += 1
+        self._rebuild_ring()
+
+    @property
+    def restarting(self) -> bool:
+        return self._restart_lock.locked()
+
+    async def rolling_restart(self) -> None:
+        async with self._restart_lock:
+            for name in list(self.workers):
+                logger.info("Restarting %s", name)
+                await self.restart(name)
+
+    # ===== Load =====
+
+    async def load(self) -> List[Dict[str, Any]]:
+        async def report(worker: Worker) -> Dict[str, Any]:
+            entry = {
+                "name": worker.name,
+                "port": worker.port,
+                "draining": worker.draining,
+                "router_in_flight": worker.in_flight,
+                "routed": worker.routed,
+                "errors": worker.errors,
+                "restarts": worker.restarts,
+            }
+            try:
+                entry["worker"] = (await self.client.get(f"{worker.url}/metrics/load", timeout=2.0)).json()
+            except httpx.HTTPError as e:
+                entry["worker"] = {"error": str(e)}
+            return entry
+
+        return await asyncio.gather(*(report(worker) for worker in self.workers.values()))
+
+
+# ===== Router app =====
+
+def _forward_headers(headers) -> Dict[str, str]:
+    return {key: value for key, value in headers.items() if key.lower() not in HOP_BY_HOP_HEADERS}
+
+
+def create_router_app(pool: WorkerPool) -> FastAPI:
+    """Front router: proxies every request to the worker owning its user."""
+    app = FastAPI()
+
+    @app.on_event("startup")
+    async def start_workers():
+        await pool.start()
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(pool.rolling_restart()))
+
+    @app.on_event("shutdown")
+    async def stop_workers():
+        await pool.stop()
+
+    @app.get("/router/workers")
+    async def get_workers():
+        return {"workers": await pool.load()}
+
+    @app.post("/router/restart")
+    async def restart_workers():
+        if pool.restarting:
+            raise HTTPException(status_code=409, detail="A rolling restart is already running")
+        asyncio.ensure_future(pool.rolling_restart())
+        return {"restarting": list(pool.workers)}
+
+    async def send(worker: Worker, request: Request, body: bytes) -> httpx.Response:
+        worker.routed += 1
+        worker.in_flight += 1
+        try:
+            return await pool.client.send(
+                pool.client.build_request(
+                    request.method,
+                    f"{worker.url}{request.url.path}",
+                    params=request.query_params,
+                    headers=_forward_headers(request.headers),
+                    content=body,
+                ),
+                stream=True,
+            )
+        except httpx.HTTPError as e:
+            worker.in_flight -= 1
+            worker.errors += 1
+            raise HTTPException(status_code=502, detail=f"{worker.name} unavailable: {e}")
+
+    async def proxy(user_id: Optional[str], request: Request, body: bytes) -> StreamingResponse:
+        worker = pool.worker_for(user_id) if user_id else pool.any_worker()
+        upstream = await send(worker, request, body)
+        if upstream.status_code == 503 and worker.draining:
+            # Routed just before the worker started draining: retry on the user's new worker
+            await upstream.aclose()
+            worker.in_flight -= 1
+            worker = pool.worker_for(user_id) if user_id else pool.any_worker()
+            upstream = await send(worker, request, body)
+
+        async def relay():
+            try:
+                async for chunk in upstream.aiter_raw():
+                    yield chunk
+            finally:
+                await upstream.aclose()
+                worker.in_flight -= 1
+
+        return StreamingResponse(relay(), status_code=upstream.status_code, headers=_forward_headers(upstream.headers))
+
+    async def split_batch(request: Request, body: bytes) -> StreamingResponse:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Batch body must be JSON")
+        if not isinstance(payload, dict) or not isinstance(payload.get("items", []), list):
+            raise HTTPException(status_code=400, detail="Batch body must be an object with an 'items' list")
+        if not all(isinstance(item, dict) for item in payload.get("items", [])):
+            raise HTTPException(status_code=400, detail="Batch items must be objects")
+        groups: Dict[str, List[int]] = {}
+        for index, item in enumerate(payload.get("items", [])):
+            groups.setdefault(pool.worker_for(str(item.get("user_id"))).name, []).append(index)
+
+        async def run_group(name: str, indexes: List[int], lines: asyncio.Queue):
+            worker = pool.workers[name]
+            worker.routed += 1
+            worker.in_flight += 1
+            sub_batch = dict(payload, items=[payload["items"][index] for index in indexes])
+            try:
+                async with pool.client.stream("POST", f"{worker.url}/batch", json=sub_batch) as upstream:
+                    if upstream.status_code != 200:
+                        detail = (await upstream.aread()).decode(errors="replace")
+                        raise RuntimeError(f"{name} answered {upstream.status_code}: {detail}")
+                    async for line in upstream.aiter_lines():
+                        if not line:
+                            continue
+                        result = json.loads(line)
+                        if "index" in result:
+                            # Map the sub-batch position back to the position in the original batch
+                            result["index"] = indexes[result["index"]]
+                        await lines.put(result)
+            except Exception as e:
+                worker.errors += 1
+                for index in indexes:
+                    await lines.put({"index": index, "status": "error", "error": str(e), "worker": name})
+            finally:
+                worker.in_flight -= 1
+                await lines.put(None)
+
+        async def merged():
+            lines: asyncio.Queue = asyncio.Queue()
+            tasks = [asyncio.create_task(run_group(name, indexes, lines)) for name, indexes in groups.items()]
+            running = len(tasks)
+            summary = {"items": len(payload.get("items", [])), "turns": 0, "failed_items": 0, "workers": len(tasks)}
+            try:
+                while running:
+                    line = await lines.get()
+                    if line is None:
+                        running -= 1
+                        continue
+                    if "summary" in line:
+                        summary["turns"] += line["summary"]["turns"]
+                        summary["failed_items"] += line["summary"]["failed_items"]
+                        continue
+                    if line.get("status") == "error" and "worker" in line:
+                        summary["failed_items"] += 1
+                    yield json.dumps(line) + "\n"
+                yield json.dumps({"summary": summary}) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(merged(), media_type="application/x-ndjson")
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
+    async def route(request: Request):
+        if request.url.path.startswith("/admin/"):
+            # Worker admin endpoints are only reachable through the router's own API
+            raise HTTPException(status_code=404, detail="Not Found")
+        body = await request.body()
+        if request.url.path == "/batch" and request.method == "POST":
+            return await split_batch(request, body)
+        match = USER_PATH.match(request.url.path)
+        return await proxy(match["user_id"] if match else None, request, body)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--base-worker-port", type=int, default=DEFAULT_BASE_WORKER_PORT)
+    parser.add_argument("--drain-timeout", type=float, default=DEFAULT_DRAIN_TIMEOUT_SECONDS)
+    parser.add_argument("--app", default="api_server:app", help="worker ASGI app")
+    parser.add_argument("--app-dir", default=None, help="directory to import the worker app from")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    pool = WorkerPool(
+        args.workers,
+        app=args.app,
+        base_port=args.base_worker_port,
+        drain_timeout_seconds=args.drain_timeout,
+        app_dir=args.app_dir,
+    )
+    uvicorn.run(create_router_app(pool), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+from .factory import create_session_service
+from .key_value import KeyValueSessionService
+from .local_kv import LocalKeyValueStore
+from .sharded import ConsistentHashRing, ShardedSessionService, shard_urls
+from .sqlite_production import ProductionSQLiteSessionService
+from .turn_queue import SessionTurnQueue, TurnQueueFull, TurnQueueTimeout
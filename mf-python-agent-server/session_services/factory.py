@@ -0,0 +1,76 @@
+"""
+Session service factory shared by the CLI/Gradio entry point and the API server.
+"""
+
+import os
+
+from google.adk.sessions import DatabaseSessionService
+from google.adk.sessions.base_session_service import BaseSessionService
+
+from .key_value import KeyValueSessionService
+from .local_kv import LocalKeyValueStore
+from .sharded import ShardedSessionService, shard_urls
+from .sqlite_production import ProductionSQLiteSessionService
+
+# --- Backends ---
+BACKEND_DATABASE = "database"
+BACKEND_SQLITE_PRODUCTION = "sqlite_production"
+BACKEND_SHARDED = "sharded"
+BACKEND_REDIS = "redis"
+BACKEND_LOCAL_KV = "local_kv"
+
+
+def _is_sqlite_file(db_url: str) -> bool:
+    return db_url.startswith("sqlite:///") and ":memory:" not in db_url
+
+
+def _create_production_sqlite(db_url: str) -> ProductionSQLiteSessionService:
+    return ProductionSQLiteSessionService(
+        db_url=db_url,
+        pool_size=int(os.getenv("SESSION_DB_POOL_SIZE", "8")),
+        max_overflow=int(os.getenv("SESSION_DB_MAX_OVERFLOW", "8")),
+        busy_timeout_ms=int(os.getenv("SESSION_DB_BUSY_TIMEOUT_MS", "5000")),
+        max_batch_size=int(os.getenv("SESSION_DB_MAX_BATCH_SIZE", "32")),
+    )
+
+
+def _create_key_value(client) -> KeyValueSessionService:
+    return KeyValueSessionService(
+        client,
+        key_prefix=os.getenv("SESSION_KV_PREFIX", "mfa"),
+        session_ttl_seconds=int(os.getenv("SESSION_KV_TTL_SECONDS", str(7 * 24 * 60 * 60))),
+        max_events=int(os.getenv("SESSION_KV_MAX_EVENTS", "500")),
+    )
+
+
+def create_session_service(db_url: str) -> BaseSessionService:
+    """Create the session service selected by the SESSION_BACKEND env variable.
+
+    SQLite files default to the tuned production mode; every other URL uses
+    the plain ADK DatabaseSessionService.
+    """
+    default_backend = BACKEND_SQLITE_PRODUCTION if _is_sqlite_file(db_url) else BACKEND_DATABASE
+    backend = os.getenv("SESSION_BACKEND", default_backend).lower()
+
+    if backend == BACKEND_SQLITE_PRODUCTION:
+        return _create_production_sqlite(db_url)
+    if backend == BACKEND_DATABASE:
+        return DatabaseSessionService(db_url=db_url)
+    if backend == BACKEND_SHARDED:
+        # Each shard is its own SQLite file (or database), see session_services.rebalance
+        urls = [url.strip() for url in os.getenv("SESSION_SHARD_URLS", "").split(",") if url.strip()]
+        if not urls:
+            urls = shard_urls(db_url, int(os.getenv("SESSION_SHARDS", "4")))
+        shard_factory = _create_production_sqlite if _is_sqlite_file(urls[0]) else DatabaseSessionService
+        return ShardedSessionService.from_urls(urls, shard_factory)
+    if backend == BACKEND_REDIS:
+        try:
+            import redis
+        except ImportError as e:
+            raise ValueError("SESSION_BACKEND=redis requires the 'redis' package (pip install redis)") from e
+        client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True)
+        return _create_key_value(client)
+    if backend == BACKEND_LOCAL_KV:
+        # In-process stand-in for Redis: fast, but not shared between processes
+        return _create_key_value(LocalKeyValueStore())
+    raise ValueError(f"Unknown SESSION_BACKEND '{backend}'")
@@ -0,0 +1,243 @@
+"""
+Key-Value Session Service
+
+Session storage on a Redis-protocol key-value store, shared by every
+api_server worker. Each session is a hash of JSON-encoded state keys plus a
+capped list of events; every read or write of a turn is one pipelined round
+trip and all keys, user and app state included, expire after an idle TTL.
+
+Works with redis.Redis(decode_responses=True) or the in-process
+LocalKeyValueStore stand-in.
+"""
+
+import json
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from google.adk.events.event import Event
+from google.adk.sessions import Session
+from google.adk.sessions.base_session_service import (
+    BaseSessionService,
+    GetSessionConfig,
+    ListEventsResponse,
+    ListSessionsResponse,
+)
+from google.adk.sessions.state import State
+
+# --- Constants ---
+DEFAULT_KEY_PREFIX = "mfa"
+DEFAULT_SESSION_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_EVENTS = 500
+
+
+def _encode_state(state: Dict[str, Any]) -> Dict[str, str]:
+    return {key: json.dumps(value) for key, value in state.items()}
+
+
+def _decode_state(fields: Dict[str, str]) -> Dict[str, Any]:
+    return {key: json.loads(value) for key, value in fields.items()}
+
+
+def _split_state(state: Optional[Dict[str, Any]]):
+    """Split a state (delta) into app, user and session scoped parts."""
+    app_state, user_state, session_state = {}, {}, {}
+    for key, value in (state or {}).items():
+        if key.startswith(State.APP_PREFIX):
+            app_state[key.removeprefix(State.APP_PREFIX)] = value
+        elif key.startswith(State.USER_PREFIX):
+            user_state[key.removeprefix(State.USER_PREFIX)] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            session_state[key] = value
+    return app_state, user_state, session_state
+
+
+class KeyValueSessionService(BaseSessionService):
+    """Session service backed by Redis (or LocalKeyValueStore).
+
+    Key layout (all under key_prefix):
+        session:{app}:{user}:{id}         hash  session state, JSON values
+        session:{app}:{user}:{id}:meta    hash  create/update timestamps
+        session:{app}:{user}:{id}:events  list  JSON events, capped at max_events
+        sessions:{app}:{user}             set   session ids of the user
+        app_state:{app} / user_state:{app}:{user}  hashes for "app:"/"user:" state
+    """
+
+    def __init__(
+        self,
+        client,
+        key_prefix: str = DEFAULT_KEY_PREFIX,
+        session_ttl_seconds: int = DEFAULT_SESSION_TTL_SECONDS,
+        max_events: int = DEFAULT_MAX_EVENTS,
+    ):
+        self.client = client
+        self.key_prefix = key_prefix
+        self.session_ttl_seconds = session_ttl_seconds
+        self.max_events = max_events
+
+    # ===== Keys =====
+
+    def _session_key(self, app_name: str, user_id: str, session_id: str) -> str:
+        return f"{self.key_prefix}:session:{app_name}:{user_id}:{session_id}"
+
+    def _index_key(self, app_name: str, user_id: str) -> str:
+        return f"{self.key_prefix}:sessions:{app_name}:{user_id}"
+
+    def _app_state_key(self, app_name: str) -> str:
+        return f"{self.key_prefix}:app_state:{app_name}"
+
+    def _user_state_key(self, app_name: str, user_id: str) -> str:
+        return f"{self.key_prefix}:user_state:{app_name}:{user_id}"
+
+    def _touch(self, pipe, app_name: str, user_id: str, session_key: str) -> None:
+        # User and app state live as long as the user's (or any user's) latest session
+        for key in (
+            session_key,
+            f"{session_key}:meta",
+            f"{session_key}:events",
+            self._index_key(app_name, user_id),
+            self._user_state_key(app_name, user_id),
+            self._app_state_key(app_name),
+        ):
+            pipe.expire(key, self.session_ttl_seconds)
+
+    @staticmethod
+    def _merge_state(app_state: Dict[str, Any], user_state: Dict[str, Any], session_state: Dict[str, Any]) -> Dict[str, Any]:
+        merged = dict(session_state)
+        merged.update({State.APP_PREFIX + key: value for key, value in app_state.items()})
+        merged.update({State.USER_PREFIX + key: value for key, value in user_state.items()})
+        return merged
+
+    # ===== Session API =====
+
+    def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id or str(uuid.uuid4())
+        session_key = self._session_key(app_name, user_id, session_id)
+        app_delta, user_delta, session_state = _split_state(state)
+        now = time.time()
+
+        pipe = self.client.pipeline()
+        if session_state:
+            pipe.hset(session_key, mapping=_encode_state(session_state))
+        if app_delta:
+            pipe.hset(self._app_state_key(app_name), mapping=_encode_state(app_delta))
+        if user_delta:
+            pipe.hset(self._user_state_key(app_name, user_id), mapping=_encode_state(user_delta))
+        pipe.hset(f"{session_key}:meta", mapping={"create_time": now, "update_time": now})
+        pipe.sadd(self._index_key(app_name, user_id), session_id)
+        self._touch(pipe, app_name, user_id, session_key)
+        pipe.hgetall(self._app_state_key(app_name))
+        pipe.hgetall(self._user_state_key(app_name, user_id))
+        results = pipe.execute()
+
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=self._merge_state(_decode_state(results[-2]), _decode_state(results[-1]), session_state),
+            last_update_time=now,
+        )
+
+    def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        session_key = self._session_key(app_name, user_id, session_id)
+        first_event = -config.num_recent_events if config and config.num_recent_events else 0
+
+        pipe = self.client.pipeline()
+        pipe.hgetall(f"{session_key}:meta")
+        pipe.hgetall(session_key)
+        pipe.lrange(f"{session_key}:events", first_event, -1)
+        pipe.hgetall(self._app_state_key(app_name))
+        pipe.hgetall(self._user_state_key(app_name, user_id))
+        meta, session_fields, raw_events, app_fields, user_fields = pipe.execute()
+        if not meta:
+            return None
+
+        events = [Event.model_validate_json(raw) for raw in raw_events]
+        if config and config.after_timestamp:
+            events = [event for event in events if event.timestamp < config.after_timestamp]
+
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=self._merge_state(_decode_state(app_fields), _decode_state(user_fields), _decode_state(session_fields)),
+            last_update_time=float(meta["update_time"]),
+        )
+        session.events = events
+        return session
+
+    def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        index_key = self._index_key(app_name, user_id)
+        session_ids = sorted(self.client.smembers(index_key))
+        if not session_ids:
+            return ListSessionsResponse()
+
+        pipe = self.client.pipeline()
+        for session_id in session_ids:
+            pipe.hget(f"{self._session_key(app_name, user_id, session_id)}:meta", "update_time")
+        update_times = pipe.execute()
+
+        sessions, expired = [], []
+        for session_id, update_time in zip(session_ids, update_times):
+            if update_time is None:
+                expired.append(session_id)
+                continue
+            sessions.append(
+                Session(app_name=app_name, user_id=user_id, id=session_id, state={}, last_update_time=float(update_time))
+            )
+        if expired:
+            # Sessions expired by TTL leave their id behind in the index
+            self.client.srem(index_key, *expired)
+        return ListSessionsResponse(sessions=sessions)
+
+    def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        session_key = self._session_key(app_name, user_id, session_id)
+        pipe = self.client.pipeline()
+        pipe.delete(session_key, f"{session_key}:meta", f"{session_key}:events")
+        pipe.srem(self._index_key(app_name, user_id), session_id)
+        pipe.execute()
+
+    def list_events(self, *, app_name: str, user_id: str, session_id: str) -> ListEventsResponse:
+        session_key = self._session_key(app_name, user_id, session_id)
+        raw_events = self.client.lrange(f"{session_key}:events", 0, -1)
+        return ListEventsResponse(events=[Event.model_validate_json(raw) for raw in raw_events])
+
+    def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+
+        session_key = self._session_key(session.app_name, session.user_id, session.id)
+        now = time.time()
+
+        pipe = self.client.pipeline()
+        if event.actions and event.actions.state_delta:
+            app_delta, user_delta, session_delta = _split_state(event.actions.state_delta)
+            if session_delta:
+                pipe.hset(session_key, mapping=_encode_state(session_delta))
+            if app_delta:
+                pipe.hset(self._app_state_key(session.app_name), mapping=_encode_state(app_delta))
+            if user_delta:
+                pipe.hset(self._user_state_key(session.app_name, session.user_id), mapping=_encode_state(user_delta))
+        pipe.rpush(f"{session_key}:events", event.model_dump_json(exclude_none=True))
+        pipe.ltrim(f"{session_key}:events", -self.max_events, -1)
+        pipe.hset(f"{session_key}:meta", "update_time", now)
+        self._touch(pipe, session.app_name, session.user_id, session_key)
+        pipe.execute()
+
+        session.last_update_time = now
+        super().append_event(session=session, event=event)
+        return event
@@ -0,0 +1,191 @@
+"""
+Local Key-Value Store
+
+An in-process stand-in for the subset of the Redis API used by
+KeyValueSessionService (hashes, lists, sets, TTLs and pipelines). It lets the
+key-value session backend run entirely locally, for development, single-process
+deployments and benchmarks, without a Redis server.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class LocalKeyValueStore:
+    """Thread-safe in-memory store mimicking redis.Redis(decode_responses=True)."""
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._expires_at: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def _live(self, name: str) -> Optional[Any]:
+        deadline = self._expires_at.get(name)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(name, None)
+            self._expires_at.pop(name, None)
+        return self._data.get(name)
+
+    def _container(self, name: str, factory: Callable[[], Any]) -> Any:
+        value = self._live(name)
+        if value is None:
+            value = self._data[name] = factory()
+        return value
+
+    # ===== Keys =====
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            removed = 0
+            for name in names:
+                if self._live(name) is not None:
+                    removed += 1
+                self._data.pop(name, None)
+                self._expires_at.pop(name, None)
+            return removed
+
+    def exists(self, *names: str) -> int:
+        with self._lock:
+            return sum(1 for name in names if self._live(name) is not None)
+
+    def expire(self, name: str, seconds: int) -> bool:
+        with self._lock:
+            if self._live(name) is None:
+                return False
+            self._expires_at[name] = time.monotonic() + seconds
+            return True
+
+    def ttl(self, name: str) -> int:
+        with self._lock:
+            if self._live(name) is None:
+                return -2
+            deadline = self._expires_at.get(name)
+            return -1 if deadline is None else int(deadline - time.monotonic())
+
+    def flushall(self) -> bool:
+        with self._lock:
+            self._data.clear()
+            self._expires_at.clear()
+            return True
+
+    # ===== Strings =====
+
+    def set(self, name: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        with self._lock:
+            if nx and self._live(name) is not None:
+                return None
+            self._data[name] = str(value)
+            self._expires_at.pop(name, None)
+            if ex is not None:
+                self._expires_at[name] = time.monotonic() + ex
+            return True
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            return self._live(name)
+
+    # ===== Hashes =====
+
+    def hset(self, name: str, key: Optional[str] = None, value: Any = None, mapping: Optional[Dict[str, Any]] = None) -> int:
+        with self._lock:
+            fields = dict(mapping or {})
+            if key is not None:
+                fields[key] = value
+            hash_value = self._container(name, dict)
+            added = sum(1 for field in fields if field not in hash_value)
+            hash_value.update({field: str(item) for field, item in fields.items()})
+            return added
+
+    def hget(self, name: str, key: str) -> Optional[str]:
+        with self._lock:
+            return (self._live(name) or {}).get(key)
+
+    def hgetall(self, name: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._live(name) or {})
+
+    def hdel(self, name: str, *keys: str) -> int:
+        with self._lock:
+            hash_value = self._live(name) or {}
+            return sum(1 for key in keys if hash_value.pop(key, None) is not None)
+
+    # ===== Lists =====
+
+    def rpush(self, name: str, *values: Any) -> int:
+        with self._lock:
+            list_value = self._container(name, list)
+            list_value.extend(str(value) for value in values)
+            return len(list_value)
+
+    def lrange(self, name: str, start: int, end: int) -> List[str]:
+        with self._lock:
+            list_value = self._live(name) or []
+            stop = None if end == -1 else end + 1
+            return list(list_value[start:stop])
+
+    def ltrim(self, name: str, start: int, end: int) -> bool:
+        with self._lock:
+            list_value = self._live(name)
+            if list_value is not None:
+                stop = None if end == -1 else end + 1
+                list_value[:] = list_value[start:stop]
+            return True
+
+    def llen(self, name: str) -> int:
+        with self._lock:
+            return len(self._live(name) or [])
+
+    # ===== Sets =====
+
+    def sadd(self, name: str, *values: Any) -> int:
+        with self._lock:
+            set_value = self._container(name, set)
+            added = sum(1 for value in values if str(value) not in set_value)
+            set_value.update(str(value) for value in values)
+            return added
+
+    def srem(self, name: str, *values: Any) -> int:
+        with self._lock:
+            set_value = self._live(name) or set()
+            removed = sum(1 for value in values if str(value) in set_value)
+            set_value.difference_update(str(value) for value in values)
+            return removed
+
+    def smembers(self, name: str) -> set:
+        with self._lock:
+            return set(self._live(name) or set())
+
+    # ===== Pipelines =====
+
+    def pipeline(self, transaction: bool = True) -> "LocalPipeline":
+        return LocalPipeline(self)
+
+
+class LocalPipeline:
+    """Queues commands and runs them atomically on execute(), like a Redis MULTI pipeline."""
+
+    def __init__(self, store: LocalKeyValueStore):
+        self._store = store
+        self._commands: List[Callable[[], Any]] = []
+
+    def __getattr__(self, command: str) -> Callable[..., "LocalPipeline"]:
+        method = getattr(self._store, command)
+
+        def queue(*args, **kwargs) -> "LocalPipeline":
+            self._commands.append(lambda: method(*args, **kwargs))
+            return self
+
+        return queue
+
+    def execute(self) -> List[Any]:
+        with self._store._lock:
+            results = [command() for command in self._commands]
+        self._commands = []
+        return results
+
+    def __enter__(self) -> "LocalPipeline":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._commands = []
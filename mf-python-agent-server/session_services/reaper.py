@@ -0,0 +1,357 @@
+"""
+Background session expiry and garbage collection.
+
+The SessionReaper periodically removes sessions that have been idle longer
+than the TTL of their stage (completed investments expire quickly, abandoned
+onboardings after a day, ...). The stage is read from what the session holds:
+the agents never update flow_stage themselves. Sessions are deleted, or archived
+into a session_archive table first, in small batches with short transactions
+so the reaper never holds the SQLite write lock for long.
+
+Usage (one-off run, e.g. from cron):
+    python -m session_services.reaper --db-url sqlite:///./mutual_fund_advisor.db --once
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from google.adk.sessions.base_session_service import BaseSessionService
+from google.adk.sessions.database_session_service import Base
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Engine,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    and_,
+    create_engine,
+    delete,
+    func,
+    insert,
+    select,
+    tuple_,
+)
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+COMPLETED_STAGE = "completed"
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+INITIAL_STAGE = "initial"
+
+# Idle time (seconds) after which a session in a given stage is reclaimed (see _stage_of).
+# Stages without an entry, such as "profile", get DEFAULT_TTL.
+DEFAULT_STAGE_TTLS: Dict[str, int] = {
+    COMPLETED_STAGE: 15 * 60,
+    "investment_complete": 15 * 60,
+    INITIAL_STAGE: DAY,
+    "funds_recommended": 7 * DAY,
+    "fund_selected": 7 * DAY,
+}
+DEFAULT_TTL = 3 * DAY
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_INTERVAL_SECONDS = 10 * 60
+
+SESSIONS = Base.metadata.tables["sessions"]
+EVENTS = Base.metadata.tables["events"]
+
+archive_metadata = MetaData()
+SESSION_ARCHIVE = Table(
+    "session_archive",
+    archive_metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("app_name", String, nullable=False),
+    Column("user_id", String, nullable=False),
+    Column("session_id", String, nullable=False),
+    Column("flow_stage", String),
+    Column("state", Text),
+    Column("events", Text),
+    Column("last_update_time", DateTime),
+    Column("archived_at", DateTime, default=func.now()),
+)
+
+
+@dataclass
+class ReaperMetrics:
+    """Counters exposed by the reaper (cumulative since start)."""
+    runs: int = 0
+    sessions_reclaimed: int = 0
+    events_reclaimed: int = 0
+    sessions_archived: int = 0
+    errors: int = 0
+    last_run_at: Optional[float] = None
+    last_run_seconds: Optional[float] = None
+    reclaimed_by_stage: Dict[str, int] = field(default_factory=dict)
+
+
+def parse_stage_ttls(value: str) -> Dict[str, int]:
+    """Parse "initial=86400,completed=900" into a stage -> seconds mapping."""
+    ttls = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        stage, _, seconds = item.partition("=")
+        ttls[stage.strip()] = int(seconds)
+    return ttls
+
+
+def engines_of(session_service: BaseSessionService) -> List[Engine]:
+    """Database engines behind a session service (one per shard when sharded)."""
+    if hasattr(session_service, "shards"):
+        return [engine for shard in session_service.shards.values() for engine in engines_of(shard)]
+    engine = getattr(session_service, "db_engine", None)
+    return [engine] if engine is not None else []
+
+
+def _stage_of(state: Dict[str, Any]) -> str:
+    """The furthest step of the flow the session reached, from the state it holds.
+
+    An explicit flow_stage other than "initial" wins; otherwise: completed (SIP
+    started), fund_selected (a fund picked or a SIP submitted), funds_recommended,
+    profile (profile, investor type or goal collected), initial.
+    """
+    if state.get("sip_started") is True:
+        return COMPLETED_STAGE
+    stage = state.get("flow_stage")
+    if stage and stage != INITIAL_STAGE:
+        return stage
+    if state.get("selected_fund") or state.get("sip_submission") or state.get("sip_portfolio"):
+        return "fund_selected"
+    if state.get("recommended_funds"):
+        return "funds_recommended"
+    if state.get("user_profile") or state.get("investor_type") or state.get("investment_goals"):
+        return "profile"
+    return INITIAL_STAGE
+
+
+def _keys(rows: List[Any]) -> List[tuple]:
+    return [(row.app_name, row.user_id, row.id) for row in rows]
+
+
+def _lower_thread_priority() -> None:
+    # On Linux, setpriority on a thread id only affects that thread
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+class SessionReaper:
+    """Deletes (or archives) sessions idle for longer than their stage TTL."""
+
+    def __init__(
+        self,
+        engines: List[Engine],
+        stage_ttls: Optional[Dict[str, int]] = None,
+        default_ttl: int = DEFAULT_TTL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        interval_seconds: float = DEFAULT_INTERVAL_SECONDS,
+        archive: bool = False,
+        batch_pause_seconds: float = 0.05,
+    ):
+        self.engines = engines
+        self.stage_ttls = dict(DEFAULT_STAGE_TTLS if stage_ttls is None else stage_ttls)
+        self.default_ttl = default_ttl
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.archive = archive
+        self.batch_pause_seconds = batch_pause_seconds
+        self.metrics = ReaperMetrics()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        if archive:
+            for engine in engines:
+                archive_metadata.create_all(engine)
+
+    @classmethod
+    def from_env(cls, session_service: BaseSessionService) -> "SessionReaper":
+        """Build a reaper for a session service from SESSION_REAPER_* env variables."""
+        stage_ttls = dict(DEFAULT_STAGE_TTLS)
+        stage_ttls.update(parse_stage_ttls(os.getenv("SESSION_REAPER_TTLS", "")))
+        return cls(
+            engines_of(session_service),
+            stage_ttls=stage_ttls,
+            default_ttl=int(os.getenv("SESSION_REAPER_DEFAULT_TTL", str(DEFAULT_TTL))),
+            batch_size=int(os.getenv("SESSION_REAPER_BATCH_SIZE", str(DEFAULT_BATCH_SIZE))),
+            interval_seconds=float(os.getenv("SESSION_REAPER_INTERVAL", str(DEFAULT_INTERVAL_SECONDS))),
+            archive=os.getenv("SESSION_REAPER_ARCHIVE", "false").lower() == "true",
+        )
+
+    def ttl_for(self, state: Dict[str, Any]) -> int:
+        return self.stage_ttls.get(_stage_of(state), self.default_ttl)
+
+    # ===== Background thread =====
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_forever, name="session-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run_forever(self) -> None:
+        _lower_thread_priority()
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval_seconds)
+
+    # ===== Reaping =====
+
+    def run_once(self) -> int:
+        """Reap every engine once. Returns the number of sessions reclaimed."""
+        started = time.perf_counter()
+        reclaimed = 0
+        for engine in self.engines:
+            try:
+                reclaimed += self._reap_engine(engine)
+            except Exception as e:
+                self.metrics.errors += 1
+                logger.error(f"Session reaper failed on {engine.url}: {e}")
+        self.metrics.runs += 1
+        self.metrics.last_run_at = time.time()
+        self.metrics.last_run_seconds = time.perf_counter() - started
+        if reclaimed:
+            logger.info(f"Session reaper reclaimed {reclaimed} sessions")
+        return reclaimed
+
+    def _reap_engine(self, engine: Engine) -> int:
+        with engine.connect() as connection:
+            db_now = connection.execute(select(func.now())).scalar()
+        # Nothing younger than the shortest TTL can expire
+        oldest_allowed = db_now - timedelta(seconds=min([self.default_ttl, *self.stage_ttls.values()]))
+
+        reclaimed = 0
+        last_seen = None
+        while not self._stop.is_set():
+            query = (
+                select(SESSIONS.c.app_name, SESSIONS.c.user_id, SESSIONS.c.id, SESSIONS.c.state, SESSIONS.c.update_time)
+                .where(SESSIONS.c.update_time < oldest_allowed)
+                .order_by(SESSIONS.c.update_time, SESSIONS.c.id)
+                .limit(self.batch_size)
+            )
+            if last_seen is not None:
+                query = query.where(tuple_(SESSIONS.c.update_time, SESSIONS.c.id) > last_seen)
+            with engine.connect() as connection:
+                rows = connection.execute(query).all()
+            if not rows:
+                break
+            last_seen = (rows[-1].update_time, rows[-1].id)
+
+            expired = [row for row in rows if row.update_time < db_now - timedelta(seconds=self.ttl_for(row.state or {}))]
+            if expired:
+                reclaimed += self._reclaim(engine, expired, db_now)
+            if len(rows) < self.batch_size:
+                break
+            # Yield the write lock to foreground turns between batches
+            time.sleep(self.batch_pause_seconds)
+        return reclaimed
+
+    def _reclaim(self, engine: Engine, rows: List[Any], db_now: datetime) -> int:
+        key_columns = tuple_(SESSIONS.c.app_name, SESSIONS.c.user_id, SESSIONS.c.id)
+        ttl_by_key = {(row.app_name, row.user_id, row.id): self.ttl_for(row.state or {}) for row in rows}
+
+        # Take the write lock up front (honoured by ProductionSQLiteSessionService engines)
+        with engine.execution_options(sqlite_begin="IMMEDIATE").begin() as connection:
+            # Re-check the idle time so a session touched since the scan survives
+            current = connection.execute(
+                select(SESSIONS.c.app_name, SESSIONS.c.user_id, SESSIONS.c.id, SESSIONS.c.update_time).where(
+                    key_columns.in_(_keys(rows))
+                )
+            ).all()
+            still_idle = {
+                (row.app_name, row.user_id, row.id)
+                for row in current
+                if row.update_time < db_now - timedelta(seconds=ttl_by_key[(row.app_name, row.user_id, row.id)])
+            }
+            expired = [row for row in rows if (row.app_name, row.user_id, row.id) in still_idle]
+            if not expired:
+                return 0
+
+            if self.archive:
+                connection.execute(insert(SESSION_ARCHIVE), self._archive_rows(connection, expired))
+            # Events first: SQLite only cascades when foreign keys are enabled
+            events_deleted = connection.execute(
+                delete(EVENTS).where(tuple_(EVENTS.c.app_name, EVENTS.c.user_id, EVENTS.c.session_id).in_(_keys(expired)))
+            ).rowcount
+            connection.execute(delete(SESSIONS).where(key_columns.in_(_keys(expired))))
+
+        for row in expired:
+            stage = _stage_of(row.state or {})
+            self.metrics.reclaimed_by_stage[stage] = self.metrics.reclaimed_by_stage.get(stage, 0) + 1
+        self.metrics.sessions_reclaimed += len(expired)
+        self.metrics.events_reclaimed += events_deleted
+        if self.archive:
+            self.metrics.sessions_archived += len(expired)
+        return len(expired)
+
+    def _archive_rows(self, connection, rows: List[Any]) -> List[Dict[str, Any]]:
+        archived = []
+        for row in rows:
+            events = connection.execute(
+                select(EVENTS.c.author, EVENTS.c.content, EVENTS.c.timestamp)
+                .where(and_(EVENTS.c.app_name == row.app_name, EVENTS.c.user_id == row.user_id, EVENTS.c.session_id == row.id))
+                .order_by(EVENTS.c.timestamp)
+            ).all()
+            archived.append({
+                "app_name": row.app_name,
+                "user_id": row.user_id,
+                "session_id": row.id,
+                "flow_stage": _stage_of(row.state or {}),
+                "state": json.dumps(row.state or {}),
+                "events": json.dumps([
+                    {"author": e.author, "content": e.content, "timestamp": e.timestamp.timestamp()}
+                    for e in events
+                ]),
+                "last_update_time": row.update_time,
+            })
+        return archived
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        snapshot = asdict(self.metrics)
+        snapshot["running"] = self._thread is not None and self._thread.is_alive()
+        return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete or archive idle agent sessions.")
+    parser.add_argument("--db-url", required=True)
+    parser.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    parser.add_argument("--archive", action="store_true", help="Copy sessions to session_archive before deleting")
+    parser.add_argument("--ttls", default="", help='Per-stage TTLs in seconds, e.g. "initial=86400,completed=900"')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stage_ttls = dict(DEFAULT_STAGE_TTLS)
+    stage_ttls.update(parse_stage_ttls(args.ttls))
+    reaper = SessionReaper([create_engine(args.db_url)], stage_ttls=stage_ttls, archive=args.archive)
+
+    if args.once:
+        reaper.run_once()
+        print(json.dumps(reaper.metrics_snapshot(), indent=2))
+        return
+    try:
+        reaper._run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Offline shard rebalancing for ShardedSessionService.
+
+Moves every user whose owning shard changed (after the shard count changed)
+from its current database to the new owner: user state, sessions and events
+are copied in one transaction on the target and then deleted from the source.
+Run it while the agent servers are stopped.
+
+Usage:
+    python -m session_services.rebalance --db-url sqlite:///./mutual_fund_advisor.db --shards 6
+"""
+
+import argparse
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+from google.adk.sessions.database_session_service import Base
+from sqlalchemy import Engine, and_, create_engine, delete, insert, inspect, select
+
+from .sharded import DEFAULT_VIRTUAL_NODES, ConsistentHashRing, routing_key, shard_urls
+
+logger = logging.getLogger(__name__)
+
+SESSIONS = Base.metadata.tables["sessions"]
+EVENTS = Base.metadata.tables["events"]
+USER_STATES = Base.metadata.tables["user_states"]
+APP_STATES = Base.metadata.tables["app_states"]
+
+
+@dataclass
+class RebalanceReport:
+    """Summary of a rebalance run."""
+    users_scanned: int = 0
+    users_moved: int = 0
+    sessions_moved: int = 0
+    events_moved: int = 0
+    moves: Dict[Tuple[str, str], int] = field(default_factory=dict)
+
+
+def _users_in(engine: Engine) -> List[Tuple[str, str]]:
+    with engine.connect() as connection:
+        session_users = connection.execute(select(SESSIONS.c.app_name, SESSIONS.c.user_id).distinct())
+        state_users = connection.execute(select(USER_STATES.c.app_name, USER_STATES.c.user_id))
+        return sorted({tuple(row) for row in session_users} | {tuple(row) for row in state_users})
+
+
+def _move_user(source: Engine, target: Engine, app_name: str, user_id: str) -> Tuple[int, int]:
+    owned_by = lambda table: and_(table.c.app_name == app_name, table.c.user_id == user_id)
+
+    with source.connect() as connection:
+        user_states = [dict(row._mapping) for row in connection.execute(select(USER_STATES).where(owned_by(USER_STATES)))]
+        sessions = [dict(row._mapping) for row in connection.execute(select(SESSIONS).where(owned_by(SESSIONS)))]
+        events = [dict(row._mapping) for row in connection.execute(select(EVENTS).where(owned_by(EVENTS)))]
+        app_states = [dict(row._mapping) for row in connection.execute(select(APP_STATES).where(APP_STATES.c.app_name == app_name))]
+
+    with target.begin() as connection:
+        if app_states and connection.execute(select(APP_STATES.c.app_name).where(APP_STATES.c.app_name == app_name)).first() is None:
+            connection.execute(insert(APP_STATES), app_states)
+        # Re-running after an interrupted move must not duplicate rows
+        connection.execute(delete(EVENTS).where(owned_by(EVENTS)))
+        connection.execute(delete(SESSIONS).where(owned_by(SESSIONS)))
+        connection.execute(delete(USER_STATES).where(owned_by(USER_STATES)))
+        if user_states:
+            connection.execute(insert(USER_STATES), user_states)
+        if sessions:
+            connection.execute(insert(SESSIONS), sessions)
+        if events:
+            connection.execute(insert(EVENTS), events)
+
+    with source.begin() as connection:
+        connection.execute(delete(EVENTS).where(owned_by(EVENTS)))
+        connection.execute(delete(SESSIONS).where(owned_by(SESSIONS)))
+        connection.execute(delete(USER_STATES).where(owned_by(USER_STATES)))
+
+    return len(sessions), len(events)
+
+
+def rebalance(
+    db_urls: Sequence[str],
+    shard_count: int,
+    virtual_nodes: int = DEFAULT_VIRTUAL_NODES,
+    dry_run: bool = False,
+) -> RebalanceReport:
+    """Move every user to the shard that owns it once there are shard_count shards.
+
+    db_urls lists every shard database that may hold data, including shards
+    beyond shard_count that are being drained. Shard names follow
+    ShardedSessionService.from_urls ("shard-<index>"), so existing shards keep
+    their ring positions and only ~1/N of the users move.
+    """
+    names = [f"shard-{index}" for index in range(len(db_urls))]
+    engines = {name: create_engine(url) for name, url in zip(names, db_urls)}
+    ring = ConsistentHashRing(names[:shard_count], virtual_nodes=virtual_nodes)
+
+    # Snapshot placement first so users moved into a later shard are not rescanned
+    placement = [
+        (source_name, app_name, user_id)
+        for source_name, source in engines.items()
+        if inspect(source).has_table("sessions")
+        for app_name, user_id in _users_in(source)
+    ]
+
+    report = RebalanceReport(users_scanned=len(placement))
+    for source_name, app_name, user_id in placement:
+        target_name = ring.shard_for(routing_key(app_name, user_id))
+        if target_name == source_name:
+            continue
+        report.users_moved += 1
+        report.moves[(source_name, target_name)] = report.moves.get((source_name, target_name), 0) + 1
+        if dry_run:
+            continue
+        Base.metadata.create_all(engines[target_name])
+        sessions_moved, events_moved = _move_user(engines[source_name], engines[target_name], app_name, user_id)
+        report.sessions_moved += sessions_moved
+        report.events_moved += events_moved
+        logger.info(f"Moved {app_name}/{user_id} from {source_name} to {target_name}")
+
+    for engine in engines.values():
+        engine.dispose()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebalance sharded session databases after the shard count changes.")
+    parser.add_argument("--db-url", required=True, help="Base database URL the shard URLs are derived from")
+    parser.add_argument("--shards", type=int, required=True, help="New number of shards")
+    parser.add_argument("--previous-shards", type=int, default=0, help="Old number of shards, if it was larger (those get drained)")
+    parser.add_argument("--virtual-nodes", type=int, default=DEFAULT_VIRTUAL_NODES)
+    parser.add_argument("--dry-run", action="store_true", help="Only report which users would move")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    report = rebalance(
+        shard_urls(args.db_url, max(args.shards, args.previous_shards)),
+        shard_count=args.shards,
+        virtual_nodes=args.virtual_nodes,
+        dry_run=args.dry_run,
+    )
+
+    print(f"Users scanned: {report.users_scanned}, moved: {report.users_moved}")
+    print(f"Sessions moved: {report.sessions_moved}, events moved: {report.events_moved}")
+    for (source_name, target_name), count in sorted(report.moves.items()):
+        print(f"  {source_name} -> {target_name}: {count} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Sharded Session Service
+
+Routes every app_name/user_id pair to one of N session services (usually one
+SQLite file each) through a consistent-hash ring, so write throughput grows
+with the number of shards instead of being capped by a single SQLite writer.
+"""
+
+import bisect
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from google.adk.events.event import Event
+from google.adk.sessions import Session
+from google.adk.sessions.base_session_service import (
+    BaseSessionService,
+    GetSessionConfig,
+    ListEventsResponse,
+    ListSessionsResponse,
+)
+
+# --- Constants ---
+DEFAULT_VIRTUAL_NODES = 64
+
+
+def _hash(key: str) -> int:
+    # Stable across processes, unlike the built-in hash()
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def routing_key(app_name: str, user_id: str) -> str:
+    return f"{app_name}/{user_id}"
+
+
+def shard_urls(db_url: str, shard_count: int) -> List[str]:
+    """Derive one database URL per shard, e.g. app.db -> app.shard0.db, app.shard1.db."""
+    base, dot, extension = db_url.rpartition(".")
+    if not dot or "/" in extension:
+        base, extension = db_url, "db"
+    return [f"{base}.shard{index}.{extension}" for index in range(shard_count)]
+
+
+class ConsistentHashRing:
+    """Consistent-hash ring mapping routing keys to shard names.
+
+    Shard names (not positions) are hashed onto the ring, so adding a shard only
+    moves roughly 1/N of the keys to the new shard.
+    """
+
+    def __init__(self, shard_names: Sequence[str], virtual_nodes: int = DEFAULT_VIRTUAL_NODES):
+        if not shard_names:
+            raise ValueError("ConsistentHashRing needs at least one shard")
+        points = sorted(
+            (_hash(f"{name}#{replica}"), name)
+            for name in shard_names
+            for replica in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def shard_for(self, key: str) -> str:
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._names[index]
+
+
+class ShardedSessionService(BaseSessionService):
+    """Session service that delegates to the shard owning app_name/user_id.
+
+    All sessions of a user live on the same shard, so list_sessions only
+    touches one database. App-scoped ("app:") state is kept per shard.
+    """
+
+    def __init__(self, shards: Dict[str, BaseSessionService], virtual_nodes: int = DEFAULT_VIRTUAL_NODES):
+        self.shards = dict(shards)
+        self.ring = ConsistentHashRing(list(self.shards), virtual_nodes=virtual_nodes)
+
+    @classmethod
+    def from_urls(
+        cls,
+        db_urls: Sequence[str],
+        service_factory: Callable[[str], BaseSessionService],
+        virtual_nodes: int = DEFAULT_VIRTUAL_NODES,
+    ) -> "ShardedSessionService":
+        """Build one shard per URL; shard names are "shard-<index>"."""
+        return cls(
+            {f"shard-{index}": service_factory(url) for index, url in enumerate(db_urls)},
+            virtual_nodes=virtual_nodes,
+        )
+
+    def shard_name_for(self, app_name: str, user_id: str) -> str:
+        return self.ring.shard_for(routing_key(app_name, user_id))
+
+    def shard_for(self, app_name: str, user_id: str) -> BaseSessionService:
+        return self.shards[self.shard_name_for(app_name, user_id)]
+
+    # ===== Session API =====
+
+    def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        return self.shard_for(app_name, user_id).create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+
+    def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        return self.shard_for(app_name, user_id).get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+
+    def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        return self.shard_for(app_name, user_id).list_sessions(app_name=app_name, user_id=user_id)
+
+    def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        self.shard_for(app_name, user_id).delete_session(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+
+    def list_events(self, *, app_name: str, user_id: str, session_id: str) -> ListEventsResponse:
+        return self.shard_for(app_name, user_id).list_events(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+
+    def close_session(self, *, session: Session):
+        self.shard_for(session.app_name, session.user_id).close_session(session=session)
+
+    def append_event(self, session: Session, event: Event) -> Event:
+        return self.shard_for(session.app_name, session.user_id).append_event(session=session, event=event)
+
+    # ===== Batched writes =====
+
+    def flush_events(self, *, app_name: str, user_id: str, session_id: str) -> int:
+        flush_events = getattr(self.shard_for(app_name, user_id), "flush_events", None)
+        if flush_events is None:
+            return 0
+        return flush_events(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    def flush_all(self) -> int:
+        return sum(
+            shard.flush_all() for shard in self.shards.values() if hasattr(shard, "flush_all")
+        )
@@ -0,0 +1,336 @@
+"""
+Production SQLite Session Service
+
+A DatabaseSessionService tuned for many concurrent writers on a single SQLite
+file: WAL journaling, a sized connection pool, busy-timeout handling with
+retries, composite indexes and batched event inserts per conversation turn.
+"""
+
+import base64
+import contextvars
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.adk.events.event import Event
+from google.adk.sessions import DatabaseSessionService, Session
+from google.adk.sessions.base_session_service import BaseSessionService
+from google.adk.sessions.database_session_service import (
+    Base,
+    StorageAppState,
+    StorageEvent,
+    StorageSession,
+    StorageUserState,
+    _extract_state_delta,
+)
+from sqlalchemy import MetaData, create_engine, event as sa_event, text
+from sqlalchemy.exc import ArgumentError, OperationalError
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+DEFAULT_POOL_SIZE = 8
+DEFAULT_MAX_OVERFLOW = 8
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_LOCK_RETRIES = 5
+
+# Composite indexes missing from the ADK schema. get_session filters events by
+# session_id and timestamp, list_sessions filters by app_name/user_id.
+SESSION_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_sessions_app_user_update_time "
+    "ON sessions (app_name, user_id, update_time)",
+    "CREATE INDEX IF NOT EXISTS ix_events_session_timestamp "
+    "ON events (session_id, timestamp)",
+)
+
+# Whether the current call only reads, so it can skip the write lock.
+_read_only = contextvars.ContextVar("sqlite_read_only", default=False)
+
+SessionKey = Tuple[str, str, str]
+
+
+def _is_lock_error(error: OperationalError) -> bool:
+    message = str(error).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+class _PendingBatch:
+    """Events of one session that have not been written to the database yet."""
+
+    __slots__ = ("session", "events")
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.events: List[Event] = []
+
+
+class ProductionSQLiteSessionService(DatabaseSessionService):
+    """DatabaseSessionService tuned for concurrent writers on a SQLite file.
+
+    Events appended during a turn are buffered in memory and written in a single
+    transaction by flush_events() (called at the end of every turn), or as soon
+    as max_batch_size events are pending. Reads of a session flush it first, so
+    callers always see their own writes.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_overflow: int = DEFAULT_MAX_OVERFLOW,
+        busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        lock_retries: int = DEFAULT_LOCK_RETRIES,
+    ):
+        if not db_url.startswith("sqlite"):
+            raise ValueError(f"ProductionSQLiteSessionService needs a SQLite URL, got '{db_url}'.")
+
+        try:
+            db_engine = create_engine(
+                db_url,
+                poolclass=QueuePool,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                connect_args={
+                    "timeout": busy_timeout_ms / 1000,
+                    "check_same_thread": False,
+                },
+            )
+        except ArgumentError as e:
+            raise ValueError(f"Invalid database URL format or argument '{db_url}'.") from e
+
+        self.busy_timeout_ms = busy_timeout_ms
+        self.max_batch_size = max_batch_size
+        self.lock_retries = lock_retries
+
+        sa_event.listen(db_engine, "connect", self._configure_connection)
+        sa_event.listen(db_engine, "begin", self._begin_transaction)
+
+        self.db_engine = db_engine
+        self.metadata = MetaData()
+        self.inspector = inspect(self.db_engine)
+
+        # Writers take the lock up front (BEGIN IMMEDIATE) so a transaction never
+        # has to upgrade a stale read snapshot, which SQLite rejects immediately.
+        self._writer_factory = sessionmaker(bind=db_engine.execution_options(sqlite_begin="IMMEDIATE"))
+        self._reader_factory = sessionmaker(bind=db_engine)
+
+        self._pending: Dict[SessionKey, _PendingBatch] = {}
+        self._pending_lock = threading.Lock()
+
+        # Several worker processes may set up the same fresh file at once
+        schema_engine = db_engine.execution_options(sqlite_begin="IMMEDIATE")
+        Base.metadata.create_all(schema_engine)
+        with schema_engine.begin() as connection:
+            for statement in SESSION_INDEXES:
+                connection.execute(text(statement))
+
+    @property
+    def DatabaseSessionFactory(self) -> sessionmaker:
+        """Session factory used by the inherited DatabaseSessionService methods."""
+        return self._reader_factory if _read_only.get() else self._writer_factory
+
+    # ===== Connection setup =====
+
+    def _configure_connection(self, dbapi_connection, connection_record) -> None:
+        # Let the "begin" hook emit BEGIN instead of the pysqlite driver.
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    @staticmethod
+    def _begin_transaction(connection) -> None:
+        mode = connection.get_execution_options().get("sqlite_begin", "DEFERRED")
+        connection.exec_driver_sql(f"BEGIN {mode}")
+
+    def _run_with_retry(self, operation: Callable[[], Any]) -> Any:
+        """Run a write operation, backing off while another writer holds the lock."""
+        delay = 0.01
+        for attempt in range(self.lock_retries + 1):
+            try:
+                return operation()
+            except OperationalError as e:
+                if not _is_lock_error(e) or attempt == self.lock_retries:
+                    raise
+                logger.warning(f"SQLite busy, retrying in {delay:.3f}s (attempt {attempt + 1})")
+                time.sleep(delay)
+                delay *= 2
+
+    # ===== Session API =====
+
+    def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        return self._run_with_retry(
+            lambda: super(ProductionSQLiteSessionService, self).create_session(
+                app_name=app_name, user_id=user_id, state=state, session_id=session_id
+            )
+        )
+
+    def get_session(self, *, app_name: str, user_id: str, session_id: str, config=None) -> Optional[Session]:
+        self.flush_events(app_name=app_name, user_id=user_id, session_id=session_id)
+        token = _read_only.set(True)
+        try:
+            return super().get_session(app_name=app_name, user_id=user_id, session_id=session_id, config=config)
+        finally:
+            _read_only.reset(token)
+
+    def list_sessions(self, *, app_name: str, user_id: str):
+        token = _read_only.set(True)
+        try:
+            return super().list_sessions(app_name=app_name, user_id=user_id)
+        finally:
+            _read_only.reset(token)
+
+    def delete_session(self, app_name: str, user_id: str, session_id: str) -> None:
+        with self._pending_lock:
+            self._pending.pop((app_name, user_id, session_id), None)
+        self._run_with_retry(
+            lambda: super(ProductionSQLiteSessionService, self).delete_session(
+                app_name=app_name, user_id=user_id, session_id=session_id
+            )
+        )
+
+    def close_session(self, *, session: Session):
+        self.flush_events(app_name=session.app_name, user_id=session.user_id, session_id=session.id)
+
+    def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+
+        key = (session.app_name, session.user_id, session.id)
+        with self._pending_lock:
+            batch = self._pending.setdefault(key, _PendingBatch(session))
+            batch.session = session
+            batch.events.append(event)
+            pending_count = len(batch.events)
+
+        # Update the in-memory session right away; storage catches up on flush.
+        BaseSessionService.append_event(self, session=session, event=event)
+
+        if pending_count >= self.max_batch_size:
+            self.flush_events(app_name=session.app_name, user_id=session.user_id, session_id=session.id)
+        return event
+
+    # ===== Batched writes =====
+
+    def flush_events(self, *, app_name: str, user_id: str, session_id: str) -> int:
+        """Write all buffered events of a session in one transaction.
+
+        Returns:
+            The number of events written.
+        """
+        with self._pending_lock:
+            batch = self._pending.pop((app_name, user_id, session_id), None)
+        if batch is None or not batch.events:
+            return 0
+        try:
+            self._run_with_retry(lambda: self._write_batch(batch))
+        except Exception:
+            # Put the events back so a later flush can still persist them.
+            with self._pending_lock:
+                current = self._pending.get((app_name, user_id, session_id))
+                if current is not None:
+                    batch.events.extend(current.events)
+                self._pending[(app_name, user_id, session_id)] = batch
+            raise
+        return len(batch.events)
+
+    def flush_all(self) -> int:
+        """Flush the buffered events of every session, e.g. on shutdown."""
+        with self._pending_lock:
+            keys = list(self._pending.keys())
+        return sum(
+            self.flush_events(app_name=app_name, user_id=user_id, session_id=session_id)
+            for app_name, user_id, session_id in keys
+        )
+
+    def pending_event_count(self) -> int:
+        """Number of events buffered in memory and not yet written."""
+        with self._pending_lock:
+            return sum(len(batch.events) for batch in self._pending.values())
+
+    def _write_batch(self, batch: _PendingBatch) -> None:
+        session = batch.session
+        with self._writer_factory() as db:
+            storage_session = db.get(StorageSession, (session.app_name, session.user_id, session.id))
+            if storage_session is None:
+                logger.warning(f"Dropping {len(batch.events)} events for deleted session {session.id}")
+                return
+
+            if storage_session.update_time.timestamp() > session.last_update_time:
+                raise ValueError(
+                    f"Session last_update_time {session.last_update_time} is later than"
+                    f" the update_time in storage {storage_session.update_time}"
+                )
+
+            storage_app_state = db.get(StorageAppState, (session.app_name))
+            storage_user_state = db.get(StorageUserState, (session.app_name, session.user_id))
+
+            app_state = storage_app_state.state if storage_app_state else {}
+            user_state = storage_user_state.state if storage_user_state else {}
+            session_state = storage_session.state
+
+            for event in batch.events:
+                if event.actions and event.actions.state_delta:
+                    app_delta, user_delta, session_delta = _extract_state_delta(event.actions.state_delta)
+                    app_state.update(app_delta)
+                    user_state.update(user_delta)
+                    session_state.update(session_delta)
+
+            if storage_app_state:
+                storage_app_state.state = app_state
+            if storage_user_state:
+                storage_user_state.state = user_state
+            storage_session.state = session_state
+
+            db.add_all([_to_storage_event(session, event) for event in batch.events])
+            db.commit()
+            db.refresh(storage_session)
+
+            session.last_update_time = storage_session.update_time.timestamp()
+
+
+def _to_storage_event(session: Session, event: Event) -> StorageEvent:
+    """Build the StorageEvent row for an event, mirroring DatabaseSessionService."""
+    storage_event = StorageEvent(
+        id=event.id,
+        invocation_id=event.invocation_id,
+        author=event.author,
+        branch=event.branch,
+        actions=event.actions,
+        session_id=session.id,
+        app_name=session.app_name,
+        user_id=session.user_id,
+        timestamp=datetime.fromtimestamp(event.timestamp),
+        long_running_tool_ids=event.long_running_tool_ids,
+        grounding_metadata=event.grounding_metadata,
+        partial=event.partial,
+        turn_complete=event.turn_complete,
+        error_code=event.error_code,
+        error_message=event.error_message,
+        interrupted=event.interrupted,
+    )
+    if event.content:
+        encoded_content = event.content.model_dump(exclude_none=True)
+        # Same workaround as ADK for multimodal content that is not JSON serializable.
+        for part in encoded_content["parts"]:
+            if "inline_data" in part:
+                part["inline_data"]["data"] = (base64.b64encode(part["inline_data"]["data"]).decode("utf-8"),)
+        storage_event.content = encoded_content
+    return storage_event
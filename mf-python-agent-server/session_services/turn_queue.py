@@ -0,0 +1,326 @@
+"""
+Per-session turn serialization.
+
+Two turns of the same session must not run concurrently: both would read the
+same state and append conflicting events. SessionTurnQueue queues the turns of
+a session in arrival order with an asyncio lock per session (different
+sessions still run in parallel), and additionally holds a lease in the session
+store while the turn runs, so turns are serialized across api_server worker
+processes too.
+
+Leases live next to the sessions: a session_turn_leases table for database
+backends (per shard when sharded) or a key with a TTL for key-value backends.
+A lease expires on its own if its worker dies, and is renewed while the turn
+is still running.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from google.adk.sessions.base_session_service import BaseSessionService
+from sqlalchemy import Column, Engine, Float, MetaData, String, Table, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from .key_value import KeyValueSessionService
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+DEFAULT_LEASE_TTL_SECONDS = 300
+DEFAULT_ACQUIRE_TIMEOUT_SECONDS = 120
+DEFAULT_MAX_QUEUE_LENGTH = 16
+MAX_POLL_INTERVAL_SECONDS = 0.5
+MAX_TRACKED_SESSIONS = 10_000
+
+SessionKey = Tuple[str, str, str]
+
+lease_metadata = MetaData()
+TURN_LEASES = Table(
+    "session_turn_leases",
+    lease_metadata,
+    Column("lease_key", String, primary_key=True),
+    Column("owner", String, nullable=False),
+    Column("acquired_at", Float, nullable=False),
+    Column("expires_at", Float, nullable=False),
+)
+
+
+class TurnQueueFull(Exception):
+    """Raised when too many turns are already queued for a session."""
+
+
+class TurnQueueTimeout(TimeoutError):
+    """Raised when a turn waited longer than the acquire timeout."""
+
+
+def _lease_key(app_name: str, user_id: str, session_id: str) -> str:
+    return f"{app_name}:{user_id}:{session_id}"
+
+
+# ===== Lease stores =====
+
+class SQLTurnLeaseStore:
+    """Turn leases in a session_turn_leases table of the session database."""
+
+    def __init__(self, engine_for: Callable[[str, str], Engine], engines):
+        self._engine_for = engine_for
+        for engine in engines:
+            lease_metadata.create_all(engine.execution_options(sqlite_begin="IMMEDIATE"))
+
+    def acquire(self, app_name: str, user_id: str, session_id: str, owner: str, ttl_seconds: float) -> bool:
+        key = _lease_key(app_name, user_id, session_id)
+        now = time.time()
+        engine = self._engine_for(app_name, user_id)
+        try:
+            with engine.execution_options(sqlite_begin="IMMEDIATE").begin() as connection:
+                holder = connection.execute(
+                    select(TURN_LEASES.c.owner, TURN_LEASES.c.expires_at).where(TURN_LEASES.c.lease_key == key)
+                ).first()
+                if holder is None:
+                    connection.execute(
+                        insert(TURN_LEASES).values(lease_key=key, owner=owner, acquired_at=now, expires_at=now + ttl_seconds)
+                    )
+                elif holder.expires_at <= now:
+                    connection.execute(
+                        update(TURN_LEASES)
+                        .where(TURN_LEASES.c.lease_key == key)
+                        .values(owner=owner, acquired_at=now, expires_at=now + ttl_seconds)
+                    )
+                else:
+                    return False
+            return True
+        except (IntegrityError, OperationalError):
+            # Another worker inserted the lease first, or holds the write lock
+            return False
+
+    def renew(self, app_name: str, user_id: str, session_id: str, owner: str, ttl_seconds: float) -> bool:
+        key = _lease_key(app_name, user_id, session_id)
+        with self._engine_for(app_name, user_id).begin() as connection:
+            result = connection.execute(
+                update(TURN_LEASES)
+                .where(TURN_LEASES.c.lease_key == key, TURN_LEASES.c.owner == owner)
+                .values(expires_at=time.time() + ttl_seconds)
+            )
+        return result.rowcount > 0
+
+    def release(self, app_name: str, user_id: str, session_id: str, owner: str) -> None:
+        key = _lease_key(app_name, user_id, session_id)
+        with self._engine_for(app_name, user_id).begin() as connection:
+            connection.execute(
+                delete(TURN_LEASES).where(TURN_LEASES.c.lease_key == key, TURN_LEASES.c.owner == owner)
+            )
+
+    def holder(self, app_name: str, user_id: str, session_id: str) -> Optional[Dict[str, Any]]:
+        key = _lease_key(app_name, user_id, session_id)
+        with self._engine_for(app_name, user_id).connect() as connection:
+            row = connection.execute(select(TURN_LEASES).where(TURN_LEASES.c.lease_key == key)).first()
+        if row is None or row.expires_at <= time.time():
+            return None
+        return {"owner": row.owner, "acquired_at": row.acquired_at, "expires_at": row.expires_at}
+
+
+class KeyValueTurnLeaseStore:
+    """Turn leases as "{prefix}:turn_lease:{app}:{user}:{id}" keys with a TTL (SET NX EX)."""
+
+    def __init__(self, client, key_prefix: str):
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def _key(self, app_name: str, user_id: str, session_id: str) -> str:
+        return f"{self.key_prefix}:turn_lease:{_lease_key(app_name, user_id, session_id)}"
+
+    def acquire(self, app_name: str, user_id: str, session_id: str, owner: str, ttl_seconds: float) -> bool:
+        value = f"{owner}|{time.time()}"
+        return bool(self.client.set(self._key(app_name, user_id, session_id), value, ex=int(ttl_seconds), nx=True))
+
+    def _owned(self, key: str, owner: str) -> bool:
+        value = self.client.get(key)
+        return value is not None and value.rpartition("|")[0] == owner
+
+    # Check-then-act is safe enough here: another owner can only appear once our
+    # lease has expired, i.e. after renewals already failed for a whole TTL.
+    def renew(self, app_name: str, user_id: str, session_id: str, owner: str, ttl_seconds: float) -> bool:
+        key = self._key(app_name, user_id, session_id)
+        return self._owned(key, owner) and bool(self.client.expire(key, int(ttl_seconds)))
+
+    def release(self, app_name: str, user_id: str, session_id: str, owner: str) -> None:
+        key = self._key(app_name, user_id, session_id)
+        if self._owned(key, owner):
+            self.client.delete(key)
+
+    def holder(self, app_name: str, user_id: str, session_id: str) -> Optional[Dict[str, Any]]:
+        key = self._key(app_name, user_id, session_id)
+        value = self.client.get(key)
+        if value is None:
+            return None
+        owner, _, acquired_at = value.rpartition("|")
+        return {"owner": owner, "acquired_at": float(acquired_at), "expires_at": time.time() + max(self.client.ttl(key), 0)}
+
+
+def create_turn_lease_store(session_service: BaseSessionService):
+    """Lease store sharing the storage of a session service (None for in-memory services)."""
+    if isinstance(session_service, KeyValueSessionService):
+        return KeyValueTurnLeaseStore(session_service.client, session_service.key_prefix)
+    if hasattr(session_service, "shards"):
+        engines = [shard.db_engine for shard in session_service.shards.values() if hasattr(shard, "db_engine")]
+        if len(engines) != len(session_service.shards):
+            return None
+        return SQLTurnLeaseStore(
+            lambda app_name, user_id: session_service.shard_for(app_name, user_id).db_engine, engines
+        )
+    engine = getattr(session_service, "db_engine", None)
+    if engine is None:
+        return None
+    return SQLTurnLeaseStore(lambda app_name, user_id: engine, [engine])
+
+
+# ===== Turn queue =====
+
+@dataclass
+class SessionQueueStats:
+    """Queueing counters of one session in this process."""
+    turns: int = 0
+    last_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+    total_wait_ms: float = 0.0
+
+
+class SessionTurnQueue:
+    """Runs the turns of each session one at a time, in arrival order."""
+
+    def __init__(
+        self,
+        lease_store=None,
+        lease_ttl_seconds: float = DEFAULT_LEASE_TTL_SECONDS,
+        acquire_timeout_seconds: float = DEFAULT_ACQUIRE_TIMEOUT_SECONDS,
+        max_queue_length: int = DEFAULT_MAX_QUEUE_LENGTH,
+    ):
+        self.lease_store = lease_store
+        self.lease_ttl_seconds = lease_ttl_seconds
+        self.acquire_timeout_seconds = acquire_timeout_seconds
+        self.max_queue_length = max_queue_length
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._locks: Dict[SessionKey, asyncio.Lock] = {}
+        self._waiting: Dict[SessionKey, int] = {}
+        self._stats: "OrderedDict[SessionKey, SessionQueueStats]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls, session_service: BaseSessionService) -> "SessionTurnQueue":
+        """Build a turn queue for a session service from TURN_QUEUE_* env variables."""
+        return cls(
+            create_turn_lease_store(session_service),
+            lease_ttl_seconds=float(os.getenv("TURN_QUEUE_LEASE_TTL_SECONDS", str(DEFAULT_LEASE_TTL_SECONDS))),
+            acquire_timeout_seconds=float(os.getenv("TURN_QUEUE_TIMEOUT_SECONDS", str(DEFAULT_ACQUIRE_TIMEOUT_SECONDS))),
+            max_queue_length=int(os.getenv("TURN_QUEUE_MAX_LENGTH", str(DEFAULT_MAX_QUEUE_LENGTH))),
+        )
+
+    async def _acquire_lease(self, key: SessionKey, owner: str, deadline: float) -> None:
+        delay = 0.02
+        while not await asyncio.to_thread(self.lease_store.acquire, *key, owner, self.lease_ttl_seconds):
+            if time.monotonic() + delay > deadline:
+                raise TurnQueueTimeout(f"Session {key[2]} is busy in another worker")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_POLL_INTERVAL_SECONDS)
+
+    async def _renew_lease(self, key: SessionKey, owner: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_ttl_seconds / 3)
+            try:
+                if not await asyncio.to_thread(self.lease_store.renew, *key, owner, self.lease_ttl_seconds):
+                    logger.warning("Turn lease of session %s was lost", key[2])
+            except Exception as e:
+                logger.warning("Could not renew turn lease of session %s: %s", key[2], e)
+
+    @asynccontextmanager
+    async def turn(self, app_name: str, user_id: str, session_id: str) -> AsyncIterator[float]:
+        """Wait for the session's earlier turns to finish; yields the wait in milliseconds."""
+        key = (app_name, user_id, session_id)
+        if self._waiting.get(key, 0) >= self.max_queue_length:
+            raise TurnQueueFull(f"{self.max_queue_length} turns are already queued for session {session_id}")
+
+        start = time.monotonic()
+        deadline = start + self.acquire_timeout_seconds
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        acquired = False
+        try:
+            await asyncio.wait_for(lock.acquire(), timeout=self.acquire_timeout_seconds)
+            acquired = True
+        except asyncio.TimeoutError as e:
+            raise TurnQueueTimeout(f"Timed out waiting for the previous turn of session {session_id}") from e
+        finally:
+            self._waiting[key] -= 1
+            if not acquired:
+                self._forget_if_idle(key, lock)
+
+        owner = f"{self.worker_id}:{uuid.uuid4().hex[:8]}"
+        renewer = None
+        try:
+            if self.lease_store is not None:
+                await self._acquire_lease(key, owner, deadline)
+                renewer = asyncio.create_task(self._renew_lease(key, owner))
+
+            wait_ms = (time.monotonic() - start) * 1000
+            stats = self._stats.pop(key, None) or SessionQueueStats()
+            self._stats[key] = stats
+            if len(self._stats) > MAX_TRACKED_SESSIONS:
+                self._stats.popitem(last=False)
+            stats.turns += 1
+            stats.last_wait_ms = wait_ms
+            stats.max_wait_ms = max(stats.max_wait_ms, wait_ms)
+            stats.total_wait_ms += wait_ms
+            yield wait_ms
+        finally:
+            if renewer is not None:
+                renewer.cancel()
+                try:
+                    await asyncio.to_thread(self.lease_store.release, *key, owner)
+                except Exception as e:
+                    logger.warning("Could not release turn lease of session %s: %s", key[2], e)
+            lock.release()
+            self._forget_if_idle(key, lock)
+
+    def _forget_if_idle(self, key: SessionKey, lock: asyncio.Lock) -> None:
+        # The lock may have been replaced already when an earlier waiter cleaned up
+        if not self._waiting.get(key) and not lock.locked() and self._locks.get(key) is lock:
+            del self._locks[key]
+            self._waiting.pop(key, None)
+
+    async def session_stats(self, app_name: str, user_id: str, session_id: str) -> Dict[str, Any]:
+        """Queue length, wait times and current lease holder of one session."""
+        key = (app_name, user_id, session_id)
+        stats = self._stats.get(key, SessionQueueStats())
+        lock = self._locks.get(key)
+        holder = None
+        if self.lease_store is not None:
+            holder = await asyncio.to_thread(self.lease_store.holder, *key)
+        return {
+            "queued": self._waiting.get(key, 0),
+            "running": bool(lock and lock.locked()),
+            "turns": stats.turns,
+            "last_wait_ms": round(stats.last_wait_ms, 1),
+            "max_wait_ms": round(stats.max_wait_ms, 1),
+            "mean_wait_ms": round(stats.total_wait_ms / stats.turns, 1) if stats.turns else 0.0,
+            "lease_holder": holder,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals over all sessions seen by this worker."""
+        turns = sum(stats.turns for stats in self._stats.values())
+        total_wait_ms = sum(stats.total_wait_ms for stats in self._stats.values())
+        return {
+            "worker_id": self.worker_id,
+            "sessions_running": sum(1 for lock in self._locks.values() if lock.locked()),
+            "turns_queued": sum(self._waiting.values()),
+            "turns": turns,
+            "mean_wait_ms": round(total_wait_ms / turns, 1) if turns else 0.0,
+            "max_wait_ms": round(max((stats.max_wait_ms for stats in self._stats.values()), default=0.0), 1),
+        }
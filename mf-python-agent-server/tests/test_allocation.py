@@ -0,0 +1,95 @@
+from dataclasses import replace
+
+import pytest
+
+from mutual_fund_advisor_agent.catalog import AllocationError, FundAnalytics, allocate
+from mutual_fund_advisor_agent.catalog.allocation import capped_level, RISK_CAPS
+from mutual_fund_advisor_agent.catalog.records import RETURN_PERIODS, FundRecord
+
+
+def make_record(fund_id: str, risk_level: str, category: str, annual_return: float) -> FundRecord:
+    return FundRecord(
+        id=fund_id,
+        name=f"Fund {fund_id}",
+        risk_level=risk_level,
+        fund_type="Equity",
+        category=category,
+        min_sip_amount=500,
+        nav=10.0,
+        fund_size=1000.0,
+        is_active=True,
+        returns=tuple(annual_return for _ in RETURN_PERIODS),
+        created_at="2024-01-01T00:00:00Z",
+        updated_at="2024-01-01T00:00:00Z",
+    )
+
+
+@pytest.mark.parametrize("risk_level, level", [
+    ("High", "High"),
+    ("high", "High"),
+    ("Very High", "High"),
+    ("Moderately High", "High"),
+    ("MEDIUM", "Medium"),
+    ("Low", None),
+    ("", None),
+])
+def test_capped_level_ignores_case_and_qualifiers(risk_level, level):
+    assert capped_level(risk_level, RISK_CAPS["conservative"]) == level
+
+
+def test_conservative_investor_gets_no_high_risk_funds_whatever_their_spelling():
+    records = [
+        make_record("a", "Very High", "Small Cap", 25.0),
+        make_record("b", "high", "Mid Cap", 20.0),
+        make_record("c", "Low", "Debt", 7.0),
+    ]
+    allocation = allocate(records, FundAnalytics.compute(records), 10000, "conservative")
+    assert allocation.amounts == {"c": 10000}
+    assert sum("left out" in note for note in allocation.notes) == 2
+
+
+def test_balanced_cap_counts_every_high_risk_spelling():
+    records = [
+        make_record("a", "Very High", "Small Cap", 25.0),
+        make_record("b", "HIGH", "Mid Cap", 22.0),
+        make_record("c", "Low", "Debt", 7.0),
+        make_record("d", "medium", "Hybrid", 10.0),
+    ]
+    allocation = allocate(records, FundAnalytics.compute(records), 10000, "balanced")
+    high = allocation.amounts.get("a", 0) + allocation.amounts.get("b", 0)
+    assert high <= 0.3 * 10000
+
+
+@pytest.mark.parametrize("total", [1900, 5550, 7777, 12345])
+def test_rounding_keeps_the_risk_cap(total):
+    records = [
+        make_record("a", "Very High", "Small Cap", 25.0),
+        make_record("b", "HIGH", "Mid Cap", 22.0),
+        make_record("c", "Low", "Debt", 7.0),
+        make_record("d", "medium", "Hybrid", 10.0),
+    ]
+    allocation = allocate(records, FundAnalytics.compute(records), total, "balanced")
+    high = allocation.amounts.get("a", 0) + allocation.amounts.get("b", 0)
+    assert high <= 0.3 * total
+    assert sum(allocation.amounts.values()) == pytest.approx(total)
+    assert all(amount >= 500 for amount in allocation.amounts.values())
+
+
+def test_conservative_investor_with_only_high_risk_funds_is_refused():
+    records = [make_record("a", "Very High", "Small Cap", 25.0)]
+    with pytest.raises(AllocationError):
+        allocate(records, FundAnalytics.compute(records), 10000, "conservative")
+
+
+def test_funds_missing_returns_fall_back_or_are_left_out():
+    with_returns = make_record("a", "Low", "Debt", 7.0)
+    short_history = replace(
+        make_record("b", "Medium", "Hybrid", 10.0),
+        returns=tuple(10.0 if period in ("Y_1", "Y_2") else None for period in RETURN_PERIODS),
+    )
+    no_returns = replace(make_record("c", "Low", "Debt", 0.0), returns=(None,) * len(RETURN_PERIODS))
+    records = [with_returns, short_history, no_returns]
+    allocation = allocate(records, FundAnalytics.compute(records), 10000, "balanced")
+    assert set(allocation.amounts) == {"a", "b"}
+    assert sum(allocation.amounts.values()) == 10000
+    assert any(note.startswith("Fund c is left out") for note in allocation.notes)
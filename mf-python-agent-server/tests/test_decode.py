@@ -0,0 +1,57 @@
+import json
+
+from mutual_fund_advisor_agent.catalog import FundAnalytics
+from mutual_fund_advisor_agent.catalog.decode import decode_funds, dump_fund
+from mutual_fund_advisor_agent.catalog.records import FundRecord
+
+RETURNS = {"1W": 0.2, "1M": 1.1, "3M": 3.0, "6M": 6.0, "YTD": 8.0, "1Y": 12.0, "2Y": 11.0, "3Y": 13.0, "5Y": 14.0}
+
+
+def api_fund(fund_id: str, **fields) -> dict:
+    return {
+        "_id": fund_id,
+        "name": f"Fund {fund_id}",
+        "category": "Large Cap",
+        "createdAt": "2024-01-01T00:00:00Z",
+        "updatedAt": "2024-01-01T00:00:00Z",
+        **fields,
+    }
+
+
+def test_funds_with_only_the_required_fields_are_kept():
+    body = json.dumps([
+        api_fund("full", risk_level="High", fund_type="Equity", min_sip_amount=500, nav=10.5, fund_size=2000, returns={**RETURNS, "10Y": 15.0}),
+        api_fund("no-10y", risk_level="Medium", returns=RETURNS),
+        api_fund("bare"),
+    ])
+    funds = decode_funds(body)
+    assert [fund.id for fund in funds] == ["full", "no-10y", "bare"]
+    assert funds[1].returns.Y_10 is None and funds[1].returns.Y_5 == 14.0
+    bare = dump_fund(funds[2])
+    assert bare["is_active"] is True
+    assert bare["min_sip_amount"] is None and bare["returns"]["Y_3"] is None
+
+
+def test_records_round_trip_missing_fields():
+    fund = decode_funds(json.dumps([api_fund("no-10y", returns=RETURNS)]))[0]
+    record = FundRecord.from_fund(fund)
+    assert record.risk_level is None and record.return_for("Y_10") is None
+    assert record.to_dict() == dump_fund(fund)
+    assert FundRecord.from_fund(record.to_fund()) == record
+
+
+def test_missing_returns_give_none_metrics_not_nan():
+    funds = decode_funds(json.dumps([
+        api_fund("no-10y", returns=RETURNS, fund_size=2000),
+        api_fund("one-horizon", returns={"1Y": 9.0}),
+        api_fund("bare"),
+    ]))
+    analytics = FundAnalytics.compute([FundRecord.from_fund(fund) for fund in funds])
+    no_10y = analytics.metrics_for("no-10y")
+    assert no_10y["return_10y"] is None
+    # Volatility over the four known long horizons
+    assert no_10y["volatility"] is not None and no_10y["consistency"] is not None
+    one_horizon = analytics.metrics_for("one-horizon")
+    assert one_horizon["return_1y"] == 9.0
+    assert one_horizon["volatility"] is None and one_horizon["size_factor"] is None
+    assert all(value is None for value in analytics.metrics_for("bare").values())
@@ -0,0 +1,26 @@
+import pytest
+
+from mutual_fund_advisor_agent.schemas import SessionState
+from session_services.reaper import DEFAULT_TTL, SessionReaper, _stage_of
+
+
+@pytest.mark.parametrize("update, stage", [
+    ({}, "initial"),
+    ({"user_profile": {"name": "Asha"}}, "profile"),
+    ({"user_profile": {"name": "Asha"}, "recommended_funds": [{"_id": "f1"}]}, "funds_recommended"),
+    ({"recommended_funds": [{"_id": "f1"}], "selected_fund": {"_id": "f1"}}, "fund_selected"),
+    ({"sip_submission": {"id": "s1", "status": "pending"}}, "fund_selected"),
+    ({"selected_fund": {"_id": "f1"}, "sip_started": True}, "completed"),
+    ({"flow_stage": "investment_complete"}, "investment_complete"),
+])
+def test_stage_follows_what_the_session_holds(update, stage):
+    # Sessions start from SessionState().model_dump(), so flow_stage stays "initial"
+    assert _stage_of({**SessionState().model_dump(), **update}) == stage
+
+
+def test_ttl_per_stage():
+    reaper = SessionReaper([])
+    initial = SessionState().model_dump()
+    assert reaper.ttl_for(initial) == 24 * 60 * 60
+    assert reaper.ttl_for({**initial, "user_profile": {"name": "Asha"}}) == DEFAULT_TTL
+    assert reaper.ttl_for({**initial, "recommended_funds": [{"_id": "f1"}]}) == 7 * 24 * 60 * 60
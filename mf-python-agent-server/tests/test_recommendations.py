@@ -0,0 +1,36 @@
+from mutual_fund_advisor_agent.catalog import FundAnalytics, RecommendationTable
+from mutual_fund_advisor_agent.catalog.records import RETURN_PERIODS, FundRecord
+
+
+def make_record(index: int, is_active: bool = True) -> FundRecord:
+    return FundRecord(
+        id=f"fund-{index}",
+        name=f"Fund {index}",
+        risk_level=("Low", "Medium", "High")[index % 3],
+        fund_type="Debt" if index % 2 else "Equity",
+        category=("Debt", "Hybrid", "Large Cap", "Small Cap")[index % 4],
+        min_sip_amount=500,
+        nav=10.0,
+        fund_size=100.0 + index,
+        is_active=is_active,
+        returns=tuple(5.0 + index % 7 + position for position in range(len(RETURN_PERIODS))),
+        created_at="2024-01-01T00:00:00Z",
+        updated_at="2024-01-01T00:00:00Z",
+    )
+
+
+def test_pages_past_shown_funds_through_the_rest_of_the_catalog():
+    records = [make_record(index, is_active=index != 7) for index in range(30)]
+    table = RecommendationTable.build(1, records, FundAnalytics.compute(records), top_k=4)
+
+    first = table.page("conservative", "house", 4, exclude=set(), size=4)
+    assert first == table.lookup("conservative", "house", 4)
+
+    shown = {fund.id for fund in first}
+    while True:
+        page = table.page("conservative", "house", 4, exclude=shown, size=4)
+        if not page:
+            break
+        assert not shown & {fund.id for fund in page}
+        shown |= {fund.id for fund in page}
+    assert shown == {record.id for record in records if record.is_active}
@@ -0,0 +1,31 @@
+import pytest
+
+from mutual_fund_advisor_agent.sub_agents.fundRecommenderAgent.selection import UNCLEAR_PICK, chosen_number
+
+
+@pytest.mark.parametrize("answer, number", [
+    ("2", "2"),
+    ("option 3", "3"),
+    ("#1", "1"),
+    ("the second one", "2"),
+    ("Second", "2"),
+    ("3rd fund.", "3"),
+    ("not the second one", None),
+    ("second is risky", None),
+    ("I'd rather not take the first", None),
+    ("axis small cap", None),
+])
+def test_only_a_whole_answer_picks_an_option(answer, number):
+    assert chosen_number(answer) == number
+
+
+@pytest.mark.parametrize("answer, unclear", [
+    ("not the second one", True),
+    ("second is risky", True),
+    ("don’t want the HDFC one", True),
+    ("anything but axis", True),
+    ("the HDFC one", False),
+    ("nifty 50 index", False),
+])
+def test_negations_and_ordinals_in_a_sentence_go_to_the_model(answer, unclear):
+    assert bool(UNCLEAR_PICK.search(answer)) == unclear
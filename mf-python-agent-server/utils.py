@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from google.genai import types
+from mutual_fund_advisor_agent.prefetch import prefetcher
 
 
 # ANSI color codes for terminal output
@@ -177,29 +177,17 @@ async def process_agent_response(event):
 
 async def call_agent_async(runner, user_id, session_id, query):
     """Call the agent asynchronously with the user's query."""
+    from google.genai import types
+
     content = types.Content(role="user", parts=[types.Part(text=query)])
     print(
         f"\n{Colors.BG_GREEN}{Colors.BLACK}{Colors.BOLD}--- Running Query: {query} ---{Colors.RESET}"
     )
     final_response_text = None
     agent_name = None
-    
-    # After final response and agent work is done
-    try:
-        # Get session state after agent run
-        session = await runner.session_service.get_session(user_id, session_id)
-        state = session.state
-
-        # ✅ Check if agent flow is complete (custom condition)
-        if state.get("sip_started") is True:
-            print(f"{Colors.BG_BLUE}{Colors.WHITE}Session complete. Deleting session...{Colors.RESET}")
-            await runner.session_service.delete_session(user_id, session_id)
-        else:
-            print(f"{Colors.CYAN}Session not yet complete. Keeping session active.{Colors.RESET}")
-
-    except Exception as e:
-        print(f"{Colors.BG_RED}{Colors.WHITE}Error while checking or deleting session: {e}{Colors.RESET}")
 
+    # Completed and abandoned sessions are cleaned up by the background
+    # SessionReaper (session_services/reaper.py), not on the turn's hot path.
 
     # Display state before processing the message
     # display_state(
@@ -210,27 +198,37 @@ async def call_agent_async(runner, user_id, session_id, query):
     #     "State BEFORE processing",
     # )
 
-    try:
-        async for event in runner.run_async(
-            user_id=user_id, session_id=session_id, new_message=content
-        ):
-            # Capture the agent name from the event if available
-            if event.author:
-                agent_name = event.author
-            print(f"Agent name: {agent_name}")
-            print(f"Event: {event}")
-            response = await process_agent_response(event)
-            if response:
-                final_response_text = response
-    except ValueError as e:
-        if "fromisoformat" in str(e):
-            print(f"{Colors.BG_RED}{Colors.WHITE}ERROR: DateTime parsing issue. This might be due to database serialization. Trying to continue...{Colors.RESET}")
-            # Try to continue with a generic error message
-            final_response_text = "I encountered a technical issue with the session data. Let me help you start fresh. Please try your question again."
-        else:
+    # Tools and callbacks of the turn read prefetched results of this session
+    with prefetcher.foreground(user_id, session_id):
+        try:
+            async for event in runner.run_async(
+                user_id=user_id, session_id=session_id, new_message=content
+            ):
+                # Capture the agent name from the event if available
+                if event.author:
+                    agent_name = event.author
+                print(f"Agent name: {agent_name}")
+                print(f"Event: {event}")
+                response = await process_agent_response(event)
+                if response:
+                    final_response_text = response
+        except ValueError as e:
+            if "fromisoformat" in str(e):
+                print(f"{Colors.BG_RED}{Colors.WHITE}ERROR: DateTime parsing issue. This might be due to database serialization. Trying to continue...{Colors.RESET}")
+                # Try to continue with a generic error message
+                final_response_text = "I encountered a technical issue with the session data. Let me help you start fresh. Please try your question again."
+            else:
+                print(f"{Colors.BG_RED}{Colors.WHITE}ERROR during agent run: {e}{Colors.RESET}")
+        except Exception as e:
             print(f"{Colors.BG_RED}{Colors.WHITE}ERROR during agent run: {e}{Colors.RESET}")
-    except Exception as e:
-        print(f"{Colors.BG_RED}{Colors.WHITE}ERROR during agent run: {e}{Colors.RESET}")
+        finally:
+            # Session services that batch event inserts write the whole turn at once
+            flush_events = getattr(runner.session_service, "flush_events", None)
+            if flush_events is not None:
+                try:
+                    flush_events(app_name=runner.app_name, user_id=user_id, session_id=session_id)
+                except Exception as e:
+                    print(f"{Colors.BG_RED}{Colors.WHITE}ERROR while saving session events: {e}{Colors.RESET}")
 
     # Display state after processing the message
     # display_state(
@@ -0,0 +1,198 @@
+"""
+Worker warmup
+
+After a deploy, the first users of a fresh worker would pay for everything
+that is set up lazily: importing google.adk and litellm and building the agent
+graph, opening database connections, downloading the fund catalog and
+building its analytics and indexes, building tool declarations, and the TLS
+handshakes to the model providers. Warmup does this work once at startup,
+before the worker reports ready on /readyz, so the load balancer (or
+router.py) holds traffic until the worker is warm.
+
+Steps run one after the other, blocking ones in a thread so /healthz keeps
+answering. Each step's time and outcome are recorded. A failed step is logged
+and warmup continues. The worker is not ready while a required step (the
+agent graph) has failed, because it could not run a turn anyway.
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import Engine, text
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+DEFAULT_MODEL_TIMEOUT_SECONDS = 10.0
+PING_PROMPT = "Reply with OK."
+
+# Status of a warmup
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+DISABLED = "disabled"
+
+
+class Warmup:
+    """Runs named warmup steps once and tracks whether the worker is ready."""
+
+    def __init__(self, steps: Sequence[Tuple[str, Callable[[], Any]]], required: Iterable[str] = ()):
+        self.steps = list(steps)
+        self.required: Set[str] = set(required)
+        self.status = PENDING if self.steps else DISABLED
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        if self.status == DISABLED:
+            return True
+        if self.status != DONE:
+            return False
+        return all(self.results.get(name, {}).get("ok") for name in self.required)
+
+    async def run(self) -> None:
+        if self.status != PENDING:
+            return
+        self.status = RUNNING
+        self.started_at = time.time()
+        for name, step in self.steps:
+            start = time.perf_counter()
+            try:
+                if inspect.iscoroutinefunction(step):
+                    detail = await step()
+                else:
+                    detail = await asyncio.to_thread(step)
+                self.results[name] = {"ok": True, "detail": detail}
+            except Exception as e:
+                logger.warning(f"Warmup step {name} failed: {e}")
+                self.results[name] = {"ok": False, "error": str(e)}
+            self.results[name]["seconds"] = round(time.perf_counter() - start, 3)
+            logger.info(f"Warmup step {name} finished in {self.results[name]['seconds']}s")
+        self.finished_at = time.time()
+        self.status = DONE
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "ready": self.ready,
+            "seconds": round(self.finished_at - self.started_at, 3) if self.finished_at and self.started_at else None,
+            "steps": {name: self.results.get(name, {"ok": None}) for name, _ in self.steps},
+        }
+
+
+def open_pooled_connections(engines: Iterable[Engine]) -> Dict[str, int]:
+    """Fill each engine's connection pool: connect as many connections as it keeps and run a query on each."""
+    opened: Dict[str, int] = {}
+    seen: Set[int] = set()
+    for engine in engines:
+        if id(engine) in seen:
+            continue
+        seen.add(id(engine))
+        size = getattr(engine.pool, "size", None)
+        count = max(size() if callable(size) else 1, 1)
+        connections = []
+        try:
+            for _ in range(count):
+                connection = engine.connect()
+                connections.append(connection)
+                connection.execute(text("SELECT 1"))
+        finally:
+            # Closing returns the connections to the pool, where they stay open
+            for connection in connections:
+                connection.close()
+        opened[engine.url.render_as_string(hide_password=True)] = count
+    return opened
+
+
+def walk_agents(root) -> List[Any]:
+    """The agent and every agent below it, through sub-agents and agent tools."""
+    agents, pending, seen = [], [root], set()
+    while pending:
+        agent = pending.pop()
+        if id(agent) in seen:
+            continue
+        seen.add(id(agent))
+        agents.append(agent)
+        pending.extend(getattr(agent, "sub_agents", []) or [])
+        for tool in getattr(agent, "tools", []) or []:
+            if hasattr(tool, "agent"):
+                pending.append(tool.agent)
+    return agents
+
+
+def build_declarations(root) -> Dict[str, int]:
+    """Build the tool declarations and output JSON schemas the agents send with every model call."""
+    agents = walk_agents(root)
+    tools, schemas = 0, 0
+    for agent in agents:
+        for tool in getattr(agent, "canonical_tools", []):
+            tool._get_declaration()
+            tools += 1
+        output_schema = getattr(agent, "output_schema", None)
+        if output_schema is not None:
+            output_schema.model_json_schema()
+            schemas += 1
+    return {"agents": len(agents), "tools": tools, "output_schemas": schemas}
+
+
+def compile_validators(models: Iterable[type], samples: Iterable[Tuple[type, Any]] = ()) -> Dict[str, int]:
+    """Finish Pydantic models whose build was deferred (forward references) and validate one sample of each kind."""
+    rebuilt = 0
+    for model in models:
+        if not getattr(model, "__pydantic_complete__", True):
+            model.model_rebuild()
+            rebuilt += 1
+    validated = 0
+    for model, sample in samples:
+        model.model_validate(sample)
+        validated += 1
+    return {"rebuilt": rebuilt, "validated": validated}
+
+
+def model_clients(root) -> Dict[str, Any]:
+    """The distinct backend models of the agent graph, by name, behind the tiering and hedging wrappers."""
+    clients: Dict[str, Any] = {}
+    pending = [agent.canonical_model for agent in walk_agents(root) if hasattr(agent, "canonical_model")]
+    while pending:
+        model = pending.pop()
+        if hasattr(model, "large") and hasattr(model, "small"):
+            pending.extend([model.large, model.small])
+        elif hasattr(model, "models"):
+            pending.extend(model.models)
+        else:
+            clients.setdefault(model.model, model)
+    return clients
+
+
+async def ping_models(root, timeout_seconds: float = DEFAULT_MODEL_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """Send a one-token request to every backend model, opening its client and connection."""
+    from google.adk.models.llm_request import LlmRequest
+    from google.genai import types
+
+    async def ping(name: str, model) -> Any:
+        request = LlmRequest(
+            model=name,
+            contents=[types.Content(role="user", parts=[types.Part(text=PING_PROMPT)])],
+            config=types.GenerateContentConfig(max_output_tokens=1),
+        )
+
+        async def answer() -> None:
+            async for _ in model.generate_content_async(request):
+                pass
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(answer(), timeout_seconds)
+        except Exception as e:
+            return f"failed: {e}"
+        return round(time.perf_counter() - start, 3)
+
+    clients = model_clients(root)
+    timings = await asyncio.gather(*(ping(name, model) for name, model in clients.items()))
+    return dict(zip(clients, timings))
+